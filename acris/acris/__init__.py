@@ -28,6 +28,11 @@ from acrilib import TimedSizedRotatingHandler, MergedChainedDict
 import acris.idioms.resource_pool as resource_pool
 import acris.idioms.virtual_resource_pool as virtual_resource_pool
 import acris.idioms.virtual_resource_pool_db as virtual_resource_pool_db
+import acris.idioms.shared_resource_pool as shared_resource_pool
+import acris.idioms.cluster_resource_pool as cluster_resource_pool
+import acris.idioms.pool_metrics as pool_metrics
+import acris.idioms.pool_sizer as pool_sizer
+import acris.idioms.pool_storage as pool_storage
 from .idioms.resource_pool import ResourcePool, Resource, Requestor, Requestors
 from acrilib import Synchronization, SynchronizeAll, dont_synchronize, do_synchronize, synchronized
 from acrilib import Mediator
@@ -0,0 +1,52 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Runs benchmark suites of acris:
+
+    python -m acris.bench pool --threads 1 4 16 --save baseline.json
+    python -m acris.bench pool --threads 1 4 16 --baseline baseline.json
+    
+Exits with 1 if results regress from baseline.
+'''
+
+import sys
+import acris.bench.pool as pool
+
+SUITES={'pool': pool,
+        }
+
+def cmdargs(argv=None):
+    import argparse
+    
+    parser=argparse.ArgumentParser(prog='python -m acris.bench', description='Run acris benchmark suite.')
+    subparsers=parser.add_subparsers(dest='suite', metavar='SUITE')
+    subparsers.required=True
+    for name, suite in SUITES.items():
+        suite.add_arguments(subparsers.add_parser(name, help=suite.__doc__.strip().splitlines()[0]))
+    return parser.parse_args(argv)
+
+def main(args):
+    return SUITES[args.suite].main(args)
+
+if __name__ == '__main__':
+    args=cmdargs()
+    sys.exit(main(args))
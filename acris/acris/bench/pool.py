@@ -0,0 +1,333 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Load generator and benchmark of ResourcePool, Requestor and Requestors.
+
+Each scenario runs threads that, for a duration, pick a request from a mix,
+acquire it from the target, hold it for a time drawn from a distribution,
+and return it:
+    pool: ResourcePool.get and put, on one pool picked at random.
+    requestor: Requestor of span pools picked at random, get and put.
+    requestors: Requestors reserve, get and put, of span pools.
+
+Scenario reports:
+    throughput: requests served per second.
+    latency: percentiles of acquisition time, from request to resources.
+    fairness: Jain's index of requests served per thread (1.0 is fair), 
+        and min to max ratio of the same.
+    memory: peak RSS growth of process, and peak of memory traced by 
+        tracemalloc if asked for (tracing slows the run).
+        
+Results are saved as JSON, and compared with results saved before; a 
+scenario regresses if its throughput drops, or its p99 latency grows, by 
+more than tolerance.
+'''
+
+from acris.idioms.resource_pool import ResourcePool, Resource, Requestor, Requestors
+from acris.VERSION import __version__
+from collections import namedtuple
+import threading
+import itertools
+import platform
+import resource
+import tracemalloc
+import random
+import json
+import math
+import time
+import gc
+
+Scenario=namedtuple('Scenario', ['target', 'threads', 'pools', 'pool_size', 'mix', 'span', 'hold', 'wait', 'duration', 'policy', 'seed'])
+
+TARGETS=['pool', 'requestor', 'requestors']
+PERCENTILES=[50, 90, 99, 99.9]
+
+# pool names are global to process (NamedSingleton); each run makes new pools.
+_pool_sequence=itertools.count(1)
+
+class BenchResource(Resource): pass
+
+def parse_mix(mix):
+    ''' parses request mix of comma separated count:weight items, e.g., 
+    1:70,2:20,4:10 (weight is 1 if missing).
+    
+    Returns:
+        tuple of counts and tuple of weights
+    '''
+    counts, weights=list(), list()
+    for item in mix.split(','):
+        count, _, weight=item.partition(':')
+        counts.append(int(count))
+        weights.append(float(weight) if weight else 1.0)
+    if not counts or min(counts) < 1 or min(weights) < 0:
+        raise ValueError("Bad request mix: %s" % (mix,))
+    return tuple(counts), tuple(weights)
+
+def parse_hold(hold):
+    ''' parses hold time distribution, in seconds:
+        0 or const:S: S seconds.
+        uniform:A:B: uniform between A and B.
+        exp:M: exponential with mean M.
+        lognormal:M:SIGMA: log-normal with median M and shape SIGMA.
+        
+    Returns:
+        function of random.Random returning hold time.
+    '''
+    kind, _, args=hold.partition(':')
+    try:
+        args=[float(arg) for arg in args.split(':')] if args else []
+        if not args:
+            value=float(kind)
+            return lambda rnd: value
+        if kind == 'const' and len(args) == 1:
+            value=args[0]
+            return lambda rnd: value
+        if kind == 'uniform' and len(args) == 2:
+            low, high=args
+            return lambda rnd: rnd.uniform(low, high)
+        if kind == 'exp' and len(args) == 1 and args[0] > 0:
+            rate=1.0 / args[0]
+            return lambda rnd: rnd.expovariate(rate)
+        if kind == 'lognormal' and len(args) == 2 and args[0] > 0:
+            mu, sigma=math.log(args[0]), args[1]
+            return lambda rnd: rnd.lognormvariate(mu, sigma)
+    except ValueError:
+        pass
+    raise ValueError("Bad hold time distribution: %s" % (hold,))
+
+def request_mix(value):
+    # argparse type of --mix; argparse reports ValueError as usage error.
+    parse_mix(value)
+    return value
+
+def hold_time(value):
+    # argparse type of --hold
+    parse_hold(value)
+    return value
+
+def scenario_name(scenario):
+    name='%s-t%s-p%sx%s-m%s-h%s' % (scenario.target, scenario.threads, scenario.pools, scenario.pool_size, scenario.mix, scenario.hold)
+    if scenario.target != 'pool': name+='-s%s' % (scenario.span,)
+    if scenario.policy: name+='-' + ','.join(['%s=%s' % item for item in sorted(scenario.policy.items())])
+    return name
+
+def percentile(values, pct):
+    ''' percentile of sorted values, nearest rank
+    '''
+    if not values: return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+def jain_index(values):
+    ''' Jain's fairness index: 1.0 if all values are equal, 1/n if one value takes all.
+    '''
+    total=sum(values)
+    squares=sum([value * value for value in values])
+    return total * total / (len(values) * squares) if squares else 1.0
+
+def _rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _worker(scenario, pools, requestors, index, start, stop_at, stats):
+    rnd=random.Random(scenario.seed * 1000003 + index)
+    counts, weights=parse_mix(scenario.mix)
+    hold_time=parse_hold(scenario.hold)
+    target, wait, span=scenario.target, scenario.wait, min(scenario.span, len(pools))
+    latencies=list()
+    served=timeouts=0
+    start.wait()
+    while time.monotonic() < stop_at[0]:
+        count=rnd.choices(counts, weights)[0]
+        hold=hold_time(rnd)
+        begin=time.perf_counter()
+        if target == 'pool':
+            holder=rnd.choice(pools)
+            resources=holder.get(count=count, wait=wait)
+        elif target == 'requestor':
+            holder=Requestor(request=[(pool, count) for pool in rnd.sample(pools, span)], wait=wait)
+            resources=holder.get()
+        else:
+            holder=requestors
+            resources=requestors.get(requestors.reserve(request=[(pool, count) for pool in rnd.sample(pools, span)], wait=wait))
+        latencies.append(time.perf_counter() - begin)
+        if not resources:
+            timeouts+=1
+            continue
+        if hold > 0: time.sleep(hold)
+        holder.put(*resources)
+        served+=1
+    stats[index]=(served, timeouts, latencies)
+    
+def run(scenario, trace_memory=False):
+    ''' runs scenario
+    
+    Returns:
+        dict of scenario's results
+    '''
+    counts, _=parse_mix(scenario.mix)
+    if max(counts) > scenario.pool_size:
+        raise ValueError("Request mix %s asks for more than pool size %s" % (scenario.mix, scenario.pool_size))
+    run_id=next(_pool_sequence)
+    policy=dict(scenario.policy, resource_limit=scenario.pool_size)
+    pools=[ResourcePool('BENCH-%s-%s' % (run_id, i), resource_cls=BenchResource, policy=policy).load(count=scenario.pool_size) 
+           for i in range(scenario.pools)]
+    requestors=Requestors() if scenario.target == 'requestors' else None
+    
+    gc.collect()
+    rss_before=_rss_kb()
+    if trace_memory: tracemalloc.start()
+    start=threading.Event()
+    stop_at=[0.0]
+    stats=[None] * scenario.threads
+    workers=[threading.Thread(target=_worker, args=(scenario, pools, requestors, i, start, stop_at, stats)) 
+             for i in range(scenario.threads)]
+    for thread in workers: thread.start()
+    begin=time.perf_counter()
+    stop_at[0]=time.monotonic() + scenario.duration
+    start.set()
+    for thread in workers: thread.join()
+    elapsed=time.perf_counter() - begin
+    traced_peak=tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory: tracemalloc.stop()
+    
+    served=[served for served, _, _ in stats]
+    latencies=sorted([latency for _, _, values in stats for latency in values])
+    result={'scenario': scenario._asdict(),
+            'throughput': sum(served) / elapsed,
+            'served': sum(served),
+            'timeouts': sum([timeouts for _, timeouts, _ in stats]),
+            'latency': dict([('p%s' % pct, percentile(latencies, pct)) for pct in PERCENTILES] + [('max', latencies[-1] if latencies else 0.0)]),
+            'fairness': {'jain': jain_index(served), 
+                         'min_max': min(served) / max(served) if max(served) else 1.0},
+            'memory': {'rss_growth_kb': _rss_kb() - rss_before, 
+                       'traced_peak_kb': traced_peak / 1024.0 if traced_peak is not None else None},
+            }
+    return result
+
+def compare(results, baseline, tolerance=0.2, slack=0.0005):
+    ''' compares results with baseline results, by scenario name.
+    
+    Args:
+        results, baseline: dicts of scenario name to results, as saved.
+        tolerance: fraction throughput may drop, or p99 latency grow, by.
+        slack: seconds p99 latency may grow by, on top of tolerance, so 
+            that sub-millisecond noise is not a regression.
+        
+    Returns:
+        list of regression messages; empty if none.
+    '''
+    regressions=list()
+    for name, result in results.items():
+        base=baseline.get(name)
+        if base is None: continue
+        if result['throughput'] < base['throughput'] * (1.0 - tolerance):
+            regressions.append("%s: throughput %.0f/s, baseline %.0f/s" % (name, result['throughput'], base['throughput']))
+        if result['latency']['p99'] > base['latency']['p99'] * (1.0 + tolerance) + slack:
+            regressions.append("%s: p99 latency %.3fms, baseline %.3fms" % (name, result['latency']['p99'] * 1e3, base['latency']['p99'] * 1e3))
+    return regressions
+
+def save(results, path):
+    document={'acris': __version__, 
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'results': results,
+              }
+    with open(path, 'w') as file:
+        json.dump(document, file, indent=2, sort_keys=True)
+
+def load(path):
+    with open(path, 'r') as file:
+        return json.load(file)['results']
+
+def _parse_policy(items):
+    policy=dict()
+    for item in items:
+        key, _, value=item.partition('=')
+        try:
+            policy[key]=json.loads(value)
+        except ValueError:
+            policy[key]=value
+    return policy
+
+def add_arguments(parser):
+    parser.add_argument('--target', type=str, nargs='+', choices=TARGETS, default=TARGETS,
+                        help='objects to drive: pool, requestor, requestors.')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16],
+                        help='numbers of threads to run with.')
+    parser.add_argument('--pools', type=int, default=2, 
+                        help='number of pools.')
+    parser.add_argument('--pool-size', type=int, nargs='+', default=[8], dest='pool_size',
+                        help='resource limits of pools to run with.')
+    parser.add_argument('--mix', type=request_mix, nargs='+', default=['1'],
+                        help='request mixes, each of count:weight items, e.g., 1:70,2:20,4:10.')
+    parser.add_argument('--span', type=int, default=2,
+                        help='number of pools in request of requestor and requestors.')
+    parser.add_argument('--hold', type=hold_time, nargs='+', default=['0'],
+                        help='hold time distributions: S, const:S, uniform:A:B, exp:MEAN, lognormal:MEDIAN:SIGMA.')
+    parser.add_argument('--wait', type=float, default=-1,
+                        help='seconds request may wait; -1 waits forever.')
+    parser.add_argument('--duration', type=float, default=2.0,
+                        help='seconds each scenario runs.')
+    parser.add_argument('--policy', type=str, nargs='*', default=[], metavar='KEY=VALUE',
+                        help='ResourcePool policy, e.g., waiter_scheduler=priority fast_path=false.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of request mix and hold times.')
+    parser.add_argument('--trace-memory', action='store_true', dest='trace_memory',
+                        help='trace peak memory allocated with tracemalloc.')
+    parser.add_argument('--save', type=str, metavar='FILE',
+                        help='save results as JSON baseline.')
+    parser.add_argument('--baseline', type=str, metavar='FILE',
+                        help='compare results with JSON baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='fraction throughput may drop, or p99 latency grow, before it regresses.')
+    
+def scenarios(args):
+    policy=_parse_policy(args.policy)
+    for target, pool_size, mix, hold, threads in itertools.product(args.target, args.pool_size, args.mix, args.hold, args.threads):
+        yield Scenario(target=target, threads=threads, pools=args.pools, pool_size=pool_size, mix=mix, span=args.span,
+                       hold=hold, wait=args.wait, duration=args.duration, policy=policy, seed=args.seed)
+
+def main(args):
+    ''' runs scenarios of args, prints results, saves and compares them.
+    
+    Returns:
+        exit status: 1 if any scenario regressed from baseline; 0 otherwise.
+    '''
+    baseline=load(args.baseline) if args.baseline else None
+    results=dict()
+    print('%-44s %10s %8s %9s %9s %9s %6s %7s %8s %9s' % ('scenario', 'req/s', 'timeouts', 'p50 ms', 'p99 ms', 'max ms', 'jain', 'min/max', 'rss KB', 'traced KB'))
+    for scenario in scenarios(args):
+        name=scenario_name(scenario)
+        result=run(scenario, trace_memory=args.trace_memory)
+        results[name]=result
+        latency=result['latency']
+        memory=result['memory']
+        traced='%.0f' % memory['traced_peak_kb'] if memory['traced_peak_kb'] is not None else '-'
+        print('%-44s %10.0f %8d %9.3f %9.3f %9.3f %6.3f %7.3f %8d %9s' % (name, result['throughput'], result['timeouts'], latency['p50'] * 1e3, 
+              latency['p99'] * 1e3, latency['max'] * 1e3, result['fairness']['jain'], result['fairness']['min_max'], memory['rss_growth_kb'], traced))
+    if args.save:
+        save(results, args.save)
+    if baseline is not None:
+        regressions=compare(results, baseline, tolerance=args.tolerance)
+        for regression in regressions: print('REGRESSION %s' % (regression,))
+        if regressions: return 1
+    return 0
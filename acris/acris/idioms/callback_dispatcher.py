@@ -0,0 +1,92 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import threading
+import logging
+import queue
+import os
+
+logger=logging.getLogger(__name__)
+
+class CallbackDispatcherError(Exception): pass
+
+class CallbackDispatcher(object):
+    ''' Small, fixed set of threads calling callbacks handed to it.
+
+    Callbacks are called in order of dispatch when there is a single
+    worker.  With more workers, callbacks may run concurrently.
+
+    Callbacks should be short; a blocking callback holds a worker
+    and delays callbacks behind it.
+    '''
+
+    workers=2
+
+    def __init__(self, workers=None):
+        if workers is not None: self.workers=workers
+        if self.workers < 1:
+            raise CallbackDispatcherError("Dispatcher needs at least one worker, but got: %s" % self.workers)
+        self.__lock=threading.Lock()
+        self.__reset()
+
+    def __reset(self):
+        self.__queue=queue.SimpleQueue()
+        self.__threads=list()
+        self.__pid=os.getpid()
+
+    def __start_threads(self):
+        with self.__lock:
+            if self.__pid != os.getpid():
+                # forked; callbacks pending in parent are not carried to child.
+                self.__reset()
+            if self.__threads: return
+            for i in range(self.workers):
+                thread=threading.Thread(target=self.__run, name='CallbackDispatcher-%s' % i, daemon=True)
+                thread.start()
+                self.__threads.append(thread)
+
+    def dispatch(self, callback, *args):
+        ''' queues callback to be called with args by one of the workers
+        '''
+        if not self.__threads or self.__pid != os.getpid(): self.__start_threads()
+        self.__queue.put((callback, args))
+
+    def __run(self):
+        while True:
+            callback, args=self.__queue.get()
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.exception("Dispatched callback %s failed: %s" % (callback, repr(e)))
+
+__callback_dispatcher=None
+__callback_dispatcher_lock=threading.Lock()
+
+def get_callback_dispatcher():
+    ''' Returns the callback dispatcher shared by the whole process.
+    '''
+    global __callback_dispatcher
+    if __callback_dispatcher is None:
+        with __callback_dispatcher_lock:
+            if __callback_dispatcher is None:
+                __callback_dispatcher=CallbackDispatcher()
+    return __callback_dispatcher
@@ -20,850 +20,490 @@
 #
 ##############################################################################
 
-from acris import NamedSingleton
-from acris import Sequence
-from acris import MergedChainedDict
-from acris import Threaded
+''' Cluster-wide resource pools.
+
+A broker process holds ResourcePool objects and serves them with
+ResourcePoolServer.  Clients in other processes, or on other hosts, connect
+with ResourcePoolClient over TCP or Unix socket, and use RemotePool much as
+they would use a local ResourcePool.
+
+Protocol is newline delimited JSON.  Each request carries an id, and its
+reply carries the same id.  Replies may come out of order, so any number of
+requests may be in flight on one connection (pipelining).
+
+    {"id": 1, "op": "hello", "client": "worker-1", "keepalive": 5.0}
+    {"id": 2, "op": "get", "pool": "RP1", "count": 2, "wait": -1}
+    {"id": 2, "resources": [[17, "MyResource"], [18, "MyResource"]]}
+    {"id": 3, "op": "put", "pool": "RP1", "resources": [17, 18]}
+    {"id": 3, "ok": true}
+    {"id": 4, "op": "ping"}
+    {"id": 5, "op": "get", "pool": "RP1", "count": 1, "notify": true}
+    {"id": 5, "ticket": ["RP1", 42]}
+    {"id": 6, "op": "get", "pool": "RP1", "ticket": ["RP1", 42]}
+    {"id": 9, "error": "..."}
+
+Client sends ping every keepalive seconds.  If server hears nothing from
+client for keepalive_misses keepalive periods, or connection is lost, all
+resources held by client are returned to their pools, reservations of
+tickets sent to it are collected and returned, and resources reserved for
+it later are returned as soon as they are reserved.
+'''
+
+from acris.idioms.resource_pool import ResourcePoolError, Ticket
+from acris.idioms.timer_wheel import get_timer_wheel
+from acris.idioms.callback_dispatcher import get_callback_dispatcher
+from concurrent.futures import Future
+import socketserver
 import threading
-from collections import OrderedDict
-import queue
-from acris import traced_method
-import time
+import itertools
+import functools
 import logging
-import inspect
-from collections import namedtuple
-from acris import LogCaller
+import socket
+import json
+import time
 
 logger=logging.getLogger(__name__)
 
-traced=traced_method(logger.debug, True)
+def _encode(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode('utf-8')
 
-class ResourcePoolError(Exception): pass
-class RequestNotFound(Exception): pass
+def _connect(address):
+    if isinstance(address, str):
+        sock=socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.connect(address)
+    return sock
 
-class Resource(object):  
+class ClientSession(socketserver.StreamRequestHandler):
+    ''' Server side of a client connection.
 
-    def __init__(self, *args, **kwargs):
-        '''Instantiate Resource to used in Resource Pool
-        
-        Args:
-            name: resource name
-        '''
-        self.args=args
-        self.kwargs=kwargs
-        #self.id_=resource_id_sequence()
-        self.resource_name=self.__class__.__name__
-        self.pool=None
-        
-    def setattrib(self, name, value):
-        setattr(self, name, value)
-        return self
-        
-    def __repr__(self):
-        result="Resource(name:%s.%s)" % (self.pool, self.resource_name,)
-        return result 
-        
-Ticket=namedtuple('Ticket', ['pool_name', 'sequence'])
-
-
-class ResourcePool(NamedSingleton): 
-    ''' Singleton pool to managing resources of multiple types.
-    
-    ResourcePool uses Singleton characteristics to maintain pool per resource name.
-    
-    Pool policy:
-        If there is resource in the pool: provide
-        If there is no resource in the pool:
-            if limitless, manufacture new by provided resourceFactory
-            if limited:
-                if nowait: return empty
-                if wait with no time limit: wait until resource is available.
-                if wait with time limit: halt wait and return with resource if available or empty
-                if callback, reserve resource and notify availability with reference to reserved resource
-                
-    Policy can only be set one immediately after initialization.
-    
+    Requests are read and handled in order on the session's thread;
+    requests that wait on resources are answered later from callbacks, so
+    reading goes on while they wait.
     '''
-    
-    __policy = {'autoload': True, # automatically load resources when fall behind
-                'load_size': 1, # when autoload, number of resources to load
-                'resource_limit': -1, # max resources available
-        }
-    
-    __allow_set_policy=True
-    __resource_pool_lock=threading.Lock()
-    
-    __name=''
-    
-    __ticket_sequence=Sequence('ResourcePool_ticket')
-    __pool_id_sequence=Sequence('ResourcePool_pool_id')
-    
-    def __init__(self, name='', resource_cls=Resource, policy={}):
-        # sets resource pool policy overriding defaults
-        self.name=name
-        self.__resource_cls=resource_cls
-        self.__available_resources=list()
-        self.__awaiting=OrderedDict()
-        self.__reserved=OrderedDict()
-        self.__inuse_resources=list()
-        self.__id=self.__pool_id_sequence()
-        #self.mutex = threading.RLock()
-        #self.__ticket_sequence=Sequence("ResourcePool.%s" % (resource_cls.__name__, ))
-        
-        if self.__allow_set_policy:
-            self.__policy=MergedChainedDict(policy, self.__policy)
-        else:
-            #self.__lock.release()
-            raise ResourcePoolError("ResourcePool already in use, cannot set_policy")
-        
-    def __repr__(self):
-        return "ResourcePool( class: %s, policy: %s)" % (self.__resource_cls.__name__, self.__policy)
-    
-    @traced
-    def __sync_acquire(self):
-        #(frame, filename, line_number,
-        # function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        #logger.debug("ResourcePool Acquiring Lock; %s.%s(%s)" % (filename, function_name, line_number))
-        self.__resource_pool_lock.acquire()
-        
-    @traced
-    def __sync_release(self):
-        #(frame, filename, line_number,
-        # function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        #logger.debug("ResourcePool Releasing Lock; %s.%s(%s)" % (filename, function_name, line_number))
-        self.__resource_pool_lock.release()
-        
-    def __load(self, sync=False, count=-1):
-        ''' loads resources into pool
-        '''
-        if sync: self.__sync_acquire()
-        self.__allow_set_policy=False
-        if count is None or count < 0:
-            load_size=self.__policy['load_size']
-            resource_limit=self.__policy['resource_limit']
-            count=min(load_size, resource_limit) if resource_limit >=0 else load_size
-        
-        count=count-len(self.__available_resources) 
-        logger.debug('Loading %s resources' % count)
-        if count > 0: 
-            for _ in range(count):
-                resource=self.__resource_cls()
-                resource.pool=self.name
-                self.__available_resources.append(resource)
-        if sync: self.__sync_release()          
-    
-    def load(self, count=-1):
-        ''' loads resources into pool
-        '''
-        self.__load(sync=True, count=-1)         
-        return self
-    
-    def __remove_ticket(self, ticket, sync=False):
-        if sync: self.__sync_acquire()
-        logger.debug("Removing reservation ticket: %s, %s" % (ticket, repr(self.__reserved)))
-        del self.__reserved[ticket]
-        if sync: self.__sync_release()
-    
-    @Threaded()
-    def __wait_on_condition_callback(self, condition, seconds, ticket, callback):
-        logger.debug("%s waiting on condition callback: ticket: %s:" % (self.name,ticket,))     
+
+    def setup(self):
+        super().setup()
+        if self.server.address_family != socket.AF_UNIX:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.client_name=str(self.client_address or self.server.server_address)
+        self.alive=True
+        self.last_seen=time.monotonic()
+        self.keepalive_timeout=None
+        self.__keepalive_timer=None
+        self.__lock=threading.Lock()
+        self.__held=dict() # pool name to dict of resource id to resource
+        self.__tickets=dict() # ticket sent to client to (pool, resources reserved by session or None, timer)
+        self.__session_tickets=itertools.count(1)
+        self.__pools=self.server.pool_server.pools
+        self.__timer_wheel=get_timer_wheel()
+
+    def __send(self, message):
+        data=_encode(message)
+        with self.__lock:
+            if not self.alive: return
+            try:
+                self.request.sendall(data)
+            except OSError as e:
+                logger.debug("%s send failed: %s" % (self.client_name, repr(e)))
+
+    def handle(self):
+        for line in self.rfile:
+            self.last_seen=time.monotonic()
+            try:
+                message=json.loads(line)
+            except ValueError:
+                logger.error("%s sent malformed request: %s" % (self.client_name, line[:100]))
+                break
+            message_id=message.get('id')
+            try:
+                handler=getattr(self, '_op_%s' % message.get('op'))
+            except AttributeError:
+                self.__send({'id': message_id, 'error': "Unknown op: %s" % (message.get('op'),)})
+                continue
+            try:
+                handler(message_id, message)
+            except ResourcePoolError as e:
+                self.__send({'id': message_id, 'error': str(e)})
+            except Exception as e:
+                logger.exception("%s request %s failed" % (self.client_name, message))
+                self.__send({'id': message_id, 'error': repr(e)})
+
+    def finish(self):
+        with self.__lock:
+            self.alive=False
+            held, self.__held=self.__held, dict()
+            tickets, self.__tickets=self.__tickets, dict()
+        if self.__keepalive_timer is not None:
+            self.__timer_wheel.cancel(self.__keepalive_timer)
+        returned=0
+        for ticket, (pool, resources, timer) in tickets.items():
+            if timer is not None: self.__timer_wheel.cancel(timer)
+            if resources is None:
+                # reserved by pool; resources reserved by session are held.
+                resources=pool.get(ticket=ticket)
+                if resources: 
+                    returned+=len(resources)
+                    pool.put(*resources)
+        for pool_name, resources in held.items():
+            if not resources: continue
+            returned+=len(resources)
+            self.__pools[pool_name].put(*resources.values())
+        if returned:
+            logger.warning("%s disconnected; returned %s held resources" % (self.client_name, returned))
         try:
-            with condition:
-                condition.wait(seconds)
-        except RuntimeError:
+            super().finish()
+        except OSError:
             pass
-        except Exception as e:
-            raise e   
-        logger.debug("%s woke up from condition callback: ticket: %s:" % (self.name,ticket,))     
-        callback(ticket)
-        
-    def __wait_on_condition_here(self, condition, seconds, ticket):
-        logger.debug("%s waiting on condition here: ticket: %s:" % (self.name,ticket,))     
+
+    def __check_keepalive(self):
+        silence=time.monotonic() - self.last_seen
+        if silence < self.keepalive_timeout:
+            self.__keepalive_timer=self.__timer_wheel.schedule(self.keepalive_timeout - silence, self.__check_keepalive)
+            return
+        logger.warning("%s silent for %.1f seconds; dropping client" % (self.client_name, silence))
         try:
-            with condition:
-                condition.wait(seconds)
-        except RuntimeError:
+            self.request.shutdown(socket.SHUT_RDWR)
+        except OSError:
             pass
-        except Exception as e:
-            raise e
-        
-        # process finished waiting either due to time passed
-        # or that resources were reserved.  
-        # Hence, try to pick reserved resources
-        result=self.__reserved.get(ticket, None)
-        if result: 
-            self.__remove_ticket(ticket)
-
-        return result
-            
-    def __wait(self, sync, count, wait, callback=None):
-        ''' waits for count resources, 
-        
-        wait uses condition object.  put method would use 
-        the same condition object to notify wait of resources 
-        reserved for this request.
-        
-        It is assumed that calling process is separated thread.  
-        Otherwise, process deadlocks.
-        
-        Args:
-            sync: (boolean) work in object synchronized, if set
-            count: number of resources to wait on
-            callback: callable to call back once resources are available
-            
-        Returns:
-            list of resources, if callback is not provided (None)
-            reservation ticked to use once called back, if callback is provided.
-        
+
+    def __pool(self, message):
+        try:
+            return self.__pools[message['pool']]
+        except KeyError:
+            raise ResourcePoolError("Unknown pool: %s" % (message.get('pool'),))
+
+    def __keep(self, pool, resources):
+        # called with lock held; resources pool reclaimed as their lease 
+        # expired are no longer client's.
+        held=self.__held.setdefault(pool.name, dict())
+        reclaimed=[id_ for id_, resource in held.items() if resource.reclaimed]
+        for id_ in reclaimed: del held[id_]
+        held.update([(resource.id_, resource) for resource in resources])
+
+    def __hand(self, message_id, pool, resources):
+        # resources reserved for a client gone are not handed, but returned.
+        with self.__lock:
+            alive=self.alive
+            if alive: self.__keep(pool, resources)
+        if not alive:
+            if resources: pool.put(*resources)
+            return
+        self.__send({'id': message_id, 'resources': [[resource.id_, resource.resource_name] for resource in resources]})
+
+    def __send_ticket(self, message_id, pool, ticket, resources=None, hold_time=None):
+        ''' sends ticket to client, to collect resources reserved by pool, or
+        by session (resources); reservation is returned if client is gone.
         '''
-        seconds=None if wait <0 else wait
-        condition = threading.Condition()
-        caller=callback.name if hasattr(callback, 'name') else ""
-        ticket=Ticket(self.name, self.__ticket_sequence())
-        self.__awaiting[ticket]=(condition, count, caller,)
-        
-        if sync: self.__sync_release()
-        
-        if not callback:
-            result=self.__wait_on_condition_here(condition, seconds, ticket)
-            logger.debug('%s received result from condition here: %s' %(self.name, repr(result)))
+        with self.__lock:
+            alive=self.alive
+            if alive:
+                timer=None
+                if resources is not None:
+                    self.__keep(pool, resources)
+                    if hold_time is not None and hold_time >= 0:
+                        timer=self.__timer_wheel.schedule(hold_time, self.__expire_reservation, ticket)
+                self.__tickets[ticket]=(pool, resources, timer)
+        if alive:
+            self.__send({'id': message_id, 'ticket': list(ticket)})
+        else:
+            if resources is None: resources=pool.get(ticket=ticket)
+            if resources: pool.put(*resources)
+
+    def __expire_reservation(self, ticket):
+        with self.__lock:
+            reservation=self.__tickets.pop(ticket, None)
+            if reservation is None: return
+            pool, resources, _=reservation
+            held=self.__held.get(pool.name, dict())
+            for resource in resources: held.pop(resource.id_, None)
+        if resources:
+            logger.info("%s reservation %s was not collected in time; returning %s resources to pool" % (self.client_name, ticket, len(resources)))
+            pool.put(*resources)
+
+    def __reserved(self, message_id, pool, notify, ticket):
+        # called from CallbackDispatcher once resources are reserved, or wait passed.
+        if notify:
+            self.__send_ticket(message_id, pool, ticket)
         else:
-            self.__wait_on_condition_callback(condition, seconds, ticket, callback)
-            result=None
-         
-        return result
-
-    def _get(self, sync=False, count=1, wait=-1, callback=None, hold_time=None, ticket=None):
-        self.__allow_set_policy=False
-        
+            self.__hand(message_id, pool, pool.get(ticket=ticket))
+
+    def _op_hello(self, message_id, message):
+        self.client_name="%s%s" % (message.get('client', ''), self.client_address or '')
+        keepalive=message.get('keepalive')
+        if keepalive:
+            self.keepalive_timeout=keepalive * self.server.pool_server.keepalive_misses
+            self.__keepalive_timer=self.__timer_wheel.schedule(self.keepalive_timeout, self.__check_keepalive)
+        self.__send({'id': message_id, 'ok': True, 'pools': list(self.__pools.keys())})
+
+    def _op_ping(self, message_id, message):
+        self.__send({'id': message_id, 'ok': True})
+
+    def _op_get(self, message_id, message):
+        pool=self.__pool(message)
+        ticket=message.get('ticket')
         if ticket is not None:
-            # process finished waiting either due to time passed
-            # or that resources were reserved.  
-            # Hence, try to pick reserved resources
-            logger.debug("%s Addressing get with ticket %s" % (self.name, ticket))
-            result=self.__reserved.get(ticket, None)
-            if result: 
-                logger.debug("%s found ticket %s" % (self.name, ticket))
-                self.__remove_ticket(ticket=ticket, sync=sync)
-                return result
+            ticket=Ticket(*ticket)
+            with self.__lock:
+                _, resources, timer=self.__tickets.pop(ticket, (None, None, None))
+            if timer is not None: self.__timer_wheel.cancel(timer)
+            if resources is None:
+                self.__hand(message_id, pool, pool.get(ticket=ticket))
             else:
-                logger.debug("%s ticket %s not fond" % (self.name, ticket))
-                     
-        resource_limit=self.__policy['resource_limit']
-        if resource_limit > -1 and count >resource_limit:
-            raise ResourcePoolError("Trying to get count (%s) larger than resource limit (%s)" % (count, resource_limit))
-        
-        if sync: self.__sync_acquire()
-        
-        #activate_on_get=self.__policy['activate_on_get']
-        # If there are awaiting processes, wait too, and this call is not after
-        # put (for an awated process).
-        if len(self.__awaiting) > 0 and sync:
-            logger.debug("%s already has waiting list, adding this request" % (self.name,))
-            resources=self.__wait(sync=sync, count=count, wait=wait, callback=callback)
-            #if activate_on_get: self.__activate_allocated_resource(resources)
-            return resources
-        
-        # try to see if request can be addressed by existing or by loading new 
-        # resources.
-        available_loaded=len(self.__available_resources)
-        inuse_resources=len(self.__inuse_resources)
-        hot_resources=available_loaded+inuse_resources
-        missing_to_serve=count-available_loaded
-        if missing_to_serve < 0: missing_to_serve=0
-        allowed_to_load=resource_limit-hot_resources if resource_limit > 0 else missing_to_serve
-        
-        to_load=min(missing_to_serve, allowed_to_load)
-        
-        #print("TOLOAD: %s (available_loaded: %s, missing_to_serve: %s, allowed_to_load: %s, inuse_resources %s, hot_resources: %s)" % \
-        #      (to_load, available_loaded, missing_to_serve, allowed_to_load, inuse_resources, hot_resources))
-        
-        if to_load > 0:
-            logger.debug("%s needs to load additional resources: %s" % (self.name, to_load))
-            self.__load(sync=False, count=to_load)
-            
-        # if resources are available to serve the request, do so.
-        # if not, and there is wait, then do wait.
-        # otherwise return no resources.
-        if len(self.__available_resources) >= count:
-            logger.debug("%s serving request directly: %s" % (self.name, count))
-            # There are enough resources to serve!
-            resources=self.__available_resources[:count]
-            self.__available_resources=self.__available_resources[count:]
-            self.__inuse_resources.extend(resources)
-            if sync: self.__sync_release()
-        elif wait != 0:
-            # No resources.  But need to wait.
-            logger.debug("%s cannot serve directly, waiting for availability" % (self.name))
-            resources=self.__wait(sync=sync, count=count, wait=wait, callback=callback)
+                self.__send({'id': message_id, 'resources': [[resource.id_, resource.resource_name] for resource in resources]})
+            return
+        notify=message.get('notify', False)
+        callback=functools.partial(self.__reserved, message_id, pool, notify)
+        resources=pool.get(count=message.get('count', 1), wait=message.get('wait', -1), callback=callback,
+                           hold_time=message.get('hold_time'), expire=message.get('expire'))
+        if resources is None: return
+        if notify:
+            # served at once; client expects a ticket, so session reserves
+            # resources for it.  Session tickets are negative, apart from pool's.
+            ticket=Ticket(pool.name, -next(self.__session_tickets))
+            self.__send_ticket(message_id, pool, ticket, resources, message.get('hold_time'))
         else:
-            # No resources and no need to wait; we are done!
-            logger.debug("%s no availability and no wait" % (self.name))
-            resources=[]
-            if sync: self.__sync_release()
-            pass
-        
-        return resources
-    
-    def get(self, count=1, wait=-1, callback=None, hold_time=None, expire=None, ticket=None):
-        ''' retrieve resource from pool
-        
-        get checks for availability of count resources. If available: provide.
-        If not available, and no wait, return empty
-        If wait, wait for a seconds.  If wait < 0, wait until available.
-        If about to return empty and callback is provided, register reserved with hold_time.
-        When reserved, callback will be initiated with reservation_ticket.  The receiver, must call
-        get(reservation_ticket=reservation_ticket) again to collect reserved resources.
-        
-        Important, when using wait, it is assumed that calling process is separated thread.  
-        Otherwise, process deadlocks.
-
-        Warnings: 
-            1. if count > resource_limit, call will be rejected.  
-            2. if count > 1 and resources are limited due to high activity or 
-                clients not putting back resources, caller may be in deadlock.
-            
-        Args:
-            count: number of resource to grab 
-            wait: number of seconds to wait if none available. 
-                0: don't wait
-                negative: wait until available
-                positive: wait period
-            callback: notify that resources are available to collect
-            hold_time: seconds to hold reserve resources on callback.  
-                If not collected in within the specify period, reserved go
-                back to pull.
-            expire: seconds to limit use of resources
-            ticket: reserved ticket provided in callback to allow client pick their 
-                reserved resources. 
-            
-        Raises:
-            ResourcePoolError
-        '''
-        
-        # some validation:
-        if callback and not callable(callback):
-            raise ResourcePoolError("Callback must be callable, but it is no: %s" % repr(callback))
-        
-        result=self._get(sync=True, count=count, wait=wait, callback=callback, hold_time=hold_time, ticket=ticket)
-        logger.debug("%s got result from get: %s" % (self.name, result))
-        return result
+            self.__hand(message_id, pool, resources)
 
-    
-    def __activate_allocated_resource(self, resources):
-        for resource in resources:
-            try:
-                if not resource.active: resource.activate()
-            except Exception as e:
-                raise e
-                   
-    def put(self, *resources):
-        ''' adds resource to this pool
-        
-        Args:
-            resource: Resource object to be added to pool
-        '''
-        
-        # validate that all resources provided are legal
-        self.__sync_acquire()
-        pool_resource_name=self.__resource_cls.__name__
-        
-        for resource in resources: 
-            resource_name=resource.__class__.__name__
-            if pool_resource_name != resource_name:
-                raise ResourcePoolError("ResourcePool resource class (%s) doesn't match returned resource (%s)" % \
-                                        (pool_resource_name, resource_name))
-                
-        # deposit resource back to available
-        resources=list(resources)
-        count=len(resources)       
-        self.__available_resources.extend(self.__inuse_resources[:count])
-        self.__inuse_resources=self.__inuse_resources[count:]        
-        
-        for ticket, (condition, count, caller) in list(self.__awaiting.items()):
-            logger.debug("%s, %s found %s awaiting; require: %s, available: %s:" % (caller, self.name, ticket, count, len(self.__available_resources)))
-            if count <= len(self.__available_resources):
-                self.__reserved[ticket]=self._get(count=count)
-                with condition:
-                    logger.debug("%s, %s notifying: %s:" % (caller, self.name, ticket,))
-                    condition.notify()
-                del self.__awaiting[ticket]
-            else:
-                # this is an interesting scenario.
-                # e.g., first awaiting for 3 resources. But there is only one available.
-                #       second awaits for 1 resources.  If we serve it, first will have 
-                #       to wait longer.  If we don't, first is holding the line.
-                #       Predictive module will learn if it is better to hold the line,
-                #       
-                break
-        self.__sync_release()      
+    def _op_put(self, message_id, message):
+        pool=self.__pool(message)
+        with self.__lock:
+            held=self.__held.get(pool.name, dict())
+            ids=message['resources']
+            # all ids are checked before any is popped, so a rejected put 
+            # leaves every resource held.
+            missing=[id_ for id_ in ids if id_ not in held]
+            if missing:
+                raise ResourcePoolError("Resources %s not held by %s from pool %s" % (missing, self.client_name, pool.name))
+            if len(set(ids)) < len(ids):
+                repeated=set([id_ for id_ in ids if ids.count(id_) > 1])
+                raise ResourcePoolError("Resources returned more than once: %s" % (list(repeated),))
+            resources=[held.pop(id_) for id_ in ids]
+        pool.put(*resources)
+        self.__send({'id': message_id, 'ok': True})
 
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads=True
+    allow_reuse_address=True
 
-class RequestorCallback(object):
-    def __init__(self, notify_queue):
-        self.q=notify_queue
-    def __call__(self, ticket=None):
-        logger.debug('RequestorCallback notifying ticket: %s' %(ticket,))
-        self.q.put(ticket)
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads=True
 
-class Requestor(object):
-    ''' Manages a single request of multiple resource pools
+class ResourcePoolServer(object):
+    ''' Serves ResourcePool objects to clients over TCP or Unix socket.
+
+    Each client connection is served by its own thread; waiting requests
+    do not hold threads.
     '''
-        
-    def __init__(self, request, wait=-1, callback=None, hold_time=None, expire=None, audit=True):
-        '''Initialize requestor object to manage request from multiple pools
-        
+
+    keepalive_misses=3
+
+    def __init__(self, pools, address=('127.0.0.1', 0)):
+        ''' creates server; server does not accept clients until started.
+
         Args:
-            request: iterator on tuples of resource pool object and quantity of resources required
-            wait: seconds to wait for resources
-            callback: callable to callback when resources are reserved
-            hold_time: how long to hold resources in reserved
-            expire: seconds to limit use of resources.
-            audit: if True, ensures resources returned are from the same requestor 
-            
+            pools: iterator on ResourcePool objects to serve, by name.
+            address: (host, port) to listen on TCP, or path to listen on Unix socket.
         '''
-        self.__request=dict([(r.name, (r,count)) for r, count in request])
-        self.__wait=wait
-        self.__callback=callback
-        self.__hold_time=hold_time
-        self.__notify_queue=queue.Queue()
-        self.__tickets=list()
-        self.__resources=dict()
-        self.__reserved=False
-        self.__resource_pool_requestor_lock=threading.Lock()
-        self.__collect_resources_started=False
-        self.__audit=audit
-        if callback and hasattr(callback, 'name'):
-            self.__client_name=callback.name
-        else: self.__client_name=''
-        self.__get()
-    
-    def __sync_acquire(self):
-        (frame, filename, line_number,
-         function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        logger.debug("ResourcePoolRequestor Acquiring Lock; %s.%s(%s)" % (filename, function_name, line_number))
-        self.__resource_pool_requestor_lock.acquire()
-        
-    def __sync_release(self):
-        (frame, filename, line_number,
-         function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        logger.debug("ResourcePoolRequestor Releasing Lock; %s.%s(%s)" % (filename, function_name, line_number))
-        self.__resource_pool_requestor_lock.release()
-
-    def __is_reserved(self):
-        ''' Returns True if all resources are collected
+        self.pools=dict([(pool.name, pool) for pool in pools])
+        server_cls=_UnixServer if isinstance(address, str) else _TCPServer
+        self.__server=server_cls(address, ClientSession)
+        self.__server.pool_server=self
+        self.__thread=None
+
+    @property
+    def address(self):
+        ''' address server listens on; with port 0, the port picked.
         '''
-        missings=set(self.__request.keys()) - set(self.__resources.keys())
-        self.__reserved=len(missings) ==0
-        #if not self.__reserved:
-        #    logger.debug("%s missing resources %s" %(self.__client_name, missings))
-        return self.__reserved
-        
-    def is_reserved(self):
-        ''' Returns True if all resources are collected
+        return self.__server.server_address
+
+    def serve_forever(self):
+        self.__server.serve_forever()
+
+    def start(self):
+        ''' serves clients from a background thread
         '''
-        return self.__reserved
-        
-    def __get(self):
-        callback=RequestorCallback(self.__notify_queue) if self.__callback else None
-        for rp, count in self.__request.values():
-            logger.debug("%s requesting resources %s(%s)" %(self.__client_name, rp.name, count))
-            response=rp.get(count=count, wait=self.__wait, callback=callback, hold_time=self.__hold_time)
-            
-            if response:
-                logger.debug("%s received resources %s" %(self.__client_name, response))
-                self.__resources[rp.name]=response
-                
-        if not self.__is_reserved():
-            go_collect=False
-            self.__sync_acquire()
-            if not self.__collect_resources_started:
-                go_collect=True
-                self.__collect_resources_started=True
-            self.__sync_release()
-            if go_collect:
-                logger.debug("%s going to collect missing resources" % (self.__client_name, ))
-                self.__collect_resources()   
-        else:
-            self.__notify_collected()
-    
-    @Threaded()
-    def __collect_resources(self):
-        start_time=time.time()
-        go=True
-        wait=self.__wait if self.__wait is None or self.__wait >=0 else None
-        while go:
-            logger.debug("%s trying to get from notify queue (wait: %s)" %(self.__client_name, wait))
-            try:
-                ticket=self.__notify_queue.get(timeout=wait)
-            except queue.Empty:
-                ticket=None
-            
-            if ticket is not None:
-                rp_name=ticket.pool_name
-                rp, _=self.__request[rp_name]
-                resources=rp.get(ticket=ticket)
-                logger.debug("Collected resources %s" %(resources))
-                self.__resources[rp_name]=resources
-                #self.__resources[rp_name]=dict([(r.id_, r) for r in resources])
-                
-            time_passed=time.time() - start_time
-            if self.__wait and self.__wait >0:
-                wait=self.__wait - time_passed
-                go=wait > 0
-            logger.debug("%s all reserved %s" % (self.__client_name, self.__is_reserved(),))
-            go=go and not self.__is_reserved()
-        
-        if self.__is_reserved():
-            self.__notify_collected()
-        else:
-            logger.debug("%s couldn't collect all resources, releasing collected." % (self.__client_name,))
-            for rp_name, resources in list(self.__resources.items()):
-                rp, _=self.__request[rp_name]
-                #returning=list(resources.values())
-                rp.put(*resources)
-                del self.__resources[rp_name]              
-                 
-    def __notify_collected(self):
-        if self.__is_reserved() and self.__callback:
-            self.__callback(True)
-                  
-    def get(self,):
-        result=None
-        if self.__is_reserved():
-            result=list()
-            for k, r in list(self.__resources.items()): 
-                result.extend(r) 
-                #if not self.__audit: del self.__resources[k]
-             
-        return result 
-            
-    def put(self, *resources):
-        logger.debug("%s putting back resources %s" % (self.__client_name, repr(resources)))
-        
-        # ensure resources returned are in alignment with this container.
-        #resource_to_return=list()
-        resource_count=dict()
-        for resource in resources:
-            rp_name=resource.pool 
-            try:
-                count=resource_count[rp_name]
-            except KeyError:
-                count=list()
-                resource_count[rp_name]=count
-            count.append(resource)
-            
-        for rp_name, count in list(resource_count.items()):
-            logger.debug("%s ResourcePool %s removing %s resources" % (self.__client_name, rp_name, count))
-            rp_resources=self.__resources[rp_name]
-            self.__resources[rp_name]=rp_resources[len(count):]
-            rp, _ = self.__request[rp_name]
-            rp.put(*count)    
-            
-    def put_requested(self, request):
-        self.__sync_acquire()
-        logger.debug("putting back request: %s" % (repr(request)))
-        
-        # ensure resources returned are in alignment with this container.
-        #resource_to_return=list()
-        for rp, count in request:
-            logger.debug("ResourcePool %s removing %s resources" % (rp.name, count))
-            resources=self.__resources[rp.name]
-            #pool=self.__pools[rp.name]
-            to_return=resources[:count]
-            rp.put(*to_return)
-            del resources[:count]
-        
-        self.__sync_release()
-                    
-    def __del__(self):
-        # need to make sure all resources are returned
-        for rp_name, resources in list(self.__resources.items()):
-            rp, _ = self.__request[rp_name]
-            rp.put(*resources)
-                
-        # TODO: notify ResourcePool that not waiting on resources anymore.
-
-
-class RequestorsCallback(object):
-    def __init__(self, notify_queue, request_id):
-        self.q=notify_queue
-        self.request_id=request_id
-    def __call__(self, ticket=None):
-        logger.debug('RequestorsCallback notifying request id %s ticket: %s' % (self.request_id, ticket, ))
-        self.q.put( (ticket, self.request_id,) )
-         
-Pool=namedtuple('Pool', ['pool', 'reserved', 'inuse'])
-
-class Requestors(object):
-    ''' Manages multiple requests from multiple resource pools
+        self.__thread=threading.Thread(target=self.serve_forever, name='ResourcePoolServer', daemon=True)
+        self.__thread.start()
+        return self
+
+    def shutdown(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+class RemoteResource(object):
+    ''' Handle of resource held from pool on ResourcePoolServer.
     '''
-    
-    __request_id=Sequence("Requestors_request_id")
-    
-    class Request(object):
-        def __init__(self, request_id, request, wait=-1, callback=None, hold_time=None, expire=None):
-            self.request_id=request_id
-            self.request=dict([(r.name, (r,count)) for r, count in request])
-            self.wait=wait
-            self.callback=callback
-            self.hold_time=hold_time
-            self.reserved=False
-            self.fetched=False
-            self.resources=dict()
-            self.start_time=time.time()
-            if callback and hasattr(callback, 'name'):
-                self.client_name=callback.name
-            else: self.client_name=''
-            
-        def __repr__(self):
-            return "%s" %(self.request_id, )
-        
-    def __init__(self, audit=False):
-        self.__audit=audit
-        self.__pools=dict() # mapping for pool names to namedtuple of pool, requestor, and resources
-        self.__requests=dict()
-        self.__notify_queue=queue.Queue()
-        self.__resource_pool_requestor_lock=threading.Lock()
-        self.__collect_resources_started=False
-        
-    def reserve(self, request, wait=-1, callback=None, hold_time=None, expire=None,):
-        '''Initialize requestor object to manage request from multiple pools
-        
+
+    def __init__(self, pool, id_, resource_name):
+        self.pool=pool
+        self.id_=id_
+        self.resource_name=resource_name
+
+    def __repr__(self):
+        return "RemoteResource(name:%s/%s)" % (self.resource_name, self.id_)
+
+class ResourcePoolClient(object):
+    ''' Connection to ResourcePoolServer.
+
+    Client is thread safe; requests from all threads share its connection,
+    and are answered as soon as server answers them.
+    '''
+
+    def __init__(self, address, name='', keepalive=5.0, timeout=10.0):
+        ''' connects to server
+
         Args:
-            request: iterator on tuples of resource pool object and quantity of resources required
-            wait: seconds to wait for resources
-            callback: callable to callback when resources are reserved
-            hold_time: how long to hold resources in reserved
-            expire: seconds to limit use of resources.
-            audit: if True, ensures resources returned are from the same requestor 
-            
-        '''
-        request_id=self.__request_id()
-        self.__requests[request_id]=self.Request(request_id=request_id, request=request, wait=wait, callback=callback, hold_time=hold_time, expire=expire)        
-        self.__get(request_id)
-        return request_id
-    
-    def __sync_acquire(self):
-        (frame, filename, line_number,
-         function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        logger.debug("ResourcePoolRequestors Acquiring Lock; %s.%s(%s)" % (filename, function_name, line_number))
-        self.__resource_pool_requestor_lock.acquire()
-        
-    def __sync_release(self):
-        (frame, filename, line_number,
-         function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        logger.debug("ResourcePoolRequestors Releasing Lock; %s.%s(%s)" % (filename, function_name, line_number))
-        self.__resource_pool_requestor_lock.release()
-
-    def __is_reserved(self, request_id):
-        ''' Returns True if all resources are collected
+            address: (host, port) of TCP server, or path of Unix socket server.
+            name: client name, for server's logging.
+            keepalive: seconds between pings; if None, server does not
+                expect pings, and only connection loss reclaims resources.
+            timeout: seconds to wait for server to answer a request that
+                does not wait on resources.
         '''
-        request=self.__get_request(request_id)
-        
-        missings=set(request.request.keys()) - set(request.resources.keys())
-        request.reserved=len(missings) ==0
-        if not request.reserved:
-            logger.debug("%s missing resources %s" %(request.client_name, missings))
-        return request.reserved
-        
-    def is_reserved(self, request_id):
-        ''' Returns True if all resources are collected
+        self.name=name
+        self.timeout=timeout
+        self.__sock=_connect(address)
+        self.__rfile=self.__sock.makefile('rb')
+        self.__lock=threading.Lock()
+        self.__pending=dict()
+        self.__ids=itertools.count(1)
+        self.__closed=False
+        self.__timer_wheel=get_timer_wheel()
+        self.__keepalive=keepalive
+        self.__reader=threading.Thread(target=self.__read, name='ResourcePoolClient', daemon=True)
+        self.__reader.start()
+        self.__keepalive_timer=None
+        self.pools=self.request({'op': 'hello', 'client': name, 'keepalive': keepalive}, lambda reply: reply['pools']).result(timeout)
+        if keepalive:
+            self.__keepalive_timer=self.__timer_wheel.schedule(keepalive, self.__ping)
+
+    def __ping(self):
+        if self.__closed: return
+        self.request({'op': 'ping'})
+        self.__keepalive_timer=self.__timer_wheel.schedule(self.__keepalive, self.__ping)
+
+    def request(self, message, transform=None):
+        ''' sends request to server without waiting for its reply.
+
+        Args:
+            message: request; id is assigned.
+            transform: callable to convert reply to result of future.
+
+        Returns:
+            Future of reply; raises ResourcePoolError if server replied with error.
         '''
+        future=Future()
+        with self.__lock:
+            if self.__closed:
+                raise ResourcePoolError("Client %s is closed" % (self.name,))
+            message_id=next(self.__ids)
+            message['id']=message_id
+            self.__pending[message_id]=(future, transform)
+            try:
+                self.__sock.sendall(_encode(message))
+            except OSError as e:
+                del self.__pending[message_id]
+                raise ResourcePoolError("Client %s failed to send request: %s" % (self.name, repr(e)))
+        return future
+
+    def __read(self):
         try:
-            result=self.__requests[request_id].reserved
-        except:
-            raise ResourcePoolError("Unknown request_id: %s" % request_id)
-        return result
-        
-    def __get(self, request_id):
-        request=self.__get_request(request_id)
-        callback=RequestorsCallback(self.__notify_queue, request_id=request_id) if request.callback else None
-        for rp, count in request.request.values():
-            logger.debug("%s requesting resources %s(%s)" %(request.client_name, rp.name, count))
-            resources=rp.get(count=count, wait=request.wait, callback=callback, hold_time=request.hold_time)
-            
-            if resources:
-                logger.debug("%s received resources %s" %(request.client_name, resources))
-                #self.__sync_acquire()
-                self.__update_resource_store(request_id=request_id, resource_pool=rp, resources=resources)
-                #self.__sync_release()
-                
-        if not self.__is_reserved(request_id):
-            go_collect=False
-            #self.__sync_acquire()
-            logger.debug("%s __collect_resources_started %s" %(request.client_name, self.__collect_resources_started))
-            if not self.__collect_resources_started:
-                go_collect=True
-                self.__collect_resources_started=True
-            #self.__sync_release()
-            if go_collect:
-                logger.debug("%s starting collector" % (request.client_name, ))
-                self.__collect_resources()   
-        else:
-            self.__sync_acquire()
-            self.__notify_collected(request_id)
-            self.__sync_release()
-            
-    def __return_resources(self, request_id):
-        logger.debug("returning resources  for request id: %s" %(request_id,))
-        request=self.__get_request(request_id)
-        for rp_name, resources in list(request.resources.items()):
-            rp=self.__pools[rp_name]
-            returning=list(resources.values())
-            rp.put(*returning)
-            del request.resources[rp_name]               
-    
-    def __update_resource_store(self, request_id, resource_pool, resources):
-        logger.debug("Collected resources %s" %(resources))
-        request=self.__get_request(request_id)
-        #new_resources=[r.setattrib('requestor_request_id', request_id)for r in resources]
-        request.resources.update({resource_pool.name: len(resources),})
-        # plasce resources in reserved
-        #self.__pools[resource_pool.name]=resource_pool
-        
+            for line in self.__rfile:
+                reply=json.loads(line)
+                with self.__lock:
+                    future, transform=self.__pending.pop(reply.get('id'), (None, None))
+                if future is None: continue
+                if 'error' in reply:
+                    future.set_exception(ResourcePoolError(reply['error']))
+                else:
+                    try:
+                        future.set_result(transform(reply) if transform else reply)
+                    except Exception as e:
+                        future.set_exception(e)
+        except (OSError, ValueError) as e:
+            logger.debug("Client %s read failed: %s" % (self.name, repr(e)))
+        with self.__lock:
+            self.__closed=True
+            pending, self.__pending=self.__pending, dict()
+        for future, _ in pending.values():
+            future.set_exception(ResourcePoolError("Client %s connection closed" % (self.name,)))
+
+    def pool(self, name):
+        ''' Returns RemotePool for pool name on server
+        '''
+        return RemotePool(self, name)
+
+    def close(self):
+        ''' closes connection; server returns resources still held by client.
+        '''
+        with self.__lock:
+            self.__closed=True
+        if self.__keepalive_timer is not None:
+            self.__timer_wheel.cancel(self.__keepalive_timer)
         try:
-            pool=self.__pools[resource_pool.name]
-        except KeyError:
-            pool=Pool(resource_pool, list(), list())
-            self.__pools[resource_pool.name]=pool
-        pool.reserved.extend(resources)
-        #rp_resources.extend(map(lambda x: x.setattrib('__requestors_request_id', request_id), resources))
-        
-        return self.__is_reserved(request_id)
-    
-    def __get_request(self, request_id, default=None):
-        request=self.__requests.get(request_id, None)
-        if request is None and default is None:
-            (frame, filename, line_number,
-             function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]            
-            raise RequestNotFound("Unknown request_id: %s: %s(%s)" % (request_id, function_name, line_number,))
-        elif request is None:
-            request=default
-        return request
-    
-    def __evaluate_collect_wait_time(self):
-        waits=list() 
-        found_endless_waiter=False 
-        for request_id, request in list(self.__requests.items()):
-            if self.__is_reserved(request_id): continue
-            time_passed=time.time() - request.start_time
-            if request.wait and request.wait >0:
-                wait=request.wait - time_passed
-                if wait<= 0: 
-                    self.__return_resources(request_id)
-                else: waits.append(wait)
-            else:
-                found_endless_waiter=True
-        self.__collect_resources_started=len(waits)>0 or found_endless_waiter
-        len_waits=len(waits)
-        wait=min(waits) if len_waits>0 else None  
-        logger.debug("Wait evaluated: %s: waits: %s: found endless: %s" %(wait, len(waits), found_endless_waiter,))
-        return wait
-    
-    @Threaded()
-    def __collect_resources(self):
-        wait=self.__evaluate_collect_wait_time()
-        logger.debug("starting get loop (wait: %s, collect: %s)" %(wait,self.__collect_resources_started))
-        #self.__collect_resources_started=True
-        while self.__collect_resources_started:
-            logger.debug("trying to get from notify queue (wait: %s)" %(wait,))
-            try:
-                ticket, request_id=self.__notify_queue.get(timeout=wait)
-            except queue.Empty:
-                ticket, request_id=None, None
-            
-            logger.debug("got something from notify queue request_id: %s, ticket: %s" %(request_id, ticket,))
-            
-            self.__sync_acquire()
-            
-            if request_id is not None:
-                rp_name=ticket.pool_name
-                request=self.__get_request(request_id)
-                logger.debug("%s received resources for request_id %s" %(request.client_name, request_id,))
-                rp, _=request.request[rp_name]
-                resources=rp.get(ticket=ticket)
-                reserved=self.__update_resource_store(request_id=request_id, resource_pool=rp, resources=resources)
-                if reserved:
-                    self.__notify_collected(request_id)          
-            
-            wait=self.__evaluate_collect_wait_time()
-            
-            self.__sync_release()
-                    
-    def __notify_collected(self, request_id):
-        request=self.__get_request(request_id)
-        if self.__is_reserved(request_id) and request.callback:
-            logger.debug("%s Calling callback for %s" %(request.client_name, request_id,))
-            request.callback(request_id)
-                  
-    def was_fetched(self, request_id):
-        request=self.__get_request(request_id)
-        return request.fetched
-                  
-    def get(self, request_id):
-        result=None
-        request=self.__get_request(request_id)
-        self.__sync_acquire()
-        
-        if request.reserved and not request.fetched:
-            result=list()
-            #for _, resources in list(request.resources.items()): 
-            for rp_name, count in list(request.resources.items()):
-                pool=self.__pools[rp_name]
-                resources=pool.reserved[:count]
-                del pool.reserved[count:]
-                pool.inuse.extend(resources)
-                result.extend(resources) 
-            request.fetched=True    
-            request.request.clear()
-            logger.debug("%s remove required and resources %s" %(request.client_name, request_id,))
-        
-        self.__sync_release() 
-        return result 
-            
-    def put(self, *resources):
-        #self.__sync_acquire()
-        logger.debug("putting back resources %s" % (repr(resources)))
-        pool_count=dict()
-        for resource in resources:
-            rp_name=resource.pool
-            try: 
-                count=pool_count.get[rp_name]
-            except KeyError:
-                count=list()
-                pool_count.get[rp_name]=list
-            count.append(resource)
-        
-        # ensure resources returned are in alignment with this container.
-        self.put_requested([ (self.__pools[rp_name].pool, count) 
-                            for rp_name, count in list(pool_count.items())])    
-
-    def put_requested(self, request):
-        ''' returns fetched request formated as in get.
-        
-        Args:
-            request: list of tuples of resource pool and amount requested
+            self.__sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.__reader.join(self.timeout)
+        self.__rfile.close()
+        self.__sock.close()
+
+class RemotePool(object):
+    ''' Client side of pool served by ResourcePoolServer; see ResourcePool.
+    '''
+
+    def __init__(self, client, name):
+        self.client=client
+        self.name=name
+
+    def __resources(self, reply):
+        return [RemoteResource(self.name, id_, resource_name) for id_, resource_name in reply['resources']]
+
+    def get_future(self, count=1, wait=-1, hold_time=None, expire=None):
+        ''' requests resources without waiting for them.
+
+        Returns:
+            Future of list of resources
         '''
-        
-        self.__sync_acquire()
-        logger.debug("putting back request: %s" % (repr(request)))
-        
-        # ensure resources returned are in alignment with this container.
-        #resource_to_return=list()
-        for rp, count in request:
-            logger.debug("ResourcePool %s removing %s resources" % (rp.name, count))
-            pool=self.__pools[rp.name]
-            to_return=pool.inuse[:count]
-            pool.pool.put(*to_return)
-            del pool.inuse[:count]
-        
-        self.__sync_release()
-        
-    # TODO: rebuild del of captured resources
-    def __del__(self):
-        # need to make sure all resources are returned
-        for pool in self.__pools.values():
-            for resource in pool.inuse + pool.reserved:
-                pool.pool.put(resource)
+        message={'op': 'get', 'pool': self.name, 'count': count, 'wait': wait, 'hold_time': hold_time, 'expire': expire}
+        return self.client.request(message, self.__resources)
+
+    def get(self, count=1, wait=-1, callback=None, hold_time=None, expire=None, ticket=None):
+        ''' retrieve resources from remote pool; see ResourcePool.get.
 
+        When callback is provided, get returns at once.  Once resources are
+        reserved, or wait passed, callback is called with ticket, and
+        resources are collected with get(ticket=ticket).
+        '''
+        if callback and not callable(callback):
+            raise ResourcePoolError("Callback must be callable, but it is no: %s" % repr(callback))
+        if ticket is not None:
+            future=self.client.request({'op': 'get', 'pool': self.name, 'ticket': list(ticket)}, self.__resources)
+            return future.result(self.client.timeout)
+        if callback:
+            dispatcher=get_callback_dispatcher()
+            def notify(future):
+                if future.exception() is None:
+                    dispatcher.dispatch(callback, future.result())
+                else:
+                    logger.error("Pool %s request for callback %s failed: %s" % (self.name, callback, future.exception()))
+            message={'op': 'get', 'pool': self.name, 'count': count, 'wait': wait, 'hold_time': hold_time, 'expire': expire, 'notify': True}
+            self.client.request(message, lambda reply: Ticket(*reply['ticket'])).add_done_callback(notify)
+            return None
+        future=self.get_future(count=count, wait=wait, hold_time=hold_time, expire=expire)
+        return future.result(None if wait < 0 else wait + self.client.timeout)
+
+    def put(self, *resources):
+        ''' returns resources to remote pool without waiting for server.
+
+        Returns:
+            Future of server's acknowledgment.
+        '''
+        for resource in resources:
+            if resource.pool != self.name:
+                raise ResourcePoolError("Resource %s is not from pool %s" % (resource, self.name))
+        return self.client.request({'op': 'put', 'pool': self.name, 'resources': [resource.id_ for resource in resources]})
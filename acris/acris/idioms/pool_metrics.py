@@ -0,0 +1,290 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+from collections import OrderedDict
+from itertools import compress
+
+class PoolMetricsError(Exception): pass
+
+class Counter(object):
+    ''' Monotonic count; updated in place with counter.value+=n.
+    '''
+    __slots__=('name', 'help', 'value', )
+    
+    def __init__(self, name, help=''):
+        self.name=name
+        self.help=help
+        self.value=0
+        
+class Gauge(object):
+    ''' Current value, read from function when metrics are collected; costs
+    nothing in between.
+    '''
+    __slots__=('name', 'help', 'function', )
+    
+    def __init__(self, name, help='', function=None):
+        self.name=name
+        self.help=help
+        self.function=function
+        
+    @property
+    def value(self):
+        return self.function()
+        
+class Histogram(object):
+    ''' HDR style histogram of non-negative values.
+    
+    Values are scaled to integers (by default seconds to microseconds), and 
+    counted in buckets of 2**sub_bucket_bits linear sub-buckets per power
+    of two.  So each value is counted within 1/2**sub_bucket_bits of its 
+    magnitude (3% by default), whatever its range, and record is O(1).
+    
+    Zero values that are frequent, e.g., waits of requests served right 
+    away, can be counted by a Counter instead of recorded one by one (see 
+    zeros argument).
+    '''
+    
+    sub_bucket_bits=5
+    max_bits=40 # buckets allocated up front; larger values extend buckets
+    
+    def __init__(self, name, help='', scale=1e6, zeros=None):
+        ''' creates empty histogram
+        
+        Args:
+            name: metric name
+            help: metric description
+            scale: multiplier turning recorded values into integers; e.g., 
+                1e6 records seconds in microsecond resolution.
+            zeros: Counter whose value is added to histogram as zero values.
+        '''
+        self.name=name
+        self.help=help
+        self.scale=scale
+        self.zeros=zeros
+        self.__sub_buckets=1 << self.sub_bucket_bits
+        self.__shift_bits=self.sub_bucket_bits + 1
+        self.__size=(self.max_bits - self.sub_bucket_bits + 1) << self.sub_bucket_bits
+        self.reset()
+        
+    def record(self, value):
+        ''' counts value; value is in unscaled units (e.g., seconds).
+        '''
+        scaled=int(value * self.scale)
+        if scaled < self.__sub_buckets:
+            if scaled < 0: scaled=0
+            index=scaled
+        else:
+            shift=scaled.bit_length() - self.__shift_bits
+            index=((shift + 1) << self.sub_bucket_bits) + (scaled >> shift) - self.__sub_buckets
+            if scaled > self.max: self.max=scaled
+        try:
+            self.__counts[index]+=1
+        except IndexError:
+            self.__counts.extend([0] * (index + 1 - len(self.__counts)))
+            self.__counts[index]+=1
+        self.__recorded+=1
+        self.sum+=value
+        
+    def __highest_equivalent(self, index):
+        sub_buckets=self.__sub_buckets
+        if index < sub_buckets: return index
+        shift=index // sub_buckets - 1
+        return ((index % sub_buckets + sub_buckets + 1) << shift) - 1
+    
+    def __buckets(self):
+        ''' Returns list of index and count of non empty buckets.
+        '''
+        counts=self.__counts
+        buckets=[(index, counts[index]) for index in compress(range(len(counts)), counts)]
+        zeros=self.zeros.value if self.zeros is not None else 0
+        if zeros:
+            if buckets and buckets[0][0] == 0: buckets[0]=(0, buckets[0][1] + zeros)
+            else: buckets.insert(0, (0, zeros))
+        return buckets
+    
+    @property
+    def count(self):
+        return self.__recorded + (self.zeros.value if self.zeros is not None else 0)
+        
+    def __value(self, index):
+        # highest value counted in bucket, capped by highest value recorded
+        return min(self.__highest_equivalent(index), max(self.max, self.__sub_buckets - 1)) / self.scale
+        
+    def percentile(self, percent, buckets=None):
+        ''' Returns value below or at which percent of recorded values are, 
+        in unscaled units; 0 if nothing was recorded.
+        '''
+        if buckets is None: buckets=self.__buckets()
+        total=sum([count for _, count in buckets])
+        if total == 0: return 0
+        rank=max(1, int(total * percent / 100.0 + 0.5))
+        seen=0
+        for index, count in buckets:
+            seen+=count
+            if seen >= rank: break
+        return self.__value(index)
+    
+    def snapshot(self, percentiles=(50, 90, 99, 99.9)):
+        ''' Returns dict of count, sum, min, max and percentiles, in 
+        unscaled units.
+        '''
+        buckets=self.__buckets()
+        result={'count': sum([count for _, count in buckets]), 'sum': self.sum, 'min': 0, 'max': 0, }
+        if buckets:
+            first, last=buckets[0][0], buckets[-1][0]
+            result['min']=(first if first < self.__sub_buckets else self.__highest_equivalent(first - 1) + 1) / self.scale
+            result['max']=self.__value(last)
+        for percent in percentiles:
+            result['p%s' % (('%g' % percent).replace('.', ''),)]=self.percentile(percent, buckets)
+        return result
+    
+    def reset(self):
+        self.__counts=[0] * self.__size
+        self.__recorded=0
+        self.sum=0.0
+        self.max=0
+
+class Metrics(object):
+    ''' Set of counters, gauges and histograms of one pool or requestor.
+    
+    Metrics take no lock.  They are updated by their owner where it already 
+    holds its own lock, so those updates are exact.  Updates made outside 
+    of owner's lock (e.g., Requestor's, shared by all Requestor objects, or
+    pool's fast path) may rarely miss a count under heavy concurrency.  Snapshots are taken 
+    without stopping updates, so values of different metrics may be a few 
+    events apart.
+    '''
+    
+    quantiles=(0.5, 0.9, 0.99, 0.999)
+    
+    def __init__(self, subsystem, labels=None, namespace='acris'):
+        ''' creates empty set of metrics
+        
+        Args:
+            subsystem: prefix of metric names in exports, e.g., resource_pool.
+            labels: dict of label name to value, identifying owner in exports.
+            namespace: prefix of subsystem in Prometheus names.
+        '''
+        self.subsystem=subsystem
+        self.namespace=namespace
+        self.labels=dict(labels) if labels else dict()
+        self.__metrics=OrderedDict()
+        
+    def __add(self, metric):
+        if metric.name in self.__metrics:
+            raise PoolMetricsError("Metric %s already defined in %s" % (metric.name, self.subsystem))
+        self.__metrics[metric.name]=metric
+        return metric
+        
+    def counter(self, name, help=''):
+        return self.__add(Counter(name, help))
+    
+    def gauge(self, name, function, help=''):
+        return self.__add(Gauge(name, help, function))
+    
+    def histogram(self, name, help='', scale=1e6, zeros=None):
+        return self.__add(Histogram(name, help, scale, zeros))
+    
+    def __getitem__(self, name):
+        return self.__metrics[name]
+    
+    def __iter__(self):
+        return iter(self.__metrics.values())
+    
+    def snapshot(self):
+        ''' Returns dict of metric name to its value; histograms' values are
+        dicts (see Histogram.snapshot).
+        '''
+        result=dict()
+        for metric in self.__metrics.values():
+            if isinstance(metric, Histogram):
+                result[metric.name]=metric.snapshot()
+            else:
+                result[metric.name]=metric.value
+        return result
+    
+    def reset(self):
+        ''' zeroes counters and histograms; gauges are left as is.
+        '''
+        for metric in self.__metrics.values():
+            if isinstance(metric, Histogram): metric.reset()
+            elif isinstance(metric, Counter): metric.value=0
+    
+    def families(self):
+        ''' Yields tuples of Prometheus name, type, help and list of samples;
+        each sample is a tuple of name suffix, labels and value.
+        '''
+        prefix='%s_%s_' % (self.namespace, self.subsystem) if self.namespace else '%s_' % (self.subsystem,)
+        for metric in self.__metrics.values():
+            name=prefix + metric.name
+            labels=self.labels
+            if isinstance(metric, Counter):
+                yield name + '_total', 'counter', metric.help, [('', labels, metric.value)]
+            elif isinstance(metric, Gauge):
+                yield name, 'gauge', metric.help, [('', labels, metric.value)]
+            else:
+                snapshot=metric.snapshot([quantile * 100 for quantile in self.quantiles])
+                samples=[('', dict(labels, quantile='%g' % quantile), snapshot['p%s' % (('%g' % (quantile * 100)).replace('.', ''),)]) 
+                         for quantile in self.quantiles]
+                samples.append(('_sum', labels, metric.sum))
+                samples.append(('_count', labels, metric.count))
+                yield name, 'summary', metric.help, samples
+                
+    def prometheus(self):
+        ''' Returns metrics in Prometheus text exposition format.
+        '''
+        return prometheus_text(self)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_sample(name, labels, value):
+    if labels:
+        labels='{%s}' % (','.join(['%s="%s"' % (label, _escape(label_value)) for label, label_value in labels.items()]),)
+    else: 
+        labels=''
+    if isinstance(value, float): value=repr(value)
+    return '%s%s %s' % (name, labels, value)
+
+def prometheus_text(*metrics):
+    ''' Returns Prometheus text exposition of metrics of multiple owners; 
+    metrics of the same name are grouped under a single HELP and TYPE.
+    
+    Args:
+        metrics: Metrics objects, or objects with metrics attribute (e.g., 
+            ResourcePool).
+    '''
+    families=OrderedDict()
+    for owner in metrics:
+        if not isinstance(owner, Metrics): owner=owner.metrics
+        for name, type_, help, samples in owner.families():
+            family=families.get(name)
+            if family is None:
+                family=families[name]=(type_, help, list())
+            family[2].extend(samples)
+    lines=list()
+    for name, (type_, help, samples) in families.items():
+        if help: lines.append('# HELP %s %s' % (name, help.replace('\\', '\\\\').replace('\n', '\\n')))
+        lines.append('# TYPE %s %s' % (name, type_))
+        for suffix, labels, value in samples:
+            lines.append(_format_sample(name + suffix, labels, value))
+    return '\n'.join(lines) + '\n'
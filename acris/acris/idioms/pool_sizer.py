@@ -0,0 +1,186 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Adaptive sizing of ResourcePool by observed demand.
+'''
+
+from acris.idioms.resource_pool import ResourcePoolError
+from acris.idioms.timer_wheel import get_timer_wheel
+from acris.idioms.callback_dispatcher import get_callback_dispatcher
+import threading
+import logging
+import math
+import time
+
+logger=logging.getLogger(__name__)
+
+class PoolSizer(object):
+    ''' Grows and shrinks resource_limit of ResourcePool between bounds, by 
+    demand observed in pool's metrics.
+    
+    Every interval seconds, sizer samples pool:
+        busy: resources in use (inuse gauge).
+        rate: resources returned per second (returned counter).
+        hold: mean seconds resources are held (hold_seconds histogram).
+        queue: requests awaiting resources (awaiting gauge).
+    Each is smoothed by EWMA, with weight alpha for the newest sample.  By 
+    Little's law, rate * hold resources are demanded; demand is the larger
+    of that and busy, as fast path gets and puts are not timed.  Target 
+    size is:
+        ceil(demand * (1 + headroom) + queue)
+    within min_size and max_size.
+    
+    Sizer grows pool to target right away, and prewarms resources up to it 
+    if prewarm is set.  It shrinks pool only once target stayed below pool's
+    size for shrink_delay seconds, and then to the highest target seen 
+    meanwhile; so lulls between bursts do not shed resources bursts need.
+    
+    Example:
+        sizer=PoolSizer(pool, min_size=2, max_size=64).start()
+        ...
+        sizer.stop()
+    '''
+    
+    def __init__(self, pool, min_size=1, max_size=None, interval=0.1, alpha=0.3, headroom=0.2, shrink_delay=5.0, prewarm=True):
+        ''' creates sizer of pool; pool is not resized until sizer starts, 
+        or tick is called.
+        
+        Args:
+            pool: ResourcePool to size; not capacity pool.
+            min_size, max_size: bounds of pool's resource_limit; max_size is 
+                pool's resource_limit if None.
+            interval: seconds between samples.
+            alpha: weight of newest sample in EWMA, between 0 and 1.
+            headroom: fraction of demand kept beyond it.
+            shrink_delay: seconds target stays below size before pool shrinks.
+            prewarm: if set, resources are loaded up to size as pool grows,
+                instead of on demand.
+        '''
+        if max_size is None: max_size=pool.policy['resource_limit']
+        if pool.policy['capacity'] is not None:
+            raise ResourcePoolError("PoolSizer cannot size capacity pool %s" % (pool.name,))
+        if max_size is None or max_size < 0 or not 0 < min_size <= max_size:
+            raise ResourcePoolError("PoolSizer requires 0 < min_size (%s) <= max_size (%s)" % (min_size, max_size))
+        if not 0 < alpha <= 1:
+            raise ResourcePoolError("PoolSizer alpha must be within (0, 1], but got: %s" % (alpha,))
+        self.pool=pool
+        self.min_size=min_size
+        self.max_size=max_size
+        self.interval=interval
+        self.alpha=alpha
+        self.headroom=headroom
+        self.shrink_delay=shrink_delay
+        self.prewarm=prewarm
+        
+        metrics=pool.metrics
+        self.__inuse=metrics['inuse']
+        self.__awaiting=metrics['awaiting']
+        self.__returned=metrics['returned']
+        self.__hold=metrics['hold_seconds']
+        self.busy=self.rate=self.hold=self.queue=None
+        self.size=None
+        self.target=None
+        self.__last=None # time, returned count, hold count and hold sum of last sample
+        self.__below_since=None # when target fell below size
+        self.__shrink_to=None # highest target since
+        self.__timer=None
+        self.__running=False
+        self.__lock=threading.Lock()
+        
+    def __smooth(self, average, sample):
+        return sample if average is None else average + self.alpha * (sample - average)
+        
+    def tick(self, now=None):
+        ''' samples pool, and resizes it if needed.
+        
+        Returns:
+            pool's resource_limit once resized.
+        '''
+        with self.__lock:
+            now=time.monotonic() if now is None else now
+            returned, hold_count, hold_sum=self.__returned.value, self.__hold.count, self.__hold.sum
+            self.busy=self.__smooth(self.busy, self.__inuse.value)
+            self.queue=self.__smooth(self.queue, self.__awaiting.value)
+            if self.__last is not None:
+                last_time, last_returned, last_hold_count, last_hold_sum=self.__last
+                if now > last_time and returned >= last_returned:
+                    self.rate=self.__smooth(self.rate, (returned - last_returned) / (now - last_time))
+                if hold_count > last_hold_count and hold_sum >= last_hold_sum:
+                    self.hold=self.__smooth(self.hold, (hold_sum - last_hold_sum) / (hold_count - last_hold_count))
+            self.__last=(now, returned, hold_count, hold_sum)
+            
+            demand=self.busy
+            if self.rate is not None and self.hold is not None:
+                demand=max(demand, self.rate * self.hold)
+            target=int(math.ceil(demand * (1.0 + self.headroom) + self.queue))
+            self.target=target=min(max(target, self.min_size), self.max_size)
+            if self.size is None: self.size=self.pool.policy['resource_limit']
+            
+            if target >= self.size:
+                self.__below_since=self.__shrink_to=None
+                if target > self.size: self.__resize(target)
+            elif self.__below_since is None:
+                self.__below_since, self.__shrink_to=now, target
+            else:
+                self.__shrink_to=max(self.__shrink_to, target)
+                if now - self.__below_since >= self.shrink_delay:
+                    self.__resize(self.__shrink_to)
+                    self.__below_since=self.__shrink_to=None
+            return self.size
+        
+    def __resize(self, size):
+        logger.debug("%s resizing from %s to %s", self.pool.name, self.size, size)
+        self.size=size
+        self.pool.update_policy({'resource_limit': size})
+        idle=size - int(self.__inuse.value)
+        if self.prewarm and idle > 0:
+            self.pool.prewarm(idle, wait=False)
+            
+    def __tick_soon(self):
+        # called by TimerWheel; resizing may load resources, so it is left to dispatcher.
+        if self.__running: get_callback_dispatcher().dispatch(self.__run)
+        
+    def __run(self):
+        try:
+            self.tick()
+        except Exception as e:
+            logger.error("%s sizing failed: %s" % (self.pool.name, e))
+        finally:
+            if self.__running:
+                self.__timer=get_timer_wheel().schedule(self.interval, self.__tick_soon)
+        
+    def start(self):
+        ''' samples and resizes pool every interval seconds, from timer.
+        
+        Returns:
+            self
+        '''
+        self.__running=True
+        self.__timer=get_timer_wheel().schedule(0, self.__tick_soon)
+        return self
+    
+    def stop(self):
+        ''' stops sizing; pool keeps its last size.
+        '''
+        self.__running=False
+        timer, self.__timer=self.__timer, None
+        if timer is not None: get_timer_wheel().cancel(timer)
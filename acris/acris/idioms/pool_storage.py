@@ -0,0 +1,231 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+from abc import abstractmethod
+from collections import OrderedDict, deque
+
+class PoolStorageError(Exception): pass
+
+class PoolStorage(object):
+    ''' Base of storages keeping what ResourcePool hands.
+
+    Pool keeps its lock, waiters, reservations, leases and resources in use
+    (by id) itself; storage keeps what is available, hands it, takes it back,
+    and matches what put returns with what is held.
+
+    Storage is always used while holding the pool's lock.
+
+    Attributes:
+        loads: storage keeps resource objects that pool loads, validates and
+            evicts, in free list available; pool's loading, idle and health
+            policies work on it.  Otherwise, storage hands allocations it
+            makes on get, and these policies do not apply.
+        by_identity: put must return the very resources handed, each once;
+            otherwise, held matches them.
+        fast_path: pool's lock-free fast path may serve storage.
+    '''
+
+    loads=True
+    by_identity=True
+    fast_path=True
+
+    def __init__(self, policy, resource_cls, name):
+        self.available=deque()
+
+    @abstractmethod
+    def free(self):
+        ''' Returns number of resources, or units, available.
+        '''
+        return len(self.available)
+
+    @abstractmethod
+    def check_count(self, count, resource_limit):
+        ''' checks request for count can ever be served.
+
+        Returns:
+            None if it can; otherwise, message telling why not.
+        '''
+        return None
+
+    @abstractmethod
+    def take(self, count):
+        ''' hands count from available; called only if free() is at least
+        count.
+
+        Returns:
+            list of resources handed.
+        '''
+        return []
+
+    @abstractmethod
+    def restore(self, resources, inuse_resources):
+        ''' takes back resources returned to available.
+
+        Args:
+            resources: resources handed by take, no longer in inuse.
+            inuse_resources: resource id to resource still in use.
+        '''
+        pass
+
+    def count(self, resources):
+        ''' Returns how much of count resources handed by take stand for.
+        '''
+        return len(resources)
+
+    def held(self, resources, inuse_resources, reservations):
+        ''' matches resources returned by put with resources held from pool.
+
+        Args:
+            resources: resources returned.
+            inuse_resources: resource id to resource in use.
+            reservations: ticket to Reservation of resources not collected.
+
+        Returns:
+            list of held resources that are returned, or None if resources
+            are not held.
+        '''
+        return list(resources)
+
+class ObjectStorage(PoolStorage):
+    ''' Keeps available resources in a free list, so take and restore move
+    resources at O(count) regardless of the size of the pool.  Each
+    resource is tracked from get to put.
+    '''
+
+    def free(self):
+        return len(self.available)
+
+    def check_count(self, count, resource_limit):
+        if resource_limit > -1 and count > resource_limit:
+            return "Trying to get count (%s) larger than resource limit (%s)" % (count, resource_limit)
+        return None
+
+    def take(self, count):
+        available=self.available
+        return [available.pop() for _ in range(count)]
+
+    def restore(self, resources, inuse_resources):
+        self.available.extend(resources)
+
+class VirtualStorage(ObjectStorage):
+    ''' As ObjectStorage, but resources are interchangeable, and may be
+    returned by quantity: a resource of pool's class returned stands for any
+    resource held from pool.  Fast path does not serve it.
+    '''
+
+    by_identity=False
+    fast_path=False
+
+    def held(self, resources, inuse_resources, reservations):
+        ''' returned resource stands for itself if held, or else for any
+        other held resource not reserved.
+        '''
+        held=OrderedDict()
+        missing=0
+        for resource in resources:
+            if inuse_resources.get(resource.id_) is resource and resource.id_ not in held:
+                held[resource.id_]=resource
+            else:
+                missing+=1
+        if missing:
+            reserved=set([resource.id_ for reservation in reservations.values() for resource in reservation.resources])
+            for resource in inuse_resources.values():
+                if missing == 0: break
+                if resource.id_ in held or resource.id_ in reserved: continue
+                held[resource.id_]=resource
+                missing-=1
+            if missing: return None
+        return list(held.values())
+
+class CapacityStorage(PoolStorage):
+    ''' Keeps a number of units of capacity available, so its memory does
+    not depend on capacity.  take(n) hands n units, integer or float, as a
+    single allocation: a resource_cls object whose units attribute is n.
+    '''
+
+    loads=False
+    fast_path=False
+
+    def __init__(self, policy, resource_cls, name):
+        super().__init__(policy, resource_cls, name)
+        if policy.get('capacity') is None:
+            raise PoolStorageError("Capacity storage requires capacity policy")
+        self.capacity=policy['capacity']
+        self.units=self.capacity
+        self.resource_cls=resource_cls
+        self.name=name
+
+    def free(self):
+        return self.units
+
+    def check_count(self, count, resource_limit):
+        if count <= 0 or count > self.capacity:
+            return "Trying to get units (%s) not within capacity (%s)" % (count, self.capacity)
+        return None
+
+    def take(self, count):
+        allocation=self.resource_cls()
+        allocation.units=count
+        allocation.pool=self.name
+        self.units-=count
+        return [allocation]
+
+    def restore(self, resources, inuse_resources):
+        if inuse_resources:
+            self.units+=sum([allocation.units for allocation in resources])
+        else:
+            # all units are back; drops float rounding errors.
+            self.units=self.capacity
+
+    def count(self, resources):
+        return sum([allocation.units for allocation in resources])
+
+pool_storages={'objects': ObjectStorage,
+               'virtual': VirtualStorage,
+               'capacity': CapacityStorage,
+               }
+
+def create_pool_storage(policy, resource_cls, name):
+    ''' creates storage according to pool policy
+
+    Args:
+        policy: pool policy; storage is either name of registered storage in
+            pool_storages, or a PoolStorage subclass.  If storage is None, it
+            is capacity if capacity is set, virtual if virtual is set, and
+            objects otherwise.
+        resource_cls: class of resources pool hands.
+        name: pool name.
+    '''
+    storage=policy.get('storage')
+    capacity=policy.get('capacity')
+    virtual=policy.get('virtual', False)
+    if virtual and capacity is not None:
+        raise PoolStorageError("Policy virtual and capacity are mutually exclusive")
+    if storage is None:
+        storage='capacity' if capacity is not None else 'virtual' if virtual else 'objects'
+    if isinstance(storage, str):
+        try:
+            storage=pool_storages[storage]
+        except KeyError:
+            raise PoolStorageError("Unknown pool storage: %s; expected one of: %s" % \
+                                   (storage, ', '.join(pool_storages.keys())))
+    return storage(policy, resource_cls, name)
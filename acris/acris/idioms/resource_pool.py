@@ -21,22 +21,72 @@
 ##############################################################################
 
 from acrilib import NamedSingleton, Sequence, MergedChainedDict, Threaded, traced_method
+from acris.idioms.waiter_scheduler import Waiter, create_waiter_scheduler
+from acris.idioms.pool_storage import PoolStorageError, create_pool_storage
+from acris.idioms.timer_wheel import get_timer_wheel
+from acris.idioms.callback_dispatcher import get_callback_dispatcher
+from acris.idioms.pool_metrics import Metrics
 import threading
+import asyncio
 from abc import abstractmethod
-from collections import OrderedDict
+from collections import OrderedDict, deque
 import queue
 import time
 import logging
-import inspect
+import sys
+import heapq
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import concurrent.futures
 from collections import namedtuple
 
 logger=logging.getLogger(__name__)
+lock_logger=logging.getLogger(__name__ + '.lock')
 
 traced=traced_method(logger.debug, True)
 
+def set_lock_tracing(trace=True):
+    ''' turns tracing of pool and requestor lock operations on or off
+    
+    Lock tracing logs the caller of each lock acquire and release.  Caller 
+    information is only captured when lock_logger is enabled for DEBUG; 
+    otherwise lock operations skip frame inspection altogether.
+    
+    Args:
+        trace: True to trace, False to stop tracing, 
+            None to follow the level of the module logger.
+    '''
+    level={True: logging.DEBUG, False: logging.INFO, None: logging.NOTSET}[trace]
+    lock_logger.setLevel(level)
+    
+def _trace_lock(owner, action):
+    # frame 0 is this function, frame 1 is the sync method, frame 2 its caller.
+    frame=sys._getframe(2)
+    lock_logger.debug("%s %s Lock; %s.%s(%s)" % (owner, action, frame.f_code.co_filename, 
+                                                 frame.f_code.co_name, frame.f_lineno))
+
 class ResourcePoolError(Exception): pass
 class RequestNotFound(Exception): pass
 
+def _acquisition_stack(depth, skip=0):
+    ''' returns code and line of up to depth frames of the caller into this 
+    module, innermost first.  skip frames are jumped over (without making 
+    frame objects for them), and frames of this module are skipped.  Lines
+    are formatted only when reported, so recording is cheap enough for 
+    every get.
+    '''
+    frame=sys._getframe(skip + 1)
+    while frame is not None and frame.f_globals.get('__name__') == __name__:
+        frame=frame.f_back
+    stack=list()
+    while frame is not None and len(stack) < depth:
+        stack.append((frame.f_code, frame.f_lineno))
+        frame=frame.f_back
+    return tuple(stack)
+
+def _format_stack(stack):
+    return ['File "%s", line %s, in %s' % (code.co_filename, lineno, code.co_name) for code, lineno in stack]
+
 resource_id_sequence=Sequence('Resource_id')
 
 class Resource(object):  
@@ -52,6 +102,10 @@ class Resource(object):
         self.id_=resource_id_sequence()
         self.resource_name=self.__class__.__name__
         self.pool=None
+        self.created_at=time.monotonic()
+        self.idle_since=self.created_at # when last made available in pool
+        self.validated_at=self.created_at # when last found valid by pool
+        self.reclaimed=False # taken back by pool as its lease expired; never handed again
         
     def setattrib(self, name, value):
         setattr(self, name, value)
@@ -85,7 +139,28 @@ class Resource(object):
         '''
         return True
     
+    def validate(self):
+        ''' tests if resource is usable, e.g., by pinging its connection; 
+        called by pool's health checks (see ResourcePool policy).
+        
+        Returns:
+            True if usable; resources not usable are evicted from pool.
+        '''
+        return self.active()
+    
 Ticket=namedtuple('Ticket', ['pool_name', 'sequence'])
+Reservation=namedtuple('Reservation', ['resources', 'expire', 'timer'])
+LeakReport=namedtuple('LeakReport', ['count', 'oldest', 'stack'])
+
+class LeaseExpiry(object):
+    ''' Tracks resources handed out with expire, until returned or reclaimed.
+    '''
+    __slots__=('resources', 'outstanding', 'timer', )
+    
+    def __init__(self, resources):
+        self.resources=resources
+        self.outstanding=len(resources)
+        self.timer=None
 
 class ResourcePool(NamedSingleton): 
     ''' Singleton pool to managing resources of multiple types.
@@ -102,8 +177,161 @@ class ResourcePool(NamedSingleton):
                 if wait with time limit: halt wait and return with resource if available or empty
                 if callback, reserve resource and notify availability with reference to reserved resource
                 
+    When resources are returned, awaiting requests are served according to 
+    waiter_scheduler policy (see acris.idioms.waiter_scheduler):
+        fifo: in order of arrival; a request that cannot be served holds the line.
+        first_fit: in order of arrival, skipping requests that cannot be served.
+        smallest_first: smallest requests first.
+        aging: smallest requests first, until a request awaits longer than 
+            waiter_max_age seconds; then it is served first and holds the line.
+        priority: requests with higher priority (see get) first, in order of 
+            arrival within the same priority; a request that cannot be served
+            holds the line.  Awaiting request's priority grows by one every 
+            priority_aging seconds, so low priority requests are not starved.
+            Other schedulers ignore priority.
+                
     Policy can only be set one immediately after initialization.
     
+    Storage:
+        Pool keeps what it hands in a storage (see acris.idioms.pool_storage),
+        chosen by storage policy, or else by capacity and virtual policies:
+            objects (default): available resources in a free list; each 
+                resource is tracked from get to put.
+            capacity: a count of units available; see Capacity pool.
+            virtual: as objects, but resources are interchangeable, and may
+                be returned by quantity: a resource of pool's class returned
+                stands for any resource held from pool.  Virtual pools of
+                acris.idioms.virtual_resource_pool use it.
+        Storage policy may also be a PoolStorage subclass.  Waiting, 
+        reservations, leases, handoff and metrics are the pool's, and work 
+        alike with any storage.
+        Storages are in-process.  Pools shared across processes are served
+        by this engine through acris.idioms.cluster_resource_pool; 
+        acris.idioms.shared_resource_pool keeps resource slots in shared 
+        memory, with its own cross-process lock and waiters, so it is not a
+        storage of this engine.  All take get and put alike.
+    
+    Locking:
+        Each pool guards its state with its own lock, so threads working on 
+        unrelated pools do not serialize on each other.  Code that works 
+        across pools (Requestor, Requestors) must follow this lock order:
+            1. Requestor/Requestors lock.
+            2. a single ResourcePool lock.
+        A thread never holds two ResourcePool locks at the same time, 
+        except in get_atomic, which takes them in order of pool id_.
+        Callbacks are never called while a ResourcePool lock is held.
+        TimerWheel and AtomicRequest locks are taken last; timers fire 
+        outside of them.
+        
+    Callbacks of requests that had to wait are called from the process'
+    CallbackDispatcher threads, not from a thread per request.  Callbacks 
+    should be short, as they share few threads with all pools.
+        
+    Reservations not collected within hold_time, and resources not returned
+    within expire, are returned to the pool by the process' TimerWheel.
+    As their holder may still use them, resources reclaimed from expired 
+    leases are not handed again: pool drops them, and loads others in their
+    place.  Their holder's late put is logged and ignored.
+    
+    asyncio code uses aget/aput, or lease() as async context manager.  
+    Coroutines awaiting resources are parked as futures on their loop; they
+    are woken by put with the loop's call_soon_threadsafe.
+    
+    Background loading:
+        By default, resources missing to serve get are created by get, with 
+        pool's lock held.  With background_load, or with min_idle set, they 
+        are created by pool's loader threads (load_workers of them) outside
+        of the lock, and handed to awaiting requests as they are ready; get 
+        waits for them as for returned resources, and get with wait 0 does 
+        not get them.  Loader threads activate resources if either 
+        activate_on_load or activate_on_get is set.
+        A resource loader threads fail to create is retried load_retries 
+        times, load_retry_backoff seconds later, doubling with each retry.
+        If it still fails, and no other resource is loading, awaiting 
+        requests are failed: threads awaiting in get raise 
+        ResourcePoolError; requests with callback, and aget, are called 
+        back as if their wait passed, and collect no resources.
+        Loader keeps at least min_idle resources available, as long as 
+        resource_limit allows.  Available resources beyond max_idle are 
+        dropped when returned, and deactivated by loader threads.
+        prewarm() fills pool up front.
+    
+    Health checks and eviction:
+        With test_on_borrow, get validates resources it hands (outside of 
+        pool's lock), unless validated within validation_interval seconds.
+        Resources not valid are evicted, and replaced within get's wait; 
+        replacements of resources collected with ticket, or by aget, are 
+        not awaited.
+        A sweeper, every sweep_interval seconds, evicts available resources
+        idle longer than max_idle_time (keeping min_idle), and resources 
+        older than max_lifetime; with test_while_idle, it also validates 
+        available resources.  Sweeps run in loader threads, off get and put.
+        Resources in use longer than max_lifetime are evicted when returned.
+        Evicted resources are deactivated by loader threads.
+    
+    Leases and leak detection:
+        lease() hands resources for the span of a with (or async with) 
+        block, and returns them when the block is exited, however it exits.
+        Requestors.lease() does the same for multi-pool requests.
+        With leak_threshold set, pool records where resources were gotten 
+        (leak_stack_depth frames of code and line, formatted only when 
+        reported).  Sweeper logs resources in use longer than 
+        leak_threshold, once each, aggregated by where they were gotten;
+        leaks() reports those still in use.
+    
+    Fast path:
+        get(count=1, wait=0) and put of a single resource skip pool's lock 
+        when they can.  put parks resource in a deque (append and pop are 
+        atomic), and get takes parked resources from it.  put first claims
+        resource with a single dict.setdefault, which is atomic too, so 
+        concurrent puts of the same resource park it once; put and discard
+        under lock claim resources as well.  Parked resources
+        are counted as in use until moved to available, which happens 
+        whenever pool's lock is taken; so resource_limit holds, and locked 
+        code sees no change while it holds the lock.  put takes the lock 
+        when requests await resources, and get takes it when nothing is 
+        parked or requests await, so awaiting requests are still served in 
+        order.  Fast path is off with capacity, activate_on_get, 
+        deactivate_on_put, test_on_borrow, min_idle, max_idle or 
+        max_lifetime, and for gets with callback or expire, and puts of 
+        resources with expire.  Fast path does not record hold_seconds, and 
+        its counts are taken without lock.
+    
+    Handoff:
+        When put serves a thread awaiting in get, it hands resources to the
+        thread's waiter directly, and the thread returns them without taking
+        pool's lock again.  Requests with callback, and aget, are passed a 
+        ticket, and collect resources reserved for it (hold_time applies).
+        With direct_handoff policy off, resources are reserved for threads 
+        as well.
+    
+    Sizing:
+        update_policy changes resource_limit, load_size, min_idle, max_idle
+        and validation_interval of pool in use.  PoolSizer (pool_sizer
+        module) uses it to size pool by demand observed in its metrics.
+    
+    Capacity pool:
+        With capacity policy set, pool hands units of capacity (e.g., MB of
+        a budget, or concurrency slots of a backend) instead of resources.
+        get(count=n) serves n units, integer or float, as a single 
+        allocation: a resource_cls object whose units attribute is n.  
+        put returns the allocation's units.  Pool keeps a number of units
+        available, so its memory does not depend on capacity.  Waiting, 
+        callbacks, leases, Requestor and Requestors work as with resources.
+        Loading, idle and health policies do not apply.
+    
+    Pool metrics (see acris.idioms.pool_metrics), through metrics property:
+        counters: requests, served_immediately, waited, wait_timeouts, 
+            rejected, returned, handoffs, loaded, reservations_expired, 
+            leases_expired, dropped, load_failures, wait_failures, 
+            validations, evicted_broken, evicted_idle, evicted_lifetime, 
+            leaks, lock_contended.
+        gauges: available, inuse, awaiting, reserved, loading.
+        histograms: acquire_wait_seconds, hold_seconds, load_seconds, 
+            queue_depth.
+    Metrics are updated under the pool's lock, except by fast path; they 
+    add no locking.
+    
     '''
     
     __policy = {'autoload': True, # automatically load resources when fall behind
@@ -112,10 +340,34 @@ class ResourcePool(NamedSingleton):
                 'activate_on_load': False, # when loading, if set, activate resource
                 'activate_on_get': False, # when get, activate resource if not already active
                 'deactivate_on_put': False, # when returning resource, deactivate, if set.
+                'waiter_scheduler': 'fifo', # policy by which awaiting requests are served
+                'waiter_max_age': 1.0, # seconds before awaiting request holds the line, for aging scheduler
+                'priority_aging': 1.0, # seconds per priority level gained while awaiting, for priority scheduler; 0 for strict
+                'background_load': False, # create resources by loader threads, outside of pool's lock
+                'load_workers': 1, # number of loader threads creating resources in parallel
+                'load_retries': 2, # times loader threads retry creating a resource that failed
+                'load_retry_backoff': 0.1, # seconds before first retry of failed create; doubles with each retry
+                'min_idle': 0, # resources loader keeps available; implies background_load
+                'max_idle': -1, # available resources kept when returned, if not negative
+                'test_on_borrow': False, # validate resources handed by get
+                'validation_interval': 0.0, # seconds a validation is trusted, for test_on_borrow and test_while_idle
+                'test_while_idle': False, # sweeper validates available resources
+                'max_idle_time': -1, # seconds resource may stay available, if not negative
+                'max_lifetime': -1, # seconds since resource was created it may be used, if not negative
+                'sweep_interval': 1.0, # seconds between sweeps of available resources
+                'capacity': None, # if set, units of capacity pool hands as allocations, instead of resources
+                'leak_threshold': -1, # seconds resource may be in use before reported as leaked, if not negative
+                'leak_stack_depth': 4, # frames of where resource was gotten, recorded for leak reports
+                'fast_path': True, # single resource get with no wait, and put, skip lock when they can
+                'virtual': False, # resources are interchangeable; put returns them by quantity
+                'storage': None, # name of storage in pool_storages, or PoolStorage subclass; by capacity and virtual if None
+                'direct_handoff': True, # put hands resources to awaiting threads, instead of reserving them
         }
     
     __allow_set_policy=True
-    __resource_pool_lock=threading.Lock()
+    
+    # policies update_policy may change while pool is in use.
+    __runtime_policy=('resource_limit', 'load_size', 'min_idle', 'max_idle', 'validation_interval', )
     
     __name=''
     
@@ -126,12 +378,17 @@ class ResourcePool(NamedSingleton):
         # sets resource pool policy overriding defaults
         self.name=name
         self.__resource_cls=resource_cls
-        self.__available_resources=dict()
-        self.__awaiting=OrderedDict()
+        self.__parked=deque() # resources put by fast path; still in inuse
+        self.__claims=dict() # resource id to claim of put parking it, or of put or discard in progress
         self.__reserved=OrderedDict()
         self.__inuse_resources=dict()
+        self.__leases=dict() # resource id to LeaseExpiry of resources handed with expire
+        self.__timer_wheel=get_timer_wheel()
+        self.__dispatcher=get_callback_dispatcher()
         self.__id=self.__pool_id_sequence()
-        #self.mutex = threading.RLock()
+        self.__watchers=set() # AtomicRequests awaiting resources of this pool
+        self.__resource_pool_lock=threading.Lock()
+        self.__init_metrics()
         #self.__ticket_sequence=Sequence("ResourcePool.%s" % (resource_cls.__name__, ))
         
         if self.__allow_set_policy:
@@ -139,197 +396,974 @@ class ResourcePool(NamedSingleton):
         else:
             #self.__lock.release()
             raise ResourcePoolError("ResourcePool already in use, cannot set_policy")
+        try:
+            self.__storage=create_pool_storage(self.__policy, resource_cls, name)
+        except PoolStorageError as e:
+            raise ResourcePoolError(str(e))
+        # free list of storage that loads resources; loading, idle and 
+        # health policies work on it.
+        self.__available_resources=self.__storage.available
+        self.__awaiting=create_waiter_scheduler(self.__policy)
+        self.__min_idle=self.__policy['min_idle']
+        self.__max_idle=self.__policy['max_idle']
+        self.__background_load=self.__storage.loads and (self.__policy['background_load'] or self.__min_idle > 0)
+        if 0 <= self.__max_idle < self.__min_idle:
+            raise ResourcePoolError("Policy max_idle (%s) is less than min_idle (%s)" % (self.__max_idle, self.__min_idle))
+        self.__loading=0 # resources being created by loader threads
+        self.__loader=None
+        self.__direct_handoff=self.__policy['direct_handoff']
+        self.__test_on_borrow=self.__policy['test_on_borrow']
+        self.__validation_interval=self.__policy['validation_interval']
+        self.__max_lifetime=self.__policy['max_lifetime']
+        self.__leak_threshold=self.__policy['leak_threshold']
+        self.__leak_stack_depth=self.__policy['leak_stack_depth']
+        self.__shrinking=False # pool holds resources beyond resource_limit
+        self.__fast_path=self.__fast_path_allowed()
+        self.__waiters=self.__awaiting.waiters
+        if self.__policy['test_while_idle'] or self.__policy['max_idle_time'] >= 0 or self.__max_lifetime >= 0 \
+                or self.__leak_threshold >= 0:
+            self.__timer_wheel.schedule(self.__policy['sweep_interval'], self.__sweep_soon)
+        
+    def __fast_path_allowed(self):
+        policy=self.__policy
+        return policy['fast_path'] and self.__storage.fast_path and not policy['activate_on_get'] \
+            and not policy['deactivate_on_put'] and not self.__test_on_borrow and self.__min_idle == 0 \
+            and self.__max_idle < 0 and self.__max_lifetime < 0
+        
+    def __init_metrics(self):
+        metrics=self.__metrics=Metrics('resource_pool', {'pool': self.name})
+        self.__requests=metrics.counter('requests', 'Requests for resources, by get, aget and get_atomic.')
+        self.__served_immediately=metrics.counter('served_immediately', 'Requests served without waiting.')
+        self.__waited=metrics.counter('waited', 'Requests that waited for resources.')
+        self.__wait_timeouts=metrics.counter('wait_timeouts', 'Waiting requests given up before served.')
+        self.__rejected=metrics.counter('rejected', 'Requests not served, as resources were not available and wait was 0.')
+        self.__returned=metrics.counter('returned', 'Resources returned to pool, by put or reclaim.')
+        self.__handoffs=metrics.counter('handoffs', 'Waiting requests served by returned resources.')
+        self.__loaded=metrics.counter('loaded', 'Resources created by pool.')
+        self.__reservations_expired=metrics.counter('reservations_expired', 'Reservations not collected within hold_time.')
+        self.__leases_expired=metrics.counter('leases_expired', 'Leases not returned within expire.')
+        self.__dropped=metrics.counter('dropped', 'Resources dropped as available beyond max_idle or resource_limit.')
+        self.__load_failures=metrics.counter('load_failures', 'Resources loader threads failed to create, including retries.')
+        self.__wait_failures=metrics.counter('wait_failures', 'Waiting requests failed as resources could not be created.')
+        self.__validations=metrics.counter('validations', 'Resources validated by health checks.')
+        self.__evicted_broken=metrics.counter('evicted_broken', 'Resources evicted as not valid, or discarded.')
+        self.__evicted_idle=metrics.counter('evicted_idle', 'Resources evicted as idle longer than max_idle_time.')
+        self.__evicted_lifetime=metrics.counter('evicted_lifetime', 'Resources evicted as older than max_lifetime.')
+        self.__leaks=metrics.counter('leaks', 'Resources found in use longer than leak_threshold.')
+        self.__lock_contended=metrics.counter('lock_contended', 'Pool lock acquisitions that had to wait.')
+        metrics.gauge('available', lambda: self.__free() + len(self.__parked), 'Resources, or units of capacity pool, available in pool.')
+        metrics.gauge('inuse', lambda: len(self.__inuse_resources) - len(self.__parked), 'Resources in use, or reserved.')
+        metrics.gauge('awaiting', lambda: len(self.__awaiting), 'Requests waiting for resources.')
+        metrics.gauge('reserved', lambda: len(self.__reserved), 'Reservations awaiting collection.')
+        metrics.gauge('loading', lambda: self.__loading, 'Resources being created by loader threads.')
+        self.__acquire_wait=metrics.histogram('acquire_wait_seconds', 'Time from request to resources handed or reserved.', 
+                                              zeros=self.__served_immediately)
+        self.__hold=metrics.histogram('hold_seconds', 'Time from resources handed to their return.')
+        self.__load_time=metrics.histogram('load_seconds', 'Time to create and activate a batch of resources.')
+        self.__queue_depth=metrics.histogram('queue_depth', 'Requests waiting, as each request starts waiting.', scale=1)
+        
+    @property
+    def metrics(self):
+        ''' pool's Metrics; see snapshot() and prometheus() of Metrics.
+        '''
+        return self.__metrics
+        
+    @property
+    def policy(self):
+        ''' copy of pool's policy, as is in effect.
+        '''
+        return dict(self.__policy)
+    
+    def update_policy(self, policy):
+        ''' changes policy of pool, also while in use.
+        
+        Policies resource_limit, load_size, min_idle, max_idle and 
+        validation_interval may change any time.  Once resource_limit is 
+        lowered, available resources beyond it are dropped right away, and 
+        resources in use as they are returned.  Once it is raised, resources
+        are loaded for awaiting requests.
+        
+        Args:
+            policy: dict of policies to change.
+            
+        Raises:
+            ResourcePoolError if policy cannot change while pool is in use,
+            or if policy is not consistent.
+        '''
+        fixed=sorted([key for key in policy if key not in self.__runtime_policy])
+        if fixed:
+            raise ResourcePoolError("Policy %s cannot change once pool is in use" % (', '.join(fixed),))
+        min_idle=policy.get('min_idle', self.__min_idle)
+        max_idle=policy.get('max_idle', self.__max_idle)
+        if 0 <= max_idle < min_idle:
+            raise ResourcePoolError("Policy max_idle (%s) is less than min_idle (%s)" % (max_idle, min_idle))
+        self.__sync_acquire()
+        self.__policy.update(policy)
+        self.__min_idle=min_idle
+        self.__max_idle=max_idle
+        self.__background_load=self.__storage.loads and (self.__policy['background_load'] or min_idle > 0)
+        self.__validation_interval=self.__policy['validation_interval']
+        self.__fast_path=self.__fast_path_allowed() and not self.__shrinking
+        if self.__storage.loads:
+            self.__trim()
+            self.__load_for_awaiting()
+            if self.__min_idle > len(self.__available_resources): self.__replenish()
+        self.__sync_release()
+        
+    def __free(self):
+        ''' Returns number of resources, or units of capacity pool, available.
+        '''
+        return self.__storage.free()
         
     def __repr__(self):
         return "ResourcePool( class: %s, policy: %s)" % (self.__resource_cls.__name__, self.__policy)
     
+    @property
+    def id_(self):
+        ''' pool id; orders pool locks taken together.
+        '''
+        return self.__id
+    
     def __sync_acquire(self):
-        (frame, filename, line_number,
-         function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        logger.debug("ResourcePool Acquiring Lock; %s.%s(%s)" % (filename, function_name, line_number))
-        self.__resource_pool_lock.acquire()
+        if lock_logger.isEnabledFor(logging.DEBUG): _trace_lock("ResourcePool", "Acquiring")
+        if not self.__resource_pool_lock.acquire(False):
+            self.__resource_pool_lock.acquire()
+            self.__lock_contended.value+=1
+        if self.__parked: self.__unpark()
+        
+    def __unpark(self):
+        ''' moves resources parked by fast path put to available; called 
+        with lock held.
+        
+        Returns:
+            number of resources moved.
+        '''
+        parked=self.__parked
+        available=self.__available_resources
+        inuse_resources=self.__inuse_resources
+        claims=self.__claims
+        moved=0
+        while True:
+            # fast path get may take parked resources meanwhile.
+            try:
+                resource=parked.popleft()
+            except IndexError:
+                break
+            if inuse_resources.get(resource.id_) is not resource:
+                # taken back meanwhile, e.g., as its lease expired.
+                logger.warning("%s parked resource %s is no longer in use; ignored" % (self.name, resource))
+            else:
+                del inuse_resources[resource.id_]
+                available.append(resource)
+                moved+=1
+            # claim is dropped last, so fast path put cannot park resource 
+            # again while it is still in inuse.
+            claims.pop(resource.id_, None)
+        return moved
         
     def __sync_release(self):
-        (frame, filename, line_number,
-         function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        logger.debug("ResourcePool Releasing Lock; %s.%s(%s)" % (filename, function_name, line_number))
+        if lock_logger.isEnabledFor(logging.DEBUG): _trace_lock("ResourcePool", "Releasing")
         self.__resource_pool_lock.release()
         
     def __load(self, sync=False, count=-1):
         ''' loads resources into pool
+        
+        Args:
+            sync: (boolean) work in object synchronized, if set
+            count: number of resources to add to pool.  If negative, fill 
+                available resources up to load_size.
+            
+        Loading never goes beyond resource_limit.
         '''
         if sync: self.__sync_acquire()
         self.__allow_set_policy=False
+        if not self.__storage.loads: count=0
+        resource_limit=self.__policy['resource_limit']
         if count is None or count < 0:
             load_size=self.__policy['load_size']
-            resource_limit=self.__policy['resource_limit']
             count=min(load_size, resource_limit) if resource_limit >=0 else load_size
-        
-        count=count-len(self.__available_resources) 
+            count=count-len(self.__available_resources) 
+        if resource_limit >= 0:
+            hot_resources=len(self.__available_resources) + len(self.__inuse_resources) + self.__loading
+            count=min(count, resource_limit - hot_resources)
+            
         if count > 0: 
             activate_on_load=self.__policy['activate_on_load']
-            for _ in range(count):
-                resource=self.__resource_cls()
+            start=time.monotonic()
+            resources=[self.__resource_cls() for _ in range(count)]
+            for resource in resources:
                 try:
                     if activate_on_load: resource.activate()
                 except Exception as e:
+                    if sync: self.__sync_release()
                     raise e
                 resource.pool=self.name
-                
-                self.__available_resources[resource.id_]=resource 
+            self.__available_resources.extend(resources)
+            self.__load_time.record(time.monotonic() - start)
+            self.__loaded.value+=count
         if sync: self.__sync_release()          
     
     def load(self, count=-1):
         ''' loads resources into pool
+        
+        Args:
+            count: number of resources to add to pool.  If negative, fill 
+                available resources up to policy's load_size.
         '''
-        self.__load(sync=True, count=-1)         
+        if not self.__storage.loads: return self
+        self.__load(sync=True, count=count)         
+        if self.__min_idle > 0:
+            self.__sync_acquire()
+            self.__replenish()
+            self.__sync_release()
         return self
     
-    def __remove_ticket(self, ticket, sync=False):
-        if sync: self.__sync_acquire()
-        logger.debug("Removing reservation ticket: %s, %s" % (ticket, repr(self.__reserved)))
-        del self.__reserved[ticket]
-        if sync: self.__sync_release()
+    def prewarm(self, count=-1, wait=True):
+        ''' creates resources by loader threads, in parallel and outside of 
+        pool's lock.
+        
+        Args:
+            count: number of resources to have available.  If negative, 
+                policy's min_idle.
+            wait: if set, returns once resources are loaded.
+        
+        Returns:
+            self
+        '''
+        if not self.__storage.loads: return self
+        self.__sync_acquire()
+        self.__allow_set_policy=False
+        if count is None or count < 0: count=self.__min_idle
+        futures=self.__schedule_load(count - len(self.__available_resources) - self.__loading)
+        self.__sync_release()
+        if wait and futures: concurrent.futures.wait(futures)
+        return self
     
-    @Threaded()
-    def __wait_on_condition_callback(self, condition, seconds, ticket, callback):
+    def __schedule_load(self, count):
+        ''' starts loader threads creating up to count resources, as 
+        resource_limit allows; called with lock held.
+        
+        Returns:
+            list of futures of resources being created.
+        '''
+        if not self.__storage.loads: return []
+        resource_limit=self.__policy['resource_limit']
+        if resource_limit >= 0:
+            hot_resources=len(self.__available_resources) + len(self.__inuse_resources) + self.__loading
+            count=min(count, resource_limit - hot_resources)
+        if count <= 0: return []
+        self.__loading+=count
+        loader=self.__get_loader()
+        return [loader.submit(self.__create) for _ in range(count)]
+    
+    def __load_for(self, count):
+        ''' starts loading resources missing to serve request of count, 
+        after awaiting requests; called with lock held.
+        '''
+        demand=count + sum([waiter.count for waiter in self.__awaiting])
+        self.__schedule_load(demand - len(self.__available_resources) - self.__loading)
+    
+    def __get_loader(self):
+        if self.__loader is None:
+            self.__loader=ThreadPoolExecutor(max_workers=self.__policy['load_workers'], 
+                                             thread_name_prefix='ResourcePool-%s-loader' % (self.name,))
+        return self.__loader
+    
+    def __replenish(self):
+        ''' tops available resources up to min_idle; called with lock held.
+        '''
+        missing=self.__min_idle - len(self.__available_resources) - self.__loading
+        if missing > 0: self.__schedule_load(missing)
+    
+    def __create(self, attempt=0):
+        ''' creates a resource, in loader thread, and adds it to pool.  If 
+        create fails, it is retried with backoff; once retries are spent, 
+        awaiting requests are failed.
+        
+        Args:
+            attempt: number of attempts failed so far.
+        '''
+        start=time.monotonic()
         try:
-            with condition:
-                condition.wait(seconds)
+            resource=self.__resource_cls()
+            if self.__policy['activate_on_load'] or self.__policy['activate_on_get']: 
+                resource.activate()
+        except Exception as e:
+            if attempt < self.__policy['load_retries']:
+                backoff=self.__policy['load_retry_backoff'] * 2 ** attempt
+                logger.warning("%s failed to create resource: %s; retrying in %s seconds" % (self.name, e, backoff))
+                self.__sync_acquire()
+                self.__load_failures.value+=1
+                self.__sync_release()
+                # resource is still loading; loader thread is not held meanwhile.
+                self.__timer_wheel.schedule(backoff, self.__create_soon, attempt + 1)
+                return
+            logger.error("%s failed to create resource: %s" % (self.name, e))
+            self.__sync_acquire()
+            self.__loading-=1
+            self.__load_failures.value+=1
+            if self.__loading == 0: self.__fail_awaiting(e)
+            self.__sync_release()
+            return
+        resource.pool=self.name
+        self.__sync_acquire()
+        self.__loading-=1
+        self.__loaded.value+=1
+        self.__load_time.record(time.monotonic() - start)
+        self.__available_resources.append(resource)
+        self.__serve_awaiting()
+        self.__sync_release()
+        
+    def __create_soon(self, attempt):
+        # called by TimerWheel; creating is left to loader.
+        try:
+            self.__get_loader().submit(self.__create, attempt)
         except RuntimeError:
-            pass
+            # interpreter is shutting down; nothing is loading anymore.
+            self.__sync_acquire()
+            self.__loading-=1
+            self.__sync_release()
+        
+    def __fail_awaiting(self, error):
+        ''' fails awaiting requests, as resources cannot be created; called 
+        with lock held.
+        
+        Threads awaiting in get are woken to raise ResourcePoolError.  
+        Requests with callback are called back, as when their wait passes, 
+        with nothing reserved for their ticket.
+        '''
+        for waiter in self.__awaiting:
+            self.__awaiting.remove(waiter.ticket)
+            self.__wait_failures.value+=1
+            logger.debug("%s failing wait on ticket %s" % (self.name, waiter.ticket,))
+            if waiter.loop is not None:
+                try:
+                    waiter.loop.call_soon_threadsafe(waiter.callback, waiter.ticket)
+                except RuntimeError:
+                    # loop is closed; nobody awaits.
+                    pass
+            elif waiter.callback:
+                if waiter.timer is not None: self.__timer_wheel.cancel(waiter.timer)
+                self.__dispatcher.dispatch(waiter.callback, waiter.ticket)
+            else:
+                waiter.error=error
+                with waiter.condition:
+                    waiter.condition.notify()
+        
+    def __drop(self, resources):
+        ''' deactivates resources dropped from pool, in loader thread.
+        '''
+        for resource in resources:
+            try:
+                resource.deactivate()
+            except Exception as e:
+                logger.error("%s failed to deactivate dropped resource %s: %s" % (self.name, resource, e))
+                
+    def __validate(self, resource, now):
+        ''' Returns True if resource is valid; called without lock.
+        '''
+        try:
+            valid=resource.validate()
         except Exception as e:
-            raise e   
-        logger.debug("%s woke up from condition wait: ticket: %s:" % (self.name,ticket,))     
-        callback(ticket)
+            logger.warning("%s failed to validate resource %s: %s" % (self.name, resource, e))
+            valid=False
+        resource.validated_at=now
+        return valid
+    
+    def __evict(self, resources, counter=None, deactivate=True):
+        ''' evicts resources no longer in available or in inuse, and loads 
+        resources for awaiting requests in their place; called with lock 
+        held.
+        '''
+        if counter is not None: counter.value+=len(resources)
+        if deactivate: self.__get_loader().submit(self.__drop, resources)
+        self.__load_for_awaiting()
+        if self.__min_idle > len(self.__available_resources): self.__replenish()
+        
+    def __load_for_awaiting(self):
+        ''' loads resources missing to serve awaiting requests, as 
+        resource_limit allows; called with lock held.
+        '''
+        if len(self.__awaiting) == 0: return
+        if self.__background_load:
+            self.__load_for(0)
+        else:
+            missing=sum([waiter.count for waiter in self.__awaiting]) - len(self.__available_resources)
+            if missing > 0: 
+                self.__load(count=missing)
+                self.__serve_awaiting()
+        
+    def __trim(self):
+        ''' drops coldest available resources beyond max_idle, or beyond 
+        resource_limit; called with lock held.
+        '''
+        available=self.__available_resources
+        excess=len(available) - self.__max_idle if self.__max_idle >= 0 else 0
+        resource_limit=self.__policy['resource_limit']
+        over=len(available) + len(self.__inuse_resources) + self.__loading - resource_limit if resource_limit >= 0 else 0
+        excess=min(max(excess, over), len(available))
+        if excess > 0:
+            # get takes from the other end.
+            dropped=[available.popleft() for _ in range(excess)]
+            self.__dropped.value+=len(dropped)
+            if not self.__policy['deactivate_on_put']:
+                self.__get_loader().submit(self.__drop, dropped)
+        # fast path put would keep resources beyond resource_limit; it 
+        # resumes once they are all dropped.
+        shrinking=over > excess
+        if shrinking != self.__shrinking:
+            self.__shrinking=shrinking
+            self.__fast_path=self.__fast_path_allowed() and not shrinking
+            
+    def __borrowed(self, resources, wait, deadline=None):
+        ''' validates resources handed by get, outside of lock.  Resources 
+        not valid are evicted, and replaced within wait.
         
-    def __wait_on_condition_here(self, condition, seconds, ticket):
+        Args:
+            resources: resources handed by get.
+            wait: wait of get.
+            deadline: if wait is positive, monotonic time get must return by;
+                replacements are waited for only the time remaining.
+        
+        Returns:
+            resources valid; empty if replacements are not available.
+        '''
+        now=time.monotonic()
+        interval=self.__validation_interval
+        checking=[resource for resource in resources if now - resource.validated_at >= interval]
+        if not checking: return resources
+        broken=[resource for resource in checking if not self.__validate(resource, now)]
+        
+        self.__sync_acquire()
+        self.__validations.value+=len(checking)
+        if broken:
+            logger.warning("%s evicting %s resources not valid on borrow" % (self.name, len(broken)))
+            if self.__leases: self.__end_leases(broken)
+            for resource in broken: del self.__inuse_resources[resource.id_]
+            self.__evict(broken, self.__evicted_broken)
+        self.__sync_release()
+        if not broken: return resources
+        
+        broken_ids=set([resource.id_ for resource in broken])
+        valid=[resource for resource in resources if resource.id_ not in broken_ids]
+        if wait > 0: wait=max(0, deadline - time.monotonic())
+        # get returns None if wait passes.
+        replacements=self.get(count=len(broken), wait=wait) or []
+        if len(replacements) < len(broken):
+            if valid or replacements: self.put(*(valid + replacements))
+            return []
+        return valid + replacements
+    
+    def __sweep_soon(self):
+        # called by TimerWheel; sweeping may validate, so it is left to loader.
         try:
-            with condition:
-                condition.wait(seconds)
+            self.__get_loader().submit(self.__sweep)
         except RuntimeError:
+            # interpreter is shutting down; sweeping stops.
             pass
-        except Exception as e:
-            raise e
-        
-        # process finished waiting either due to time passed
-        # or that resources were reserved.  
-        # Hence, try to pick reserved resources
-        result=self.__reserved.get(ticket, None)
-        if result: 
-            self.__remove_ticket(ticket)
-
+        
+    def __sweep(self):
+        ''' evicts idle, old and, with test_while_idle, broken available 
+        resources, and reports leaks; runs in loader thread.
+        '''
+        policy=self.__policy
+        try:
+            self.__sweep_once(policy['max_idle_time'], policy['max_lifetime'], policy['test_while_idle'])
+            if self.__leak_threshold >= 0: self.__detect_leaks()
+        finally:
+            self.__timer_wheel.schedule(policy['sweep_interval'], self.__sweep_soon)
+            
+    def __sweep_once(self, max_idle_time, max_lifetime, test_while_idle):
+        now=time.monotonic()
+        self.__sync_acquire()
+        try:
+            available=self.__available_resources
+            idle, old, kept=list(), list(), deque()
+            idle_allowed=len(available) - self.__min_idle
+            # coldest resources are on the left.
+            for resource in available:
+                if max_lifetime >= 0 and now - resource.created_at > max_lifetime:
+                    old.append(resource)
+                elif max_idle_time >= 0 and len(idle) < idle_allowed and now - resource.idle_since > max_idle_time:
+                    idle.append(resource)
+                else:
+                    kept.append(resource)
+            if idle or old:
+                available.clear()
+                available.extend(kept)
+                if old: self.__evict(old, self.__evicted_lifetime)
+                if idle: self.__evict(idle, self.__evicted_idle)
+                logger.debug("%s swept %s idle and %s old resources", self.name, len(idle), len(old))
+            interval=self.__validation_interval
+            checking=[resource for resource in kept if now - resource.validated_at >= interval] \
+                     if test_while_idle else []
+        finally:
+            self.__sync_release()
+        
+        broken=[resource for resource in checking if not self.__validate(resource, now)]
+        if checking or broken:
+            self.__sync_acquire()
+            self.__validations.value+=len(checking)
+            # resources may have been handed out meanwhile; those are left to test_on_borrow.
+            available=self.__available_resources
+            evicted=[resource for resource in broken if resource in available]
+            for resource in evicted: available.remove(resource)
+            if evicted: self.__evict(evicted, self.__evicted_broken)
+            self.__sync_release()
+    
+    def __overdue(self, now):
+        ''' returns resources gotten, and in use longer than leak_threshold;
+        called with lock held.
+        '''
+        since=now - self.__leak_threshold
+        # reserved resources are not gotten yet; hold_time limits them.
+        reserved=set([resource.id_ for reservation in self.__reserved.values() for resource in reservation.resources])
+        return [resource for resource in list(self.__inuse_resources.values()) 
+                if resource.acquired_at < since and resource.id_ not in reserved and resource.id_ not in self.__claims]
+    
+    @staticmethod
+    def __aggregate_leaks(resources, now):
+        by_stack=dict()
+        for resource in resources:
+            stack=getattr(resource, 'acquired_stack', ())
+            count, acquired_at=by_stack.get(stack, (0, now))
+            by_stack[stack]=(count + 1, min(acquired_at, resource.acquired_at))
+        reports=[LeakReport(count, now - acquired_at, _format_stack(stack)) for stack, (count, acquired_at) in by_stack.items()]
+        reports.sort(key=lambda report: report.count, reverse=True)
+        return reports
+        
+    def __detect_leaks(self):
+        ''' logs resources that became overdue since last sweep, aggregated 
+        by where they were gotten.
+        '''
+        now=time.monotonic()
+        self.__sync_acquire()
+        leaked=[resource for resource in self.__overdue(now) if not getattr(resource, 'leak_reported', False)]
+        for resource in leaked: resource.leak_reported=True
+        self.__leaks.value+=len(leaked)
+        self.__sync_release()
+        for report in self.__aggregate_leaks(leaked, now):
+            logger.warning("%s %s resources in use longer than %ss (oldest %.1fs); gotten at:\n  %s", self.name, 
+                           report.count, self.__leak_threshold, report.oldest, '\n  '.join(report.stack))
+        
+    def __trace(self, resources):
+        ''' records where resources were gotten, for leak detection; called 
+        by methods handing resources, right before returning them.
+        '''
+        # frames of this method and of its caller are jumped over.
+        stack=_acquisition_stack(self.__leak_stack_depth, skip=2)
+        for resource in resources:
+            resource.acquired_stack=stack
+            resource.leak_reported=False
+            
+    def leaks(self):
+        ''' reports resources in use longer than leak_threshold policy.
+        
+        Returns:
+            list of LeakReport(count, oldest, stack), one per place 
+            resources were gotten at, most resources first; oldest is 
+            seconds the oldest of them is in use, and stack is list of 
+            lines, innermost first.  Empty if leak_threshold is not set.
+        '''
+        if self.__leak_threshold < 0: return []
+        now=time.monotonic()
+        self.__sync_acquire()
+        overdue=self.__overdue(now)
+        self.__sync_release()
+        return self.__aggregate_leaks(overdue, now)
+    
+    def __wait_on_condition(self, waiter, seconds):
+        ''' waits until put hands resources to waiter, or reserves them for 
+        it, or until wait passes.
+        
+        Returns:
+            resources; None if wait passed.
+            
+        Raises:
+            ResourcePoolError: if waiter failed as resources cannot be created.
+        '''
+        # put hands or reserves resources before notifying under condition; 
+        # checking them under condition avoids missing a notification that 
+        # came before waiting started.
+        condition, ticket=waiter.condition, waiter.ticket
+        with condition:
+            if waiter.resources is None and waiter.error is None and ticket not in self.__reserved:
+                condition.wait(seconds)
+        # handed resources are waiter's; no need for pool's lock.
+        if waiter.resources is not None: return waiter.resources
+        
+        # resources were reserved, or wait passed; if so, stop awaiting.  
+        # Resources may be handed meanwhile, under pool's lock.
+        self.__sync_acquire()
+        result=waiter.resources
+        if result is None:
+            result=self.__collect(ticket)
+            if result is None and self.__awaiting.remove(ticket) is not None: 
+                logger.debug("%s wait on ticket %s timed out" % (self.name, ticket,))
+                self.__wait_timeouts.value+=1
+        self.__sync_release()
+        if result is None and waiter.error is not None:
+            raise ResourcePoolError("%s failed to create resources: %s" % (self.name, waiter.error))
         return result
+    
+    def __expire_waiter(self, ticket):
+        self.__sync_acquire()
+        waiter=self.__awaiting.remove(ticket)
+        if waiter is not None: self.__wait_timeouts.value+=1
+        self.__sync_release()
+        if waiter is not None:
+            logger.debug("%s wait on ticket %s timed out" % (self.name, ticket,))
+            self.__dispatcher.dispatch(waiter.callback, ticket)
+        
+    def __abandon(self, ticket):
+        ''' drops request of ticket, either awaiting or reserved.  Resources 
+        reserved for it go back to pool.
+        '''
+        self.__sync_acquire()
+        if self.__awaiting.remove(ticket) is not None:
+            self.__wait_timeouts.value+=1
+        else:
+            reservation=self.__reserved.pop(ticket, None)
+            if reservation is not None:
+                if reservation.timer is not None: 
+                    self.__timer_wheel.cancel(reservation.timer)
+                self.__deposit(reservation.resources)
+        self.__sync_release()
+        
+    def __reserve(self, waiter):
+        ''' reserves resources for waiter; called with lock held.
+        '''
+        resources=self._get(count=waiter.count)
+        timer=None
+        if waiter.hold_time is not None and waiter.hold_time >= 0:
+            timer=self.__timer_wheel.schedule(waiter.hold_time, self.__expire_reservation, waiter.ticket)
+        self.__reserved[waiter.ticket]=Reservation(resources, waiter.expire, timer)
+        
+    def __collect(self, ticket):
+        ''' picks reserved resources of ticket; called with lock held.
+        
+        Returns:
+            reserved resources, or None if there is no reservation for ticket.
+        '''
+        reservation=self.__reserved.pop(ticket, None)
+        if reservation is None: return None
+        if reservation.timer is not None: 
+            self.__timer_wheel.cancel(reservation.timer)
+        self.__start_lease(reservation.resources, reservation.expire)
+        return reservation.resources
+    
+    def __expire_reservation(self, ticket):
+        self.__sync_acquire()
+        reservation=self.__reserved.pop(ticket, None)
+        if reservation is not None:
+            logger.info("%s reservation %s was not collected in time; returning %s resources to pool" % (self.name, ticket, len(reservation.resources)))
+            self.__reservations_expired.value+=1
+            self.__deposit(reservation.resources)
+        self.__sync_release()
+        
+    def __start_lease(self, resources, expire):
+        ''' starts expire count down on resources; called with lock held.
+        '''
+        if expire is None or expire < 0 or not resources: return
+        lease=LeaseExpiry(resources)
+        lease.timer=self.__timer_wheel.schedule(expire, self.__expire_lease, lease)
+        for resource in resources:
+            self.__leases[resource.id_]=lease
             
-    def __wait(self, sync, count, wait, callback=None):
+    def __end_leases(self, resources):
+        ''' stops expire count down on returned resources; called with lock held.
+        '''
+        for resource in resources:
+            lease=self.__leases.pop(resource.id_, None)
+            if lease is None: continue
+            lease.outstanding-=1
+            if lease.outstanding == 0:
+                self.__timer_wheel.cancel(lease.timer)
+    
+    def __expire_lease(self, lease):
+        self.__sync_acquire()
+        # resources may have been returned already, and even handed again to others.
+        reclaim=[resource for resource in lease.resources if self.__leases.get(resource.id_) is lease]
+        if reclaim:
+            logger.warning("%s lease expired; reclaiming %s resources" % (self.name, len(reclaim)))
+            self.__leases_expired.value+=1
+            for resource in reclaim: resource.reclaimed=True
+            if not self.__storage.loads:
+                # allocations are not handed again; their units are.
+                self.__deposit(reclaim)
+            else:
+                # holder may still use and put them; so they are dropped 
+                # rather than handed to others.
+                self.__end_leases(reclaim)
+                for resource in reclaim: del self.__inuse_resources[resource.id_]
+                self.__evict(reclaim)
+        self.__sync_release()
+        
+    def __skip_reclaimed(self, resources, action):
+        ''' Returns resources not reclaimed by expired lease; late put and 
+        discard of reclaimed resources are logged and ignored.  Called with 
+        lock held.
+        '''
+        reclaimed=[resource for resource in resources if resource.reclaimed]
+        if not reclaimed: return resources
+        logger.warning("%s ignoring %s of %s, reclaimed as their lease expired" % (self.name, action, reclaimed))
+        return [resource for resource in resources if not resource.reclaimed]
+            
+    def __wait(self, sync, count, wait, callback=None, hold_time=None, expire=None, loop=None, priority=0):
         ''' waits for count resources, 
         
-        wait uses condition object.  put method would use 
-        the same condition object to notify wait of resources 
+        Without callback, wait uses condition object.  put method would 
+        use the same condition object to notify wait of resources 
         reserved for this request.
         
-        It is assumed that calling process is separated thread.  
-        Otherwise, process deadlocks.
+        With callback, nothing waits; put dispatches callback once 
+        resources are reserved, and TimerWheel dispatches it if wait 
+        seconds pass first.
         
         Args:
             sync: (boolean) work in object synchronized, if set
             count: number of resources to wait on
             callback: callable to call back once resources are available
+            hold_time: seconds to hold reserved resources for collection
+            expire: seconds to limit use of resources once collected
+            loop: asyncio loop on which callback is to be called; wait 
+                timeout is then left to the caller.
+            priority: priority of request, for priority scheduler.
             
         Returns:
             list of resources, if callback is not provided (None)
-            reservation ticked to use once called back, if callback is provided.
+            None, if callback is provided; reservation ticket is passed to callback.
+            reservation ticket, if loop is provided.
         
         '''
+        if callback:
+            ticket=self.__await(count, wait, callback, hold_time=hold_time, expire=expire, loop=loop, priority=priority)
+            if sync: self.__sync_release()
+            return ticket if loop is not None else None
+        
         seconds=None if wait <0 else wait
-        condition = threading.Condition()
         caller=callback.name if hasattr(callback, 'name') else ""
         ticket=Ticket(self.name, self.__ticket_sequence())
-        self.__awaiting[ticket]=(condition, count, caller,)
-        
+        self.__waited.value+=1
+        self.__queue_depth.record(len(self.__awaiting) + 1)
+        waiter=Waiter(ticket, count, caller, threading.Condition(), hold_time=hold_time, expire=expire, priority=priority)
+        self.__awaiting.add(waiter)
+        self.__unpark_awaited()
         if sync: self.__sync_release()
+        return self.__wait_on_condition(waiter, seconds)
+
+    def __await(self, count, wait, callback, hold_time=None, expire=None, loop=None, priority=0):
+        ''' queues request to be called back once resources are reserved for
+        it, or once wait passes; called with lock held.  See __wait.
         
-        if not callback:
-            result=self.__wait_on_condition_here(condition, seconds, ticket)
-        else:
-            self.__wait_on_condition_callback(condition, seconds, ticket, callback)
-            result=None
-         
-        return result
+        Returns:
+            reservation ticket
+        '''
+        caller=callback.name if hasattr(callback, 'name') else ""
+        ticket=Ticket(self.name, self.__ticket_sequence())
+        self.__waited.value+=1
+        self.__queue_depth.record(len(self.__awaiting) + 1)
+        waiter=Waiter(ticket, count, caller, hold_time=hold_time, expire=expire, callback=callback, loop=loop, priority=priority)
+        if wait >= 0 and loop is None:
+            waiter.timer=self.__timer_wheel.schedule(wait, self.__expire_waiter, ticket)
+        self.__awaiting.add(waiter)
+        self.__unpark_awaited()
+        return ticket
 
-    def _get(self, sync=False, count=1, wait=-1, callback=None, hold_time=None, ticket=None):
+    def __unpark_awaited(self):
+        ''' serves awaiting requests with resources parked since lock was 
+        taken; called with lock held, right after request starts awaiting.
+        
+        Fast path put parks, and then takes lock if requests await.  So 
+        either it sees the new awaiting request, or its resource is parked 
+        by now.
+        '''
+        if self.__parked and self.__unpark(): self.__serve_awaiting()
+        
+    def _get(self, sync=False, count=1, wait=-1, callback=None, hold_time=None, expire=None, ticket=None, loop=None, priority=0):
         self.__allow_set_policy=False
         
         if ticket is not None:
             # process finished waiting either due to time passed
             # or that resources were reserved.  
             # Hence, try to pick reserved resources
-            logger.debug("%s Addressing get with ticket %s" % (self.name, ticket))
-            result=self.__reserved.get(ticket, None)
+            logger.debug("%s Addressing get with ticket %s", self.name, ticket)
+            if sync: self.__sync_acquire()
+            result=self.__collect(ticket)
+            if sync: self.__sync_release()
             if result: 
-                logger.debug("%s found ticket %s" % (self.name, ticket))
-                self.__remove_ticket(ticket=ticket, sync=sync)
+                logger.debug("%s found ticket %s", self.name, ticket)
                 return result
-            else:
-                logger.debug("%s ticket %s not fond" % (self.name, ticket))
-                     
+            # reservation was not made in time; there is nothing to collect.
+            logger.debug("%s ticket %s not fond", self.name, ticket)
+            return []
+        
         resource_limit=self.__policy['resource_limit']
-        if resource_limit > -1 and count >resource_limit:
-            raise ResourcePoolError("Trying to get count (%s) larger than resource limit (%s)" % (count, resource_limit))
+        error=self.__storage.check_count(count, resource_limit)
+        if error: raise ResourcePoolError(error)
         
-        if sync: self.__sync_acquire()
+        if sync: 
+            self.__sync_acquire()
+            self.__requests.value+=1
         
         activate_on_get=self.__policy['activate_on_get']
         # If there are awaiting processes, wait too, and this call is not after
-        # put (for an awated process).
-        if len(self.__awaiting) > 0 and sync:
-            resources=self.__wait(sync=sync, count=count, wait=wait, callback=callback)
-            if activate_on_get: self.__activate_allocated_resource(resources)
+        # put (for an awated process), unless scheduler lets request ahead.
+        if sync and len(self.__awaiting) > 0 \
+                and not self.__awaiting.admit(count, self.__free(), priority):
+            if self.__background_load: self.__load_for(count)
+            resources=self.__wait(sync=sync, count=count, wait=wait, callback=callback, hold_time=hold_time, expire=expire, loop=loop, priority=priority)
+            if activate_on_get and isinstance(resources, list): self.__activate_allocated_resource(resources)
             return resources
         
         # try to see if request can be addressed by existing or by loading new 
         # resources.
         available_loaded=len(self.__available_resources)
-        inuse_resources=len(self.__inuse_resources)
-        hot_resources=available_loaded+inuse_resources
-        missing_to_serve=count-available_loaded
-        if missing_to_serve < 0: missing_to_serve=0
-        allowed_to_load=resource_limit-hot_resources if resource_limit > 0 else missing_to_serve
-        
-        to_load=min(missing_to_serve, allowed_to_load)
-        
-        #print("TOLOAD: %s (available_loaded: %s, missing_to_serve: %s, allowed_to_load: %s, inuse_resources %s, hot_resources: %s)" % \
-        #      (to_load, available_loaded, missing_to_serve, allowed_to_load, inuse_resources, hot_resources))
-        if to_load > 0:
-            self.__load(sync=False, count=to_load)
+        if self.__background_load:
+            # loader threads create resources outside of lock; request waits for them.
+            if count > available_loaded: self.__load_for(count)
+        elif self.__storage.loads:
+            inuse_resources=len(self.__inuse_resources)
+            hot_resources=available_loaded+inuse_resources
+            missing_to_serve=count-available_loaded
+            if missing_to_serve < 0: missing_to_serve=0
+            allowed_to_load=resource_limit-hot_resources if resource_limit > 0 else missing_to_serve
+            
+            to_load=min(missing_to_serve, allowed_to_load)
+            
+            #print("TOLOAD: %s (available_loaded: %s, missing_to_serve: %s, allowed_to_load: %s, inuse_resources %s, hot_resources: %s)" % \
+            #      (to_load, available_loaded, missing_to_serve, allowed_to_load, inuse_resources, hot_resources))
+            if to_load > 0:
+                self.__load(sync=False, count=to_load)
             
         # if resources are available to serve the request, do so.
         # if not, and there is wait, then do wait.
         # otherwise return no resources.
-        if len(self.__available_resources) >= count:
+        if self.__free() >= count:
             # There are enough resources to serve!
-            resource_names=list(self.__available_resources.keys())[:count]
-            resources=list()
-            logger.debug('%s assigning %s to inuse' % (self.name, resource_names,))
-            for name in resource_names:
-                resource=self.__available_resources[name]
-                resources.append(resource)
-                del self.__available_resources[name]
-                self.__inuse_resources[name]=resource
-            if sync: self.__sync_release()
+            resources=self.__storage.take(count)
+            self.__inuse_resources.update([(resource.id_, resource) for resource in resources])
+            now=time.monotonic()
+            for resource in resources: resource.acquired_at=now
+            logger.debug('%s assigning %s to inuse', self.name, resources)
+            if self.__min_idle > len(self.__available_resources): self.__replenish()
+            if sync: 
+                self.__served_immediately.value+=1
+                self.__start_lease(resources, expire)
+                self.__sync_release()
         elif wait != 0:
             # No resources.  But need to wait.
-            resources=self.__wait(sync=sync, count=count, wait=wait, callback=callback)
+            resources=self.__wait(sync=sync, count=count, wait=wait, callback=callback, hold_time=hold_time, expire=expire, loop=loop, priority=priority)
         else:
             # No resources and no need to wait; we are done!
             resources=[]
-            if sync: self.__sync_release()
+            if sync: 
+                self.__rejected.value+=1
+                self.__sync_release()
             pass
         
-        if activate_on_get: self.__activate_allocated_resource(resources)
+        if activate_on_get and isinstance(resources, list): self.__activate_allocated_resource(resources)
         return resources
     
-    def get(self, count=1, wait=-1, callback=None, hold_time=None, expire=None, ticket=None):
+    def __can_serve(self, count, priority=0):
+        ''' checks if count resources can be served right away, ahead of no
+        awaiting request; called with lock held.
+        '''
+        available=self.__free()
+        if len(self.__awaiting) > 0 and not self.__awaiting.admit(count, available, priority):
+            return False
+        if available >= count: return True
+        if not self.__storage.loads: return False
+        if self.__background_load:
+            # watchers are woken when loaded resources are added.
+            self.__load_for(count)
+            return False
+        resource_limit=self.__policy['resource_limit']
+        if resource_limit < 0: return True
+        return resource_limit - available - len(self.__inuse_resources) >= count - available
+    
+    @staticmethod
+    def get_atomic(request, expire=None, priority=0):
+        ''' gets resources from multiple pools all at once, or none at all.
+        
+        Locks of all pools are taken together, in order of pool id_, so 
+        concurrent calls cannot deadlock, and no partial allocation is ever
+        held.  Does not wait; see AtomicRequest.
+        
+        Args:
+            request: iterator on tuples of resource pool and count.
+            expire: seconds to limit use of resources.
+            priority: priority of request, for pools with priority scheduler.
+            
+        Returns:
+            list of lists of resources, in order of request, if all could be 
+            served; None otherwise.
+        '''
+        return ResourcePool.get_atomic_many([request], expire=expire, priority=priority)[0]
+    
+    @staticmethod
+    def get_atomic_many(requests, expire=None, priority=0):
+        ''' gets resources of many requests from multiple pools in one pass, 
+        each request all at once or none at all; see get_atomic.
+        
+        Locks of all pools of all requests are taken once, together.  
+        Requests are served in order, as far as resources go.
+        
+        Args:
+            requests: iterator on requests, each an iterator on tuples of 
+                resource pool and count.
+            expire: seconds to limit use of resources.
+            priority: priority of requests, for pools with priority scheduler.
+            
+        Returns:
+            list, in order of requests, of list of lists of resources, in 
+            order of request, for request served; None for request not served.
+        '''
+        requests=[list(request) for request in requests]
+        pools=sorted(set([pool for request in requests for pool, _ in request]), key=lambda pool: pool.__id)
+        for pool in pools: pool.__sync_acquire()
+        try:
+            results=list()
+            for request in requests:
+                # pool may appear more than once in request.
+                totals=OrderedDict()
+                for pool, count in request: totals[pool]=totals.get(pool, 0) + count
+                if not all([pool.__can_serve(count, priority) for pool, count in totals.items()]):
+                    results.append(None)
+                    continue
+                result=[pool._get(count=count, wait=0) for pool, count in request]
+                if not all([pool.__storage.count(resources) == count for (pool, count), resources in zip(request, result)]):
+                    # none at all; pool could not serve as it checked it could.
+                    for (pool, _), resources in zip(request, result):
+                        if resources: pool.__deposit(resources)
+                    results.append(None)
+                    continue
+                for (pool, _), resources in zip(request, result):
+                    pool.__requests.value+=1
+                    pool.__served_immediately.value+=1
+                    pool.__start_lease(resources, expire)
+                results.append(result)
+            for request, result in zip(requests, results):
+                if result is None: continue
+                for (pool, _), resources in zip(request, result):
+                    if pool.__leak_threshold >= 0 and resources: pool.__trace(resources)
+            return results
+        finally:
+            for pool in reversed(pools): pool.__sync_release()
+            
+    def _watch(self, watcher):
+        ''' registers watcher to be woken whenever resources are returned
+        '''
+        self.__sync_acquire()
+        self.__watchers.add(watcher)
+        self.__sync_release()
+        
+    def _unwatch(self, watcher):
+        self.__sync_acquire()
+        self.__watchers.discard(watcher)
+        self.__sync_release()
+        
+    def get(self, count=1, wait=-1, callback=None, hold_time=None, expire=None, ticket=None, priority=0):
         ''' retrieve resource from pool
         
         get checks for availability of count resources. If available: provide.
@@ -356,21 +1390,189 @@ class ResourcePool(NamedSingleton):
             callback: notify that resources are available to collect
             hold_time: seconds to hold reserve resources on callback.  
                 If not collected in within the specify period, reserved go
-                back to pull.
-            expire: seconds to limit use of resources
+                back to pool.
+            expire: seconds to limit use of resources.  If not returned 
+                within the specified period, resources are reclaimed back
+                to pool, and their late put is ignored.
             ticket: reserved ticket provided in callback to allow client pick their 
                 reserved resources. 
+            priority: higher is more urgent.  With priority waiter_scheduler, 
+                awaiting requests are served by priority, and request may be 
+                served ahead of awaiting requests of lower priority.
             
         Raises:
             ResourcePoolError
         '''
+        if self.__fast_path and count == 1 and wait == 0 and callback is None and ticket is None \
+                and expire is None and not self.__waiters:
+            try:
+                resource=self.__parked.pop()
+            except IndexError:
+                pass
+            else:
+                self.__claims.pop(resource.id_, None)
+                resource.acquired_at=time.monotonic()
+                self.__requests.value+=1
+                self.__served_immediately.value+=1
+                result=[resource]
+                if self.__leak_threshold >= 0: self.__trace(result)
+                return result
+        
+        # some validation:
+        if callback and not callable(callback):
+            raise ResourcePoolError("Callback must be callable, but it is no: %s" % repr(callback))
+        
+        deadline=time.monotonic() + wait if wait > 0 else None
+        result=self._get(sync=True, count=count, wait=wait, callback=callback, hold_time=hold_time, expire=expire, ticket=ticket, priority=priority)
+        if self.__test_on_borrow and result:
+            result=self.__borrowed(result, wait if ticket is None else 0, deadline)
+        if self.__leak_threshold >= 0 and result: self.__trace(result)
+        return result
+
+    def get_many(self, counts, wait=0, callback=None, hold_time=None, expire=None, priority=0):
+        ''' retrieve resources of many requests in one pass under pool's lock
+        
+        Requests are served in order, as far as resources go, ahead of no
+        awaiting request (see waiter_scheduler policy).  With callback and 
+        wait other than 0, requests not served right away await resources 
+        as with get, and are called back with their ticket; otherwise, they
+        are not served.  Nothing blocks.
+        
+        Args:
+            counts: iterator on number of resources of each request.
+            wait: seconds requests not served right away await resources;
+                negative awaits until available.  Applies with callback.
+            callback, hold_time, expire, priority: see get.
+            
+        Returns:
+            list, in order of counts, of: list of resources, if request was
+            served right away; reservation ticket, if request awaits; empty
+            list, if request was not served.
+            
+        Raises:
+            ResourcePoolError
+        '''
+        counts=list(counts)
+        if callback and not callable(callback):
+            raise ResourcePoolError("Callback must be callable, but it is no: %s" % repr(callback))
+        storage=self.__storage
+        resource_limit=self.__policy['resource_limit']
+        for count in counts:
+            error=storage.check_count(count, resource_limit)
+            if error: raise ResourcePoolError(error)
+        awaits=callback is not None and wait != 0
+        # resources on hand are handed directly, and booked together.
+        direct=not self.__policy['activate_on_get']
+        inuse_resources=self.__inuse_resources
+        awaiting, waiters=self.__awaiting, self.__waiters
+        
+        results=list()
+        handed=list()
+        served=rejected=0
+        self.__sync_acquire()
+        for count in counts:
+            free=storage.free()
+            if direct and free >= count and (not waiters or awaiting.admit(count, free, priority)):
+                resources=storage.take(count)
+                for resource in resources: inuse_resources[resource.id_]=resource
+                handed.extend(resources)
+            elif self.__can_serve(count, priority):
+                resources=self._get(count=count, wait=0)
+            else:
+                resources=[]
+            if resources:
+                served+=1
+                if expire is not None: self.__start_lease(resources, expire)
+            elif awaits:
+                resources=self.__await(count, wait, callback, hold_time=hold_time, expire=expire, priority=priority)
+            else:
+                rejected+=1
+            results.append(resources)
+        if handed:
+            now=time.monotonic()
+            for resource in handed: resource.acquired_at=now
+            if self.__min_idle > len(self.__available_resources): self.__replenish()
+        self.__requests.value+=len(counts)
+        self.__served_immediately.value+=served
+        self.__rejected.value+=rejected
+        self.__sync_release()
+        
+        if self.__test_on_borrow:
+            results=[self.__borrowed(resources, 0) if isinstance(resources, list) and resources else resources for resources in results]
+        if self.__leak_threshold >= 0:
+            for resources in results:
+                if isinstance(resources, list) and resources: self.__trace(resources)
+        return results
+
+    async def aget(self, count=1, wait=-1, expire=None, priority=0):
+        ''' retrieve resource from pool without blocking event loop
+        
+        Same as get, except that awaiting coroutine is parked as a future
+        instead of blocking its thread.  If awaiting coroutine is cancelled,
+        its request is dropped, and resources reserved for it go back to pool.
+            
+        Args:
+            count: number of resource to grab 
+            wait: number of seconds to wait if none available. 
+                0: don't wait
+                negative: wait until available
+                positive: wait period
+            expire: seconds to limit use of resources.
+            priority: priority of request; see get.
+            
+        Returns:
+            list of resources; empty if not available within wait.
+        '''
+        loop=asyncio.get_running_loop()
+        future=loop.create_future()
+        def reserved(ticket):
+            if not future.done(): future.set_result(ticket)
+        
+        result=self._get(sync=True, count=count, wait=wait, callback=reserved, expire=expire, loop=loop, priority=priority)
+        if not isinstance(result, Ticket): 
+            if self.__test_on_borrow and result: result=self.__borrowed(result, 0)
+            if self.__leak_threshold >= 0 and result: self.__trace(result)
+            return result
+        
+        ticket=result
+        try:
+            await asyncio.wait_for(future, None if wait < 0 else wait)
+        except asyncio.TimeoutError:
+            self.__abandon(ticket)
+            return []
+        except asyncio.CancelledError:
+            self.__abandon(ticket)
+            raise
+        result=self._get(sync=True, ticket=ticket)
+        if self.__test_on_borrow and result: result=self.__borrowed(result, 0)
+        if self.__leak_threshold >= 0 and result: self.__trace(result)
+        return result
+    
+    async def aput(self, *resources):
+        ''' adds resources back to this pool; see put.
+        
+        put never waits on resources, so this is only a convenience for 
+        symmetry with aget.
+        '''
+        self.put(*resources)
+        
+    def lease(self, count=1, wait=-1, expire=None, priority=0):
+        ''' creates lease of resources from this pool, to use as context 
+        manager:
         
-        # some validation:
-        if callback and not callable(callback):
-            raise ResourcePoolError("Callback must be callable, but it is no: %s" % repr(callback))
+            with pool.lease(2) as resources:
+                ...
+                
+            async with pool.lease(2) as resources:
+                ...
         
-        result=self._get(sync=True, count=count, wait=wait, callback=callback, hold_time=hold_time, ticket=ticket)
-        return result
+        Resources are returned to pool when block is exited.  Resources 
+        entered are empty if none were available within wait.
+        
+        Args:
+            see get.
+        '''
+        return Lease(self, count=count, wait=wait, expire=expire, priority=priority)
 
     
     def __activate_allocated_resource(self, resources):
@@ -386,57 +1588,369 @@ class ResourcePool(NamedSingleton):
         Args:
             resource: Resource object to be added to pool
         '''
+        if self.__fast_path and len(resources) == 1 and not self.__leases:
+            resource=resources[0]
+            claim=object()
+            if self.__claims.setdefault(resource.id_, claim) is claim:
+                if self.__inuse_resources.get(resource.id_) is resource:
+                    resource.idle_since=time.monotonic()
+                    self.__parked.append(resource)
+                    self.__returned.value+=1
+                    if self.__waiters or self.__watchers:
+                        # serve them in order; see __unpark_awaited.
+                        self.__sync_acquire()
+                        self.__serve_awaiting()
+                        self.__sync_release()
+                    return
+                del self.__claims[resource.id_]
+            # put or discard of resource is in progress, or it is not in use;
+            # locked path tells.
         
         # validate that all resources provided are legal
         self.__sync_acquire()
+        resources=self.__skip_reclaimed(resources, 'put')
+        if not resources:
+            self.__sync_release()
+            return
         pool_resource_name=self.__resource_cls.__name__
         
+        inuse_resources=self.__inuse_resources
+        by_identity=self.__storage.by_identity
         for resource in resources: 
             resource_name=resource.__class__.__name__
             if pool_resource_name != resource_name:
+                self.__sync_release()
                 raise ResourcePoolError("ResourcePool resource class (%s) doesn't match returned resource (%s)" % \
                                         (pool_resource_name, resource_name))
-            if resource.id_ in self.__available_resources.keys():
-                raise ResourcePoolError("Resource (%s) already in pool's available (%s)" % \
-                                        (resource_name, pool_resource_name, ))                
-            if resource.id_ not in self.__inuse_resources.keys():
+            if by_identity and resource.id_ not in inuse_resources:
+                # this is also the case for resource returned twice, as it is already available.
+                self.__sync_release()
                 raise ResourcePoolError("Resource (%s) not in pool's inuse (%s)" % \
                                         (resource_name, pool_resource_name, ))
+        if by_identity and self.__repeated(resources):
+            self.__sync_release()
+            raise ResourcePoolError("Resources returned more than once: %s" % (self.__repeated(resources),))
+        held=self.__storage.held(resources, inuse_resources, self.__reserved)
+        if held is None:
+            self.__sync_release()
+            raise ResourcePoolError("Returning %s resources to %s, more than held from it" % (len(resources), self.name))
+        resources=held
                 
         # deposit resource back to available
-        resources=list(resources)
         deactivate_on_put=self.__policy['deactivate_on_put']
-                
-        for resource in resources: 
-            if deactivate_on_put: 
+        if deactivate_on_put: 
+            for resource in resources: 
                 try:
                     resource.deactivate()
                 except Exception as e:
                     self.__sync_release()
                     raise e
-            self.__available_resources[resource.id_]=resource
-            del self.__inuse_resources[resource.id_]
-            logger.debug("%s adding to available, removing from inuse %s (available: %s, inuse: %s)" % (self.name, resource, len(self.__available_resources), len(self.__inuse_resources)))
-        
-        
-        for ticket, (condition, count, caller) in list(self.__awaiting.items()):
-            logger.debug("%s, %s found %s awaiting; require: %s, available: %s:" % (caller, self.name, ticket, count, len(self.__available_resources)))
-            if count <= len(self.__available_resources):
-                self.__reserved[ticket]=self._get(count=count)
-                with condition:
-                    logger.debug("%s, %s notifying: %s:" % (caller, self.name, ticket,))
-                    condition.notify()
-                del self.__awaiting[ticket]
-            else:
-                # this is an interesting scenario.
-                # e.g., first awaiting for 3 resources. But there is only one available.
-                #       second awaits for 1 resources.  If we serve it, first will have 
-                #       to wait longer.  If we don't, first is holding the line.
-                #       Predictive module will learn if it is better to hold the line,
-                #       
-                break
+        
+        # claimed last, so that no claim is left behind if put fails.
+        if by_identity and not self.__claim(resources):
+            self.__sync_release()
+            raise ResourcePoolError("Resources returned more than once: %s are being returned" % (resources,))
+        self.__deposit(resources)
+        if by_identity: self.__unclaim(resources)
         self.__sync_release()      
+        
+    def __claim(self, resources):
+        ''' claims resources for put or discard, so fast path put does not 
+        park them meanwhile; called with lock held.
+        
+        Returns:
+            True if all resources are claimed; False, with none claimed, if
+            any is claimed already.
+        '''
+        claims=self.__claims
+        for i, resource in enumerate(resources):
+            claim=object()
+            if claims.setdefault(resource.id_, claim) is not claim:
+                self.__unclaim(resources[:i])
+                return False
+        return True
+    
+    def __unclaim(self, resources):
+        claims=self.__claims
+        for resource in resources: del claims[resource.id_]
+        
+    def __repeated(self, resources):
+        ''' Returns resources that appear more than once in resources.
+        '''
+        seen, repeated=set(), list()
+        for resource in resources:
+            if resource.id_ in seen: repeated.append(resource)
+            seen.add(resource.id_)
+        return repeated
+    
+    def discard(self, *resources):
+        ''' removes resources in use from this pool, instead of returning 
+        them, e.g., when found broken; they are deactivated by loader 
+        threads, and pool may load others in their place.
+        
+        Args:
+            resources: Resource objects gotten from this pool.
+        '''
+        self.__sync_acquire()
+        resources=self.__skip_reclaimed(resources, 'discard')
+        inuse_resources=self.__inuse_resources
+        for resource in resources: 
+            if resource.id_ not in inuse_resources:
+                self.__sync_release()
+                raise ResourcePoolError("Resource (%s) not in pool's inuse (%s)" % \
+                                        (resource, self.__resource_cls.__name__, ))
+        if self.__repeated(resources):
+            self.__sync_release()
+            raise ResourcePoolError("Resources discarded more than once: %s" % (self.__repeated(resources),))
+        if not self.__claim(resources):
+            self.__sync_release()
+            raise ResourcePoolError("Resources discarded while being returned: %s" % (resources,))
+        if not self.__storage.loads:
+            # units are not broken with allocation.
+            self.__deposit(resources)
+        else:
+            if self.__leases: self.__end_leases(resources)
+            for resource in resources: del inuse_resources[resource.id_]
+            self.__evict(list(resources), self.__evicted_broken)
+        self.__unclaim(resources)
+        self.__sync_release()
+        
+    def __deposit(self, resources):
+        ''' moves resources from inuse to available, and serves awaiting 
+        requests; called with lock held.
+        '''
+        inuse_resources=self.__inuse_resources
+        if self.__leases: self.__end_leases(resources)
+        now=time.monotonic()
+        hold=self.__hold
+        for resource in resources: 
+            del inuse_resources[resource.id_]
+            hold.record(now - resource.acquired_at)
+            resource.idle_since=now
+        self.__returned.value+=len(resources)
+        storage=self.__storage
+        if not storage.loads:
+            storage.restore(resources, inuse_resources)
+            self.__serve_awaiting()
+            return
+        old=None
+        max_lifetime=self.__max_lifetime
+        if max_lifetime >= 0:
+            old=[resource for resource in resources if now - resource.created_at > max_lifetime]
+            if old: resources=[resource for resource in resources if now - resource.created_at <= max_lifetime]
+        storage.restore(resources, inuse_resources)
+        if old: self.__evict(old, self.__evicted_lifetime, deactivate=not self.__policy['deactivate_on_put'])
+        logger.debug("%s adding to available, removing from inuse %s (available: %s, inuse: %s)", self.name, resources, len(self.__available_resources), len(inuse_resources))
+        self.__serve_awaiting()
+        self.__trim()
+            
+    def __serve_awaiting(self):
+        ''' serves awaiting requests with available resources; called with 
+        lock held.
+        '''
+        now=time.monotonic()
+        
+        # this is an interesting scenario.
+        # e.g., first awaiting for 3 resources. But there is only one available.
+        #       second awaits for 1 resources.  If we serve it, first will have 
+        #       to wait longer.  If we don't, first is holding the line.
+        #       waiter_scheduler policy decides which to serve.
+        #       Predictive module will learn if it is better to hold the line,
+        #       
+        if len(self.__awaiting) > 0:
+            abandoned=list()
+            for waiter in self.__awaiting.select(self.__free()):
+                logger.debug("%s, %s serving %s awaiting; require: %s, available: %s:", waiter.caller, self.name, waiter.ticket, waiter.count, self.__free())
+                if self.__direct_handoff and waiter.condition is not None:
+                    # waiter's thread takes resources straight from waiter.
+                    resources=self._get(count=waiter.count)
+                    self.__start_lease(resources, waiter.expire)
+                    waiter.resources=resources
+                else:
+                    self.__reserve(waiter)
+                self.__handoffs.value+=1
+                self.__acquire_wait.record(now - waiter.since)
+                logger.debug("%s, %s notifying: %s:", waiter.caller, self.name, waiter.ticket)
+                if waiter.loop is not None:
+                    try:
+                        # safe also from within waiter's loop.
+                        waiter.loop.call_soon_threadsafe(waiter.callback, waiter.ticket)
+                    except RuntimeError:
+                        # loop is closed; nobody would collect.
+                        logger.warning("%s loop of ticket %s is closed; returning reserved resources." % (self.name, waiter.ticket))
+                        abandoned.append(waiter.ticket)
+                elif waiter.callback:
+                    if waiter.timer is not None: self.__timer_wheel.cancel(waiter.timer)
+                    self.__dispatcher.dispatch(waiter.callback, waiter.ticket)
+                else:
+                    with waiter.condition:
+                        waiter.condition.notify()
+            for ticket in abandoned:
+                reservation=self.__reserved.pop(ticket)
+                if reservation.timer is not None: 
+                    self.__timer_wheel.cancel(reservation.timer)
+                self.__deposit(reservation.resources)
+        
+        if self.__watchers and self.__free() > 0:
+            for watcher in self.__watchers:
+                watcher.wake()
+
+class AtomicRequest(object):
+    ''' Request for resources from multiple pools, served all at once or not
+    at all.
+    
+    While waiting, request holds no resources.  It watches its pools, and 
+    tries again with ResourcePool.get_atomic, from CallbackDispatcher, each
+    time resources are returned to any of them.  
+    
+    Single pool awaiting requests are served first, as they are when 
+    resources are returned.  
+    '''
+    
+    def __init__(self, request, wait=-1, expire=None, callback=None, priority=0):
+        ''' starts request; it is served right away if resources are available.
+        
+        Args:
+            request: iterator on tuples of resource pool and count.
+            wait: seconds to wait for resources; negative waits until available.
+            expire: seconds to limit use of resources.
+            callback: callable to call with served resources, or with None if
+                wait passed; called from CallbackDispatcher or TimerWheel 
+                thread, or from this thread if served right away.
+            priority: priority of request; see ResourcePool.get.
+        '''
+        self.request=list(request)
+        self.expire=expire
+        self.priority=priority
+        self.callback=callback
+        self.resources=None
+        self.__done=threading.Event()
+        self.__lock=threading.Lock()
+        self.__retry_pending=False
+        self.__timer=None
+        self.__dispatcher=get_callback_dispatcher()
+        
+        resources=ResourcePool.get_atomic(self.request, expire=expire, priority=priority)
+        if resources is not None or wait == 0:
+            self.__finish(resources)
+            return
+        
+        for pool, _ in self.request: pool._watch(self)
+        if wait > 0:
+            self.__timer=get_timer_wheel().schedule(wait, self.__finish, None)
+        # resources may have been returned before watching started.
+        self.__retry_pending=True
+        self.__retry()
+        
+    def wake(self):
+        ''' called by watched pool, with its lock held, when resources are 
+        returned.
+        '''
+        with self.__lock:
+            if self.__retry_pending or self.__done.is_set(): return
+            self.__retry_pending=True
+        self.__dispatcher.dispatch(self.__retry)
+        
+    def __retry(self):
+        with self.__lock:
+            self.__retry_pending=False
+            if self.__done.is_set(): return
+        resources=ResourcePool.get_atomic(self.request, expire=self.expire, priority=self.priority)
+        if resources is not None:
+            self.__finish(resources)
+            
+    def __finish(self, resources):
+        with self.__lock:
+            finished=self.__done.is_set()
+            if not finished:
+                self.resources=resources
+                self.__done.set()
+        if finished:
+            # lost race with timeout
+            if resources:
+                for (pool, _), pool_resources in zip(self.request, resources): pool.put(*pool_resources)
+            return
+        for pool, _ in self.request: pool._unwatch(self)
+        if self.__timer is not None: get_timer_wheel().cancel(self.__timer)
+        if self.callback: self.callback(resources)
+        
+    def done(self):
+        return self.__done.is_set()
+        
+    def result(self, timeout=None):
+        ''' waits for request to be served or to time out.
+        
+        Returns:
+            list of lists of resources, in order of request; None if not served.
+        '''
+        self.__done.wait(timeout)
+        return self.resources
+
+class Lease(object):
+    ''' Resources leased from ResourcePool for the span of with or async with
+    block.
+    
+    Entering the block gets resources, with get or aget; exiting returns 
+    them.  Resources entered are empty if none were available within wait.
+    '''
+    
+    def __init__(self, pool, count=1, wait=-1, expire=None, priority=0):
+        self.pool=pool
+        self.count=count
+        self.wait=wait
+        self.expire=expire
+        self.priority=priority
+        self.resources=None
+        
+    def __enter__(self):
+        self.resources=self.pool.get(count=self.count, wait=self.wait, expire=self.expire, priority=self.priority)
+        return self.resources
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        resources, self.resources=self.resources, None
+        if resources: self.pool.put(*resources)
+        return False
+        
+    async def __aenter__(self):
+        self.resources=await self.pool.aget(count=self.count, wait=self.wait, expire=self.expire, priority=self.priority)
+        return self.resources
+    
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        resources, self.resources=self.resources, None
+        if resources: self.pool.put(*resources)
+        return False
 
+class RequestorsLease(object):
+    ''' Resources of Requestors request for the span of with block.
+    
+    Entering the block reserves request and waits for its resources; 
+    exiting returns those not returned yet, and closes request.  Resources
+    entered are empty if request was not served within wait.
+    '''
+    
+    def __init__(self, requestors, request, wait=-1, expire=None, priority=0):
+        self.requestors=requestors
+        self.request=request
+        self.wait=wait
+        self.expire=expire
+        self.priority=priority
+        self.request_id=None
+        
+    def __enter__(self):
+        requestors=self.requestors
+        self.request_id=requestors.reserve(self.request, wait=self.wait, expire=self.expire, priority=self.priority)
+        resources=requestors.get(self.request_id)
+        return resources if resources is not None else []
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        requestors, request_id=self.requestors, self.request_id
+        self.request_id=None
+        state=requestors.state(request_id)
+        if state == requestors.FETCHED:
+            requestors.put_requested(request_id)
+        elif state != requestors.CLOSED:
+            requestors.close(request_id)
+        return False
 
 class RequestorCallback(object):
     def __init__(self, notify_queue):
@@ -447,9 +1961,23 @@ class RequestorCallback(object):
 
 class Requestor(object):
     ''' Manages a single request from multiple resource pools
+    
+    Request from multiple pools is served all at once, or not at all (see 
+    AtomicRequest); partial allocations are never held while waiting.
+    
+    Requestor objects are short lived; their metrics are kept together, in 
+    class attribute metrics (see acris.idioms.pool_metrics):
+        counters: requests, reserved, timeouts.
+        histograms: reserve_wait_seconds.
     '''
+    
+    metrics=Metrics('requestor')
+    __requested=metrics.counter('requests', 'Requestor objects created.')
+    __served=metrics.counter('reserved', 'Requests that got all their resources.')
+    __timeouts=metrics.counter('timeouts', 'Requests whose wait passed before they got all their resources.')
+    __reserve_wait=metrics.histogram('reserve_wait_seconds', 'Time from request to all resources collected.')
         
-    def __init__(self, request, wait=-1, callback=None, hold_time=None, expire=None, audit=True):
+    def __init__(self, request, wait=-1, callback=None, hold_time=None, expire=None, audit=True, priority=0):
         '''Initialize requestor object to manage request from multiple pools
         
         Args:
@@ -459,12 +1987,17 @@ class Requestor(object):
             hold_time: how long to hold resources in reserved
             expire: seconds to limit use of resources.
             audit: if True, ensures resources returened are from the same requestor 
+            priority: priority of request in each pool; see ResourcePool.get.
             
         '''
+        self.__since=time.monotonic()
+        self.__requested.value+=1
         self.__request=dict([(r.name, (r,count)) for r, count in request])
         self.__wait=wait
         self.__callback=callback
         self.__hold_time=hold_time
+        self.__expire=expire
+        self.__priority=priority
         self.__notify_queue=queue.Queue()
         self.__tickets=list()
         self.__resources=dict()
@@ -478,15 +2011,11 @@ class Requestor(object):
         self.__get()
     
     def __sync_acquire(self):
-        (frame, filename, line_number,
-         function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        logger.debug("ResourcePoolRequestor Acquiring Lock; %s.%s(%s)" % (filename, function_name, line_number))
+        if lock_logger.isEnabledFor(logging.DEBUG): _trace_lock("ResourcePoolRequestor", "Acquiring")
         self.__resource_pool_requestor_lock.acquire()
         
     def __sync_release(self):
-        (frame, filename, line_number,
-         function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        logger.debug("ResourcePoolRequestor Releasing Lock; %s.%s(%s)" % (filename, function_name, line_number))
+        if lock_logger.isEnabledFor(logging.DEBUG): _trace_lock("ResourcePoolRequestor", "Releasing")
         self.__resource_pool_requestor_lock.release()
 
     def __is_reserved(self):
@@ -504,10 +2033,13 @@ class Requestor(object):
         return self.__reserved
         
     def __get(self):
+        if len(self.__request) > 1:
+            self.__get_atomic()
+            return
         callback=RequestorCallback(self.__notify_queue) if self.__callback else None
         for rp, count in self.__request.values():
             logger.debug("%s requesting resources %s(%s)" %(self.__client_name, rp.name, count))
-            response=rp.get(count=count, wait=self.__wait, callback=callback, hold_time=self.__hold_time)
+            response=rp.get(count=count, wait=self.__wait, callback=callback, hold_time=self.__hold_time, expire=self.__expire, priority=self.__priority)
             
             if response:
                 logger.debug("%s received resources %s" %(self.__client_name, response))
@@ -526,6 +2058,20 @@ class Requestor(object):
         else:
             self.__notify_collected()
     
+    def __get_atomic(self):
+        callback=self.__atomic_collected if self.__callback else None
+        atomic=AtomicRequest(self.__request.values(), wait=self.__wait, expire=self.__expire, callback=callback, priority=self.__priority)
+        if not callback:
+            self.__atomic_collected(atomic.result())
+            
+    def __atomic_collected(self, resources):
+        if resources is None: 
+            self.__timeouts.value+=1
+            return
+        for (rp, _), rp_resources in zip(self.__request.values(), resources):
+            self.__resources[rp.name]=dict([(r.id_, r) for r in rp_resources])
+        self.__notify_collected()
+    
     @Threaded()
     def __collect_resources(self):
         start_time=time.time()
@@ -536,14 +2082,15 @@ class Requestor(object):
             try:
                 ticket=self.__notify_queue.get(timeout=wait)
             except queue.Empty:
-                ticket=(None, None)
-            rp_name=ticket.pool_name
+                ticket=None
             
             if ticket:
+                rp_name=ticket.pool_name
                 rp, _=self.__request[rp_name]
                 resources=rp.get(ticket=ticket)
                 logger.debug("Collected resources %s" %(resources))
-                self.__resources[rp_name]=dict([(r.id_, r) for r in resources])
+                if resources:
+                    self.__resources[rp_name]=dict([(r.id_, r) for r in resources])
                 
             time_passed=time.time() - start_time
             if self.__wait and self.__wait >0:
@@ -553,6 +2100,7 @@ class Requestor(object):
             go=go and not self.__is_reserved()
         
         if not self.__is_reserved():
+            self.__timeouts.value+=1
             for rp_name, resources in list(self.__resources.items()):
                 rp, _=self.__request[rp_name]
                 returning=list(resources.values())
@@ -562,9 +2110,28 @@ class Requestor(object):
             self.__notify_collected()
                  
     def __notify_collected(self):
+        self.__served.value+=1
+        self.__reserve_wait.record(time.monotonic() - self.__since)
         if self.__is_reserved() and self.__callback:
             self.__callback(True)
                   
+    def put_requested(self, request=None):
+        ''' returns resources still held.
+        
+        Args:
+            request: iterator on tuples of resource pool and number of 
+                resources to return to it; all resources held if None.
+        '''
+        returning=dict()
+        self.__sync_acquire()
+        for rp, count in (request if request is not None else list(self.__request.values())):
+            resources=self.__resources.get(rp.name, {})
+            for resource_id in list(resources)[:count]:
+                returning.setdefault(rp.name, (rp, list()))[1].append(resources.pop(resource_id))
+        self.__sync_release()
+        for rp, resources in returning.values():
+            rp.put(*resources)
+        
     def get(self,):
         result=None
         if self.__is_reserved():
@@ -620,32 +2187,73 @@ class Requestor(object):
 
 
 class RequestorsCallback(object):
-    def __init__(self, notify_queue, request_id):
-        self.q=notify_queue
+    def __init__(self, collect, request_id, pool):
+        self.collect=collect
         self.request_id=request_id
+        self.pool=pool
     def __call__(self, ticket=None):
-        logger.debug('RequestorsCallback notifying request id %s ticket: %s' % (self.request_id, ticket, ))
-        self.q.put( (ticket, self.request_id,) )
+        logger.debug('RequestorsCallback notifying request id %s ticket: %s', self.request_id, ticket)
+        self.collect(ticket, self.request_id, self.pool)
          
 #Pool=namedtuple('Pool', ['pool', 'reserved', 'inuse'])
 
 class Requestors(object):
     ''' Manages multiple requests from multiple resource pools
+    
+    Request from multiple pools is served all at once, or not at all (see 
+    AtomicRequest); partial allocations are never held while waiting.
+    
+    Requests awaiting resources are indexed apart from the rest, with their
+    deadlines in a heap served by a single TimerWheel timer.  Resources are 
+    collected as pools call back, so each event costs O(log pending 
+    requests), regardless of how many requests were made.
+    
+    Request lifecycle:
+        pending: awaiting resources.
+        reserved: all resources collected; callback is called.
+        fetched: resources handed by get.
+        returned: all resources put back.
+        closed: request is forgotten.
+    A request is closed once returned, once its wait passed, or by close().
+    Closed requests are evicted, so Requestors holds only requests in 
+    flight, however long it lives.  lease() reserves, fetches, returns and 
+    closes request around a with block.  reserve_many() and put_many() 
+    reserve and return many requests in one pass.
+    
+    Requestors metrics (see acris.idioms.pool_metrics), through metrics 
+    property:
+        counters: requests, reserved, expired, closed, returned, 
+            lock_contended.
+        gauges: pending, tracked.
+        histograms: reserve_wait_seconds, hold_seconds.
     '''
     
+    PENDING='pending'
+    RESERVED='reserved'
+    FETCHED='fetched'
+    RETURNED='returned'
+    CLOSED='closed'
+    
     __request_id=Sequence("Requestors_request_id")
     
     class Request(object):
-        def __init__(self, request_id, request, wait=-1, callback=None, hold_time=None, expire=None):
+        __slots__=('request_id', 'request', 'wait', 'callback', 'hold_time', 'expire', 'priority', 'state', 'missing', 
+                   'resources', 'since', 'reserved_at', 'deadline', 'client_name', )
+        
+        def __init__(self, request_id, request, wait=-1, callback=None, hold_time=None, expire=None, priority=0):
             self.request_id=request_id
-            self.request=dict([(r.name, (r,count)) for r, count in request])
+            self.request=tuple(request) # tuples of pool and count
             self.wait=wait
             self.callback=callback
             self.hold_time=hold_time
-            self.reserved=False
-            self.fetched=False
-            self.resources=dict()
-            self.start_time=time.time()
+            self.expire=expire
+            self.priority=priority
+            self.state=Requestors.PENDING
+            self.missing=len(self.request) # number of pools not collected yet
+            self.resources=None # resource id to resource, once collected
+            self.since=time.monotonic()
+            self.reserved_at=None
+            self.deadline=self.since + wait if wait is not None and wait > 0 else None
             if callback and hasattr(callback, 'name'):
                 self.client_name=callback.name
             else: self.client_name=''
@@ -653,15 +2261,46 @@ class Requestors(object):
         def __repr__(self):
             return "%s" %(self.request_id, )
         
-    def __init__(self, audit=False):
+    def __init__(self, audit=False, name=''):
+        ''' creates Requestors
+        
+        Args:
+            audit: not used; kept for compatibility.
+            name: identifies Requestors in metrics exports.
+        '''
         self.__audit=audit
-        self.__pools=dict() # mapping for pool names to namedtuple of pool, requestor, and resources
-        self.__requests=dict()
-        self.__notify_queue=queue.Queue()
+        self.name=name
+        self.__pools=dict() # mapping for pool names to pool
+        self.__requests=dict() # request id to request not closed
+        self.__pending=dict() # request id to request awaiting resources
+        self.__deadlines=list() # heap of (deadline, request id) of pending requests
+        self.__tickets=dict() # pool ticket to request id and pool, of requests awaiting by reserve_many
+        self.__deadline_timer=None
+        self.__deadline_timer_at=None
+        self.__timer_wheel=get_timer_wheel()
         self.__resource_pool_requestor_lock=threading.Lock()
-        self.__collect_resources_started=False
+        self.__init_metrics()
+        
+    def __init_metrics(self):
+        metrics=self.__metrics=Metrics('requestors', {'requestors': self.name})
+        self.__requested=metrics.counter('requests', 'Requests reserved.')
+        self.__reserved=metrics.counter('reserved', 'Requests that got all their resources.')
+        self.__expired=metrics.counter('expired', 'Requests whose wait passed before they got all their resources.')
+        self.__closed=metrics.counter('closed', 'Requests given up by close().')
+        self.__returned=metrics.counter('returned', 'Requests whose resources were all returned.')
+        self.__lock_contended=metrics.counter('lock_contended', 'Requestors lock acquisitions that had to wait.')
+        metrics.gauge('pending', lambda: len(self.__pending), 'Requests awaiting resources.')
+        metrics.gauge('tracked', lambda: len(self.__requests), 'Requests not closed.')
+        self.__reserve_wait=metrics.histogram('reserve_wait_seconds', 'Time from reserve to all resources collected.')
+        self.__hold=metrics.histogram('hold_seconds', 'Time from all resources collected to their return.')
+        
+    @property
+    def metrics(self):
+        ''' Requestors' Metrics; see snapshot() and prometheus() of Metrics.
+        '''
+        return self.__metrics
         
-    def reserve(self, request, wait=-1, callback=None, hold_time=None, expire=None,):
+    def reserve(self, request, wait=-1, callback=None, hold_time=None, expire=None, priority=0):
         '''Initialize requestor object to manage request from multiple pools
         
         Args:
@@ -670,254 +2309,422 @@ class Requestors(object):
             callback: callable to callback when resources are reserved
             hold_time: how long to hold resources in reserved
             expire: seconds to limit use of resources.
-            audit: if True, ensures resources returned are from the same requestor 
+            priority: priority of request in each pool; see ResourcePool.get.
             
+        Returns:
+            request id
         '''
         request_id=self.__request_id()
-        self.__requests[request_id]=self.Request(request_id=request_id, request=request, wait=wait, callback=callback, hold_time=hold_time, expire=expire)        
-        self.__get(request_id)
+        request=self.Request(request_id=request_id, request=request, wait=wait, callback=callback, hold_time=hold_time, expire=expire, priority=priority)
+        self.__sync_acquire()
+        self.__requested.value+=1
+        self.__requests[request_id]=request
+        # pending before asking pools, as they may call back right away.
+        self.__pending[request_id]=request
+        if request.deadline is not None:
+            heapq.heappush(self.__deadlines, (request.deadline, request_id))
+            self.__schedule_deadline()
+        self.__sync_release()
+        self.__get(request)
         return request_id
     
+    def reserve_many(self, requests, wait=-1, callback=None, hold_time=None, expire=None, priority=0):
+        ''' reserves many requests in one pass: requests of each pool are 
+        asked for with one ResourcePool.get_many, and requests from 
+        multiple pools with one ResourcePool.get_atomic_many.
+        
+        Requests from single pool are served first, in order, then requests
+        from multiple pools, in order.  Unlike reserve, reserve_many does 
+        not wait.  Requests not reserved right away await resources if wait
+        is not 0, and are closed otherwise.  Once request is reserved, callback is called with its
+        id, and it can be fetched with get.
+        
+        Args:
+            requests: iterator on requests, each an iterator on tuples of 
+                resource pool and quantity of resources required.
+            wait, callback, hold_time, expire, priority: see reserve; they
+                apply to all requests.
+            
+        Returns:
+            tuple of list of request ids, in order of requests, and bitmap: 
+            int whose bit i is set if request i was reserved right away.
+        '''
+        requests=[self.Request(request_id=self.__request_id(), request=request, wait=wait, callback=callback, 
+                               hold_time=hold_time, expire=expire, priority=priority) for request in requests]
+        by_pool=dict() # pool name to pool and its single pool requests
+        multi_pool=list()
+        for request in requests:
+            if len(request.request) == 1:
+                rp=request.request[0][0]
+                by_pool.setdefault(rp.name, (rp, list()))[1].append(request)
+            else:
+                multi_pool.append(request)
+        awaiting=list()
+        
+        # pools call back with lock held only by dispatcher, so tickets are
+        # recorded before their callbacks are served.
+        self.__sync_acquire()
+        self.__requested.value+=len(requests)
+        for request in requests:
+            self.__requests[request.request_id]=request
+            self.__pending[request.request_id]=request
+            if request.deadline is not None:
+                heapq.heappush(self.__deadlines, (request.deadline, request.request_id))
+        if wait > 0: self.__schedule_deadline()
+        
+        for rp, pool_requests in by_pool.values():
+            results=rp.get_many([request.request[0][1] for request in pool_requests], wait=wait, 
+                                callback=self.__collect_ticket, hold_time=hold_time, expire=expire, priority=priority)
+            for request, resources in zip(pool_requests, results):
+                if isinstance(resources, Ticket):
+                    self.__tickets[resources]=(request.request_id, rp)
+                else:
+                    self.__collected(request.request_id, rp, resources)
+        if multi_pool:
+            results=ResourcePool.get_atomic_many([request.request for request in multi_pool], expire=expire, priority=priority)
+            for request, resources in zip(multi_pool, results):
+                if resources is not None:
+                    for (rp, _), rp_resources in zip(request.request, resources):
+                        self.__collected(request.request_id, rp, rp_resources)
+                elif wait == 0:
+                    self.__expire(request)
+                else:
+                    awaiting.append(request)
+        reserved=0
+        for i, request in enumerate(requests):
+            if request.state == self.RESERVED: reserved|=1 << i
+        self.__sync_release()
+        
+        for request in awaiting:
+            AtomicRequest(request.request, wait=wait, expire=expire, priority=priority,
+                          callback=functools.partial(self.__atomic_collected, request.request_id))
+        return [request.request_id for request in requests], reserved
+    
+    def lease(self, request, wait=-1, expire=None, priority=0):
+        ''' creates lease of request's resources, to use as context manager:
+        
+            with requestors.lease([(pool1, 1), (pool2, 2)]) as resources:
+                ...
+                
+        Resources are returned, and request closed, when block is exited.
+        Resources entered are empty if request was not served within wait.
+        
+        Args:
+            see reserve.
+        '''
+        return RequestorsLease(self, request, wait=wait, expire=expire, priority=priority)
+        
     def __sync_acquire(self):
-        (frame, filename, line_number,
-         function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        logger.debug("ResourcePoolRequestors Acquiring Lock; %s.%s(%s)" % (filename, function_name, line_number))
-        self.__resource_pool_requestor_lock.acquire()
+        if lock_logger.isEnabledFor(logging.DEBUG): _trace_lock("ResourcePoolRequestors", "Acquiring")
+        if not self.__resource_pool_requestor_lock.acquire(False):
+            self.__resource_pool_requestor_lock.acquire()
+            self.__lock_contended.value+=1
         
     def __sync_release(self):
-        (frame, filename, line_number,
-         function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]
-        logger.debug("ResourcePoolRequestors Releasing Lock; %s.%s(%s)" % (filename, function_name, line_number))
+        if lock_logger.isEnabledFor(logging.DEBUG): _trace_lock("ResourcePoolRequestors", "Releasing")
         self.__resource_pool_requestor_lock.release()
-
-    def __is_reserved(self, request_id):
-        ''' Returns True if all resources are collected
-        '''
-        request=self.__get_request(request_id)
         
-        missings=set(request.request.keys()) - set(request.resources.keys())
-        request.reserved=len(missings) ==0
-        if not request.reserved:
-            logger.debug("%s missing resources %s" %(request.client_name, missings))
-        return request.reserved
+    def state(self, request_id):
+        ''' Returns lifecycle state of request; closed if request is not known.
+        '''
+        request=self.__requests.get(request_id)
+        return request.state if request is not None else self.CLOSED
         
     def is_reserved(self, request_id):
         ''' Returns True if all resources are collected
         '''
-        try:
-            result=self.__requests[request_id].reserved
-        except:
-            raise ResourcePoolError("Unknown request_id: %s" % request_id)
-        return result
+        return self.state(request_id) in (self.RESERVED, self.FETCHED)
         
-    def __get(self, request_id):
-        request=self.__get_request(request_id)
-        callback=RequestorsCallback(self.__notify_queue, request_id=request_id) if request.callback else None
-        for rp, count in request.request.values():
-            logger.debug("%s requesting resources %s(%s)" %(request.client_name, rp.name, count))
-            resources=rp.get(count=count, wait=request.wait, callback=callback, hold_time=request.hold_time)
+    def __get(self, request):
+        if len(request.request) > 1:
+            self.__get_atomic(request)
+            return
+        request_id=request.request_id
+        for rp, count in request.request:
+            callback=RequestorsCallback(self.__collect, request_id=request_id, pool=rp) if request.callback else None
+            logger.debug("%s requesting resources %s(%s)", request.client_name, rp.name, count)
+            resources=rp.get(count=count, wait=request.wait, callback=callback, hold_time=request.hold_time, expire=request.expire, priority=request.priority)
             
-            if resources:
-                logger.debug("%s received resources %s" %(request.client_name, resources))
-                #self.__sync_acquire()
-                self.__update_resource_store(request_id=request_id, resource_pool=rp, resources=resources)
-                #self.__sync_release()
+            if resources is not None:
+                logger.debug("%s received resources %s", request.client_name, resources)
+                self.__sync_acquire()
+                self.__collected(request_id, rp, resources)
+                self.__sync_release()
                 
-        if not self.__is_reserved(request_id):
-            go_collect=False
-            #self.__sync_acquire()
-            logger.debug("%s __collect_resources_started %s" %(request.client_name, self.__collect_resources_started))
-            if not self.__collect_resources_started:
-                go_collect=True
-                self.__collect_resources_started=True
-            #self.__sync_release()
-            if go_collect:
-                logger.debug("%s starting collector" % (request.client_name, ))
-                self.__collect_resources()   
-        else:
-            self.__sync_acquire()
-            self.__notify_collected(request_id)
-            self.__sync_release()
-            
-    def __return_resources(self, request_id):
-        logger.debug("returning resources  for request id: %s" %(request_id,))
-        request=self.__get_request(request_id)
-        for rp_name, resources in list(request.resources.items()):
-            rp=self.__pools[rp_name]
-            returning=list(resources.values())
-            rp.put(*returning)
-            del request.resources[rp_name]               
-    
-    def __update_resource_store(self, request_id, resource_pool, resources):
-        logger.debug("Collected resources %s" %(resources))
-        request=self.__get_request(request_id)
+    def __collect(self, ticket, request_id, rp):
+        ''' collects resources reserved for request; called back by pool.
         
-        request.resources[resource_pool.name]=dict([(r.id_, r.setattrib('requestor_request_id', request_id)) for r in resources])
-        # plasce resources in reserved
-        self.__pools[resource_pool.name]=resource_pool
+        Reservation is collected even if request was closed, or its wait 
+        passed, meanwhile, so its resources go back to pool.
         '''
-        try:
-            pool=self.__pools[resource_pool.name]
-        except KeyError:
-            pool=Pool(resource_pool, dict(), dict())
-            self.__pools[resource_pool.name]=pool
-        pool.reserved.update(request.resources[resource_pool.name])
-        #rp_resources.extend(map(lambda x: x.setattrib('__requestors_request_id', request_id), resources))
+        self.__sync_acquire()
+        self.__collected(request_id, rp, rp.get(ticket=ticket))
+        self.__sync_release()
+        
+    def __collect_ticket(self, ticket):
+        ''' collects resources reserved for request of reserve_many; called 
+        back by pool.
         '''
-        return self.__is_reserved(request_id)
-    
-    def __get_request(self, request_id, default=None):
-        request=self.__requests.get(request_id, None)
-        if request is None and default is None:
-            (frame, filename, line_number,
-             function_name, lines, index) = inspect.getouterframes(inspect.currentframe())[1]            
-            raise RequestNotFound("Unknown request_id: %s: %s(%s)" % (request_id, function_name, line_number,))
-        elif request is None:
-            request=default
-        return request
-    
-    def __evaluate_collect_wait_time(self):
-        waits=list() 
-        found_endless_waiter=False 
-        for request_id, request in self.__requests.items():
-            if self.__is_reserved(request_id): continue
-            time_passed=time.time() - request.start_time
-            if request.wait and request.wait >0:
-                wait=request.wait - time_passed
-                if wait<= 0: 
-                    self.__return_resources(request_id)
-                else: waits.append(wait)
-            else:
-                found_endless_waiter=True
-        self.__collect_resources_started=len(waits)>0 or found_endless_waiter
-        len_waits=len(waits)
-        wait=min(waits) if len_waits>0 else None  
-        logger.debug("Wait evaluated: %s: waits: %s: found endless: %s" %(wait, len(waits), found_endless_waiter,))
-        return wait
-    
-    @Threaded()
-    def __collect_resources(self):
-        wait=self.__evaluate_collect_wait_time()
-        logger.debug("starting get loop (wait: %s, collect: %s)" %(wait,self.__collect_resources_started))
-        #self.__collect_resources_started=True
-        while self.__collect_resources_started:
-            logger.debug("trying to get from notify queue (wait: %s)" %(wait,))
-            try:
-                ticket, request_id=self.__notify_queue.get(timeout=wait)
-            except queue.Empty:
-                ticket, request_id=None, None
+        self.__sync_acquire()
+        request_id, rp=self.__tickets.pop(ticket, (None, None))
+        if rp is not None:
+            self.__collected(request_id, rp, rp.get(ticket=ticket))
+        self.__sync_release()
+        
+    def __collected(self, request_id, rp, resources):
+        ''' records resources received for request; called with lock held.
+        
+        Resources that come for request no longer pending are returned.  
+        No resources for pending request means its wait passed.
+        '''
+        request=self.__pending.get(request_id)
+        if request is None:
+            if resources: rp.put(*resources)
+            return
+        if not resources:
+            self.__expire(request)
+            return
+        
+        self.__pools[rp.name]=rp
+        if request.resources is None: request.resources=dict()
+        for resource in resources:
+            resource.requestor_request_id=request_id
+            request.resources[resource.id_]=resource
+        request.missing-=1
+        if request.missing == 0:
+            del self.__pending[request_id]
+            request.state=self.RESERVED
+            request.reserved_at=time.monotonic()
+            self.__reserved.value+=1
+            self.__reserve_wait.record(request.reserved_at - request.since)
+            if request.callback:
+                logger.debug("%s Calling callback for %s", request.client_name, request_id)
+                request.callback(request_id)
             
-            logger.debug("got something from notify queue request_id: %s, ticket: %s" %(request_id, ticket,))
+    def __expire(self, request):
+        ''' gives up pending request; called with lock held.
+        '''
+        logger.debug("request id %s wait passed", request.request_id)
+        self.__expired.value+=1
+        self.__close(request)
+        
+    def __close(self, request):
+        ''' returns resources request still holds, and forgets request; called
+        with lock held.
+        '''
+        self.__pending.pop(request.request_id, None)
+        del self.__requests[request.request_id]
+        if request.state == self.RETURNED:
+            self.__returned.value+=1
+            if request.reserved_at is not None:
+                self.__hold.record(time.monotonic() - request.reserved_at)
+        request.state=self.CLOSED
+        if request.resources:
+            self.__return_resources(list(request.resources.values()))
+        request.resources=None
+        request.callback=None
+        
+    def __schedule_deadline(self):
+        ''' keeps timer set for earliest pending deadline; called with lock held.
+        '''
+        deadlines=self.__deadlines
+        # drop deadlines of requests no longer pending
+        while deadlines and deadlines[0][1] not in self.__pending:
+            heapq.heappop(deadlines)
+        if not deadlines: return
+        deadline=deadlines[0][0]
+        if self.__deadline_timer_at is not None and self.__deadline_timer_at <= deadline: return
+        if self.__deadline_timer is not None: self.__timer_wheel.cancel(self.__deadline_timer)
+        self.__deadline_timer=self.__timer_wheel.schedule(max(deadline - time.monotonic(), 0), self.__on_deadline)
+        self.__deadline_timer_at=deadline
             
-            self.__sync_acquire()
+    def __on_deadline(self):
+        self.__sync_acquire()
+        self.__deadline_timer=None
+        self.__deadline_timer_at=None
+        now=time.monotonic()
+        deadlines=self.__deadlines
+        while deadlines and deadlines[0][0] <= now:
+            _, request_id=heapq.heappop(deadlines)
+            request=self.__pending.get(request_id)
+            if request is not None:
+                self.__expire(request)
+        self.__schedule_deadline()
+        self.__sync_release()
             
-            if request_id is not None:
-                rp_name=ticket.pool_name
-                request=self.__get_request(request_id)
-                logger.debug("%s received resources for request_id %s" %(request.client_name, request_id,))
-                rp, _=request.request[rp_name]
-                resources=rp.get(ticket=ticket)
-                reserved=self.__update_resource_store(request_id=request_id, resource_pool=rp, resources=resources)
-                if reserved:
-                    self.__notify_collected(request_id)          
+    def __get_atomic(self, request):
+        callback=functools.partial(self.__atomic_collected, request.request_id) if request.callback else None
+        atomic=AtomicRequest(request.request, wait=request.wait, expire=request.expire, callback=callback, priority=request.priority)
+        if not callback:
+            self.__atomic_collected(request.request_id, atomic.result())
             
-            wait=self.__evaluate_collect_wait_time()
+    def __atomic_collected(self, request_id, resources):
+        self.__sync_acquire()
+        request=self.__pending.get(request_id)
+        if resources is None:
+            if request is not None: self.__expire(request)
+        elif request is None:
+            # closed while awaiting
+            self.__return_resources([resource for pool_resources in resources for resource in pool_resources])
+        else:
+            for (rp, _), rp_resources in zip(request.request, resources):
+                self.__collected(request_id, rp, rp_resources)
+        self.__sync_release()
             
-            self.__sync_release()
-                    
-    def __notify_collected(self, request_id):
-        request=self.__get_request(request_id)
-        if self.__is_reserved(request_id) and request.callback:
-            logger.debug("%s Calling callback for %s" %(request.client_name, request_id,))
-            request.callback(request_id)
+    def __return_resources(self, resources):
+        ''' returns resources to their pools, a call per pool; called with 
+        lock held.
+        '''
+        by_pool=dict()
+        for resource in resources:
+            by_pool.setdefault(resource.pool, list()).append(resource)
+        for rp_name, rp_resources in by_pool.items():
+            self.__pools[rp_name].put(*rp_resources)
+    
+    def __get_request(self, request_id):
+        request=self.__requests.get(request_id, None)
+        if request is None:
+            frame=sys._getframe(1)
+            raise RequestNotFound("Unknown request_id: %s: %s(%s)" % (request_id, frame.f_code.co_name, frame.f_lineno,))
+        return request
                   
+    def find(self, request, state=None):
+        ''' finds request by its pools and counts.
+        
+        Args:
+            request: iterator on tuples of resource pool and count, as given
+                to reserve.
+            state: lifecycle state of request to find; fetched if None.
+            
+        Returns:
+            id of earliest request in state for the same pools and counts; 
+            None if there is none.
+        '''
+        request=tuple([tuple(item) for item in request])
+        state=state if state is not None else self.FETCHED
+        result=None
+        self.__sync_acquire()
+        for request_id, candidate in self.__requests.items():
+            if candidate.state == state and candidate.request == request:
+                result=request_id
+                break
+        self.__sync_release()
+        return result
+        
     def was_fetched(self, request_id):
-        request=self.__get_request(request_id)
-        return request.fetched
+        return self.state(request_id) == self.FETCHED
     
     def get(self, request_id):
+        ''' fetches resources of reserved request
+        
+        Returns:
+            list of resources; None if request is not reserved, or already fetched.
+        '''
         result=None
-        request=self.__get_request(request_id)
         self.__sync_acquire()
-        if request.reserved and not request.fetched:
-            result=list()
-            for _, resources in list(request.resources.items()): 
-                result.extend(resources.values()) 
-            request.request.clear()
-            request.fetched=True
-            logger.debug("%s remove required and resources %s" %(request.client_name, request_id,))
+        request=self.__requests.get(request_id)
+        if request is not None and request.state == self.RESERVED:
+            result=list(request.resources.values())
+            request.state=self.FETCHED
+            logger.debug("%s fetched request %s", request.client_name, request_id)
         self.__sync_release() 
         
         return result 
             
     def put(self, *resources):
+        ''' returns resources of requests; requests whose resources are all 
+        returned are closed.
+        
+        Raises:
+            ResourcePoolError if any resource is not held by a request; 
+            nothing is returned then.
+        '''
         self.__sync_acquire()
-        logger.debug("putting back resources %s" % (repr(resources)))
+        logger.debug("putting back resources %s", resources)
         
-        # ensure resources returned are in alignment with this container.
-        #resource_to_return=list()
-        for resource in resources:            
-            rp_name=resource.pool 
-            failed=False 
-            try:
-                rp= self.__pools[rp_name]
-            except KeyError:
-                failed=True
-                logger.error("ResourcePool %s not found; cannot return resource %s" % (rp_name, resource))
-            else:
-                # There are two cases; if audited, and if not
-                # When audited, returning resource only if part of this request.
-                # If not audited, return anyway.
-                #rp=pool.pool
-                logger.debug("Returning %s to pool %s" % (repr(resource), rp.name))
-                rp.put(resource)
-                request_id=resource.requestor_request_id
-                request=self.__requests[request_id]
-                del request.resources[rp_name][resource.id_]
-                #del pool.inuse[resource.id_]
-                
-        if failed:
-            raise ResourcePoolError("Failed to return resources." )
+        requests=dict()
+        seen=set()
+        for resource in resources:
+            request=self.__requests.get(getattr(resource, 'requestor_request_id', None))
+            if request is None or request.resources is None or resource.id_ not in request.resources:
+                self.__sync_release()
+                raise ResourcePoolError("Resource %s is not held by any request; cannot return." % (resource,))
+            if resource.id_ in seen:
+                self.__sync_release()
+                raise ResourcePoolError("Resource %s is returned more than once." % (resource,))
+            seen.add(resource.id_)
+            requests[request.request_id]=request
+            
+        for resource in resources:
+            del requests[resource.requestor_request_id].resources[resource.id_]
+        self.__return_resources(resources)
+        for request in requests.values():
+            if not request.resources:
+                request.state=self.RETURNED
+                self.__close(request)
         self.__sync_release()
 
     def put_requested(self, request_id):
-        ''' returns fetched request formated as in get.
+        ''' returns all resources request still holds, and closes it.
         
         Args:
-            request: list of tuples of resource pool and amount requested
+            request_id: id of request, as returned by reserve.
         '''
         self.__sync_acquire()
-        logger.debug("putting back request id: %s" % (repr(request_id)))
+        logger.debug("putting back request id: %s", request_id)
+        request=self.__requests.get(request_id)
+        if request is None:
+            self.__sync_release()
+            raise ResourcePoolError("Unknown request_id: %s" % (request_id,))
+        request.state=self.RETURNED
+        self.__close(request)
+        self.__sync_release()
         
-        # ensure resources returned are in alignment with this container.
-        #resource_to_return=list()
-        request=self.__requests[request_id]
-        for rp_name, resources in request.resources.items():
-            failed=False 
-            try:
-                rp= self.__pools[rp_name]
-            except KeyError:
-                failed=True
-                logger.error("ResourcePool %s not found; cannot return resources" % (rp_name, ))
-            else:
-                # There are two cases; if audited, and if not
-                # When audited, returning resource only if part of this request.
-                # If not audited, return anyway.
-                #logger.debug("Returning %s to pool %s" % (repr(resource), rp.name))
-                for resource in resources:
-                    rp.put(resource)
-            
-            
-        if failed:
-            raise ResourcePoolError("Failed to return resources." )
+    def put_many(self, request_ids):
+        ''' returns all resources requests still hold, and closes them, in 
+        one pass; resources go back with one put per pool.
+        
+        Args:
+            request_ids: iterator on ids of requests, as returned by reserve
+                or reserve_many.
+        
+        Raises:
+            ResourcePoolError if any request is not known, or is listed more
+            than once; nothing is returned then.
+        '''
+        self.__sync_acquire()
+        requests=OrderedDict()
+        for request_id in request_ids:
+            request=self.__requests.get(request_id)
+            if request is None:
+                self.__sync_release()
+                raise ResourcePoolError("Unknown request_id: %s" % (request_id,))
+            if request_id in requests:
+                self.__sync_release()
+                raise ResourcePoolError("Request %s is returned more than once." % (request_id,))
+            requests[request_id]=request
+        resources=list()
+        for request in requests.values():
+            if request.resources: resources.extend(request.resources.values())
+            request.resources=None
+            request.state=self.RETURNED
+            self.__close(request)
+        self.__return_resources(resources)
+        self.__sync_release()
+        
+    def close(self, request_id):
+        ''' gives up request in any state; resources it holds are returned,
+        and resources reserved for it later are returned as they come.
+        '''
+        self.__sync_acquire()
+        request=self.__requests.get(request_id)
+        if request is not None: 
+            self.__closed.value+=1
+            self.__close(request)
         self.__sync_release()
         
-    # TODO: rebuild del of captured resources
     def __del__(self):
-    #    # need to make sure all resources are returned
-        for request_id, request in self.__requests.items():
-            for rp_name, resources in request.resources.items():
-                rp=self.__pools[rp_name]
-                for resource in resources.values():
-                    rp.put(resource)
-
+        # need to make sure all resources are returned
+        for request in list(self.__requests.values()):
+            if request.resources:
+                self.__return_resources(list(request.resources.values()))
@@ -0,0 +1,418 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+from acris.idioms.resource_pool import Resource, ResourcePoolError
+from multiprocessing import shared_memory
+import multiprocessing as mp
+import logging
+import weakref
+import time
+import os
+
+logger=logging.getLogger(__name__)
+
+# layout of shared memory, in 64 bit words
+_LIMIT=0 # number of resource slots
+_AVAILABLE=1 # number of slots in free stack
+_NEXT_TICKET=2 # ticket of next waiter to queue
+_SERVING=3 # ticket of waiter at head of queue
+_RING_SIZE=4 # max number of queued waiters
+_HEADER=8
+
+# ring entry of waiter, in words
+_COUNT=0 # resources requested, or _ABANDONED
+_PID=1 # process of waiter
+_ENTRY=2
+
+# counts of wakeup semaphore, in words
+_SLEEPING=0 # processes waiting on semaphore
+_WOKEN=1 # wakeups released on semaphore, not yet taken
+_COUNTS=2
+
+_WAKEUP_SEMAPHORES=32 # max semaphores waiters sleep on, by ticket
+
+_ABANDONED=-1 # ring state of waiter that stopped waiting
+
+def _detach(words, shm):
+    words.release()
+    shm.close()
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class SharedResourcePool(object):
+    ''' Resource pool shared by multiple processes.
+
+    Counts, free slots, owners and the waiter queue live in shared memory,
+    guarded by a process-shared lock; resource_limit is enforced
+    across all processes using the pool.  Waiting processes sleep on 
+    process-shared semaphores by ticket, so returned resources wake the 
+    head of the queue alone.  Unlike multiprocessing Condition, waking 
+    does not wait for sleepers to wake; so process that dies while waiting
+    does not block others.
+
+    Shared memory holds resource slots, not resource objects.  Each process
+    creates its own resource_cls object for a slot the first time it gets
+    the slot, and reuses it thereafter.  So a slot stands for a unit of the
+    real resource (license, connection quota, device), and its object is
+    the process' handle to it.
+
+    Pool must be created before worker processes are started, and passed
+    to them (fork inheritance, or as argument to multiprocessing.Process).
+    The process that created the pool owns its shared memory, and should
+    call close() when done.
+
+    Waiters are served in order of arrival.  A waiter at the head of the
+    queue holds the line until it can be served.  While it waits, it checks
+    for slots held by processes that no longer exist, and returns them to
+    the pool.  Waiters behind it check that its process exists, and skip it
+    if not.
+
+    Policy:
+        resource_limit: number of resource slots (required).
+        max_waiters: max waiters queued at once; more wait to queue.
+        reclaim_interval: seconds between checks for slots held by dead
+            processes, and for dead waiter at head of queue, while waiting.
+    '''
+
+    __policy={'resource_limit': -1,
+              'max_waiters': 1024,
+              'reclaim_interval': 1.0,
+              }
+
+    def __init__(self, name, resource_cls=Resource, policy={}, context=None):
+        ''' creates pool in shared memory
+        
+        Args:
+            name: pool name
+            resource_cls: class of resources handed by pool
+            policy: overrides of default policy
+            context: multiprocessing context, or its start method name, of 
+                processes that would use the pool.  Default context if None.
+        '''
+        policy=dict(self.__policy, **policy)
+        limit=policy['resource_limit']
+        if limit < 1:
+            raise ResourcePoolError("SharedResourcePool requires positive resource_limit, but got: %s" % (limit,))
+        self.name=name
+        self.__resource_cls=resource_cls
+        self.__policy=policy
+
+        ring_size=policy['max_waiters']
+        semaphores=min(ring_size, _WAKEUP_SEMAPHORES)
+        words=_HEADER + 2 * limit + _ENTRY * ring_size + _COUNTS * (semaphores + 1)
+        self.__shm=shared_memory.SharedMemory(create=True, size=words * 8)
+        self.__owner_pid=os.getpid()
+        if context is None or isinstance(context, str):
+            context=mp.get_context(context)
+        self.__lock=context.Lock()
+        # waiter sleeps on semaphore of its ticket; last one is of waiters 
+        # for room in ring.
+        self.__wakeup=tuple([context.Semaphore(0) for _ in range(semaphores + 1)])
+        self.__attach()
+
+        words=self.__words
+        words[_LIMIT]=limit
+        words[_AVAILABLE]=limit
+        words[_NEXT_TICKET]=0
+        words[_SERVING]=0
+        words[_RING_SIZE]=ring_size
+        for word in range(self.__counts, self.__counts + _COUNTS * len(self.__wakeup)):
+            words[word]=0
+        for slot in range(limit):
+            words[self.__free + slot]=slot
+            words[self.__owners + slot]=0
+
+    def __attach(self):
+        self.__words=self.__shm.buf.cast('q')
+        # shared memory cannot be closed while view on it is alive.
+        self.__detach=weakref.finalize(self, _detach, self.__words, self.__shm)
+        limit=self.__words[_LIMIT] if self.__words[_LIMIT] else self.__policy['resource_limit']
+        ring_size=self.__words[_RING_SIZE] if self.__words[_RING_SIZE] else self.__policy['max_waiters']
+        self.__free=_HEADER
+        self.__owners=_HEADER + limit
+        self.__ring=_HEADER + 2 * limit
+        self.__counts=self.__ring + _ENTRY * ring_size
+        self.__resources=dict() # this process' objects for slots
+        self.__inuse=dict() # slots held by this process
+        self.__pid=os.getpid()
+
+    def __getstate__(self):
+        # shared memory is re-attached by name in spawned processes;
+        # lock and semaphores are passed by multiprocessing while spawning.
+        return {'name': self.name, 'resource_cls': self.__resource_cls, 'policy': self.__policy,
+                'shm_name': self.__shm.name, 'lock': self.__lock, 'wakeup': self.__wakeup, 'owner_pid': self.__owner_pid}
+
+    def __setstate__(self, state):
+        self.name=state['name']
+        self.__resource_cls=state['resource_cls']
+        self.__policy=state['policy']
+        self.__lock=state['lock']
+        self.__wakeup=state['wakeup']
+        self.__owner_pid=state['owner_pid']
+        # processes started by multiprocessing share the resource tracker of 
+        # the creating process, so attaching does not add ownership.
+        self.__shm=shared_memory.SharedMemory(name=state['shm_name'])
+        self.__attach()
+
+    def __repr__(self):
+        return "SharedResourcePool( name: %s, class: %s, policy: %s)" % (self.name, self.__resource_cls.__name__, self.__policy)
+
+    def __check_fork(self):
+        if self.__pid != os.getpid():
+            # forked; objects and holdings of parent are not this process'.
+            self.__resources=dict()
+            self.__inuse=dict()
+            self.__pid=os.getpid()
+
+    @property
+    def available(self):
+        ''' number of slots available to all processes
+        '''
+        return self.__words[_AVAILABLE]
+
+    def __take(self, count, pid):
+        # called with lock held
+        words=self.__words
+        available=words[_AVAILABLE]
+        slots=list()
+        for i in range(available - 1, available - count - 1, -1):
+            slot=words[self.__free + i]
+            words[self.__owners + slot]=pid
+            slots.append(slot)
+        words[_AVAILABLE]=available - count
+        return slots
+
+    def __give(self, slots):
+        # called with lock held
+        words=self.__words
+        available=words[_AVAILABLE]
+        for slot in slots:
+            words[self.__free + available]=slot
+            words[self.__owners + slot]=0
+            available+=1
+        words[_AVAILABLE]=available
+
+    def __entry(self, ticket):
+        return self.__ring + _ENTRY * (ticket % self.__words[_RING_SIZE])
+
+    def __advance(self, served=None):
+        ''' moves head of queue past served ticket, and past abandoned 
+        waiters; wakes new head if resources are available, and waiters 
+        for room in ring.  Called with lock held.
+        '''
+        words=self.__words
+        serving=words[_SERVING]
+        if served == serving: words[_SERVING]=serving + 1
+        while words[_SERVING] < words[_NEXT_TICKET]:
+            entry=self.__entry(words[_SERVING])
+            if words[entry + _COUNT] != _ABANDONED: break
+            words[entry + _COUNT]=words[entry + _PID]=0
+            words[_SERVING]+=1
+        if words[_SERVING] != serving:
+            if words[_AVAILABLE] > 0: self.__wake_head()
+            self.__wake(len(self.__wakeup) - 1)
+
+    def __skip_dead_head(self):
+        ''' abandons waiter at head of queue if its process no longer 
+        exists; called with lock held.
+
+        Returns:
+            True if head of queue was skipped.
+        '''
+        words=self.__words
+        if words[_SERVING] == words[_NEXT_TICKET]: return False
+        entry=self.__entry(words[_SERVING])
+        pid=words[entry + _PID]
+        if pid == os.getpid() or _alive(pid): return False
+        logger.warning("%s skipping waiter of dead process %s" % (self.name, pid))
+        words[entry + _COUNT]=_ABANDONED
+        self.__advance()
+        return True
+
+    def __semaphore_of(self, ticket):
+        return ticket % (len(self.__wakeup) - 1)
+
+    def __wait(self, semaphore, timeout):
+        ''' waits for wakeup of semaphore, or timeout; called with lock 
+        held, which is released while waiting.
+        '''
+        words=self.__words
+        counts=self.__counts + _COUNTS * semaphore
+        words[counts + _SLEEPING]+=1
+        self.__lock.release()
+        try:
+            woken=self.__wakeup[semaphore].acquire(True, timeout)
+        finally:
+            self.__lock.acquire()
+            words[counts + _SLEEPING]-=1
+        if woken: words[counts + _WOKEN]-=1
+
+    def __wake(self, semaphore):
+        ''' wakes processes waiting on semaphore; called with lock held.  
+        Process that died while waiting is still counted; it only costs 
+        spurious wakeups of others.
+        '''
+        words=self.__words
+        counts=self.__counts + _COUNTS * semaphore
+        wakeup=self.__wakeup[semaphore]
+        for _ in range(words[counts + _SLEEPING] - words[counts + _WOKEN]):
+            wakeup.release()
+            words[counts + _WOKEN]+=1
+
+    def __wake_head(self):
+        # called with lock held
+        words=self.__words
+        if words[_SERVING] < words[_NEXT_TICKET]:
+            self.__wake(self.__semaphore_of(words[_SERVING]))
+
+    def __reclaim_dead(self):
+        ''' returns slots held by processes that no longer exist; called with
+        lock held.
+        '''
+        words=self.__words
+        owners=self.__owners
+        dead=dict()
+        for slot in range(words[_LIMIT]):
+            pid=words[owners + slot]
+            if pid == 0: continue
+            if pid not in dead: dead[pid]=not _alive(pid)
+            if dead[pid]: self.__give([slot])
+        reclaimed=[pid for pid, is_dead in dead.items() if is_dead]
+        if reclaimed:
+            logger.warning("%s reclaimed slots of dead processes %s" % (self.name, reclaimed))
+        return len(reclaimed) > 0
+
+    def __resources_of(self, slots):
+        resources=list()
+        for slot in slots:
+            resource=self.__resources.get(slot)
+            if resource is None:
+                resource=self.__resource_cls()
+                resource.pool=self.name
+                resource.slot=slot
+                self.__resources[slot]=resource
+            self.__inuse[slot]=resource
+            resources.append(resource)
+        return resources
+
+    def get(self, count=1, wait=-1):
+        ''' retrieve resources from pool
+
+        Args:
+            count: number of resources to grab
+            wait: number of seconds to wait if none available.
+                0: don't wait
+                negative: wait until available
+                positive: wait period
+
+        Returns:
+            list of resources; empty if not available within wait.
+
+        Raises:
+            ResourcePoolError
+        '''
+        self.__check_fork()
+        words=self.__words
+        if count > words[_LIMIT]:
+            raise ResourcePoolError("Trying to get count (%s) larger than resource limit (%s)" % (count, words[_LIMIT]))
+        pid=os.getpid()
+        deadline=None if wait < 0 else time.monotonic() + wait
+        reclaim_interval=self.__policy['reclaim_interval']
+
+        with self.__lock:
+            if words[_SERVING] == words[_NEXT_TICKET] and words[_AVAILABLE] >= count:
+                return self.__resources_of(self.__take(count, pid))
+            if wait == 0:
+                return []
+
+            # queue; wait for room in ring if full.
+            check_head=time.monotonic() + reclaim_interval
+            while words[_NEXT_TICKET] - words[_SERVING] >= words[_RING_SIZE]:
+                remaining=None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0: return []
+                self.__wait(len(self.__wakeup) - 1, reclaim_interval if remaining is None else min(remaining, reclaim_interval))
+                if time.monotonic() >= check_head:
+                    self.__skip_dead_head()
+                    check_head=time.monotonic() + reclaim_interval
+            ticket=words[_NEXT_TICKET]
+            words[_NEXT_TICKET]=ticket + 1
+            entry=self.__entry(ticket)
+            words[entry + _COUNT]=count
+            words[entry + _PID]=pid
+
+            while True:
+                if words[_SERVING] == ticket and words[_AVAILABLE] >= count:
+                    slots=self.__take(count, pid)
+                    words[entry + _COUNT]=words[entry + _PID]=0
+                    # next in line may be served too.
+                    self.__advance(ticket)
+                    return self.__resources_of(slots)
+
+                remaining=None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    words[entry + _COUNT]=_ABANDONED
+                    self.__advance()
+                    return []
+
+                self.__wait(self.__semaphore_of(ticket), reclaim_interval if remaining is None else min(remaining, reclaim_interval))
+                if words[_SERVING] == ticket:
+                    if words[_AVAILABLE] < count: self.__reclaim_dead()
+                elif time.monotonic() >= check_head:
+                    self.__skip_dead_head()
+                    check_head=time.monotonic() + reclaim_interval
+
+    def put(self, *resources):
+        ''' returns resources to this pool
+
+        Raises:
+            ResourcePoolError if resource is not held by this process, or is
+            returned more than once; then, no resource is returned.
+        '''
+        self.__check_fork()
+        slots=list()
+        for resource in resources:
+            slot=getattr(resource, 'slot', None)
+            if self.__inuse.get(slot) is not resource:
+                raise ResourcePoolError("Resource (%s) not held from pool %s by this process" % (resource, self.name))
+            if slot in slots:
+                raise ResourcePoolError("Resource (%s) is returned more than once to pool %s" % (resource, self.name))
+            slots.append(slot)
+        for slot in slots:
+            del self.__inuse[slot]
+        with self.__lock:
+            self.__give(slots)
+            self.__wake_head()
+
+    def close(self):
+        ''' detaches this process from shared memory; in process that
+        created the pool, also frees shared memory.
+        '''
+        self.__detach()
+        if self.__owner_pid == os.getpid():
+            self.__shm.unlink()
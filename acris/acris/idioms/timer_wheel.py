@@ -0,0 +1,235 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+import threading
+import logging
+import time
+import math
+import os
+import weakref
+
+logger=logging.getLogger(__name__)
+
+class TimerWheelError(Exception): pass
+
+class Timer(object):
+    ''' Handle of callback scheduled on TimerWheel.
+    '''
+    __slots__=('tick', 'callback', 'args', 'slot', )
+
+    def __init__(self, tick, callback, args):
+        self.tick=tick
+        self.callback=callback
+        self.args=args
+        self.slot=None
+
+    def active(self):
+        ''' Returns True if timer is still waiting to fire
+        '''
+        return self.slot is not None
+
+    def __repr__(self):
+        return "Timer(tick: %s, callback: %s)" % (self.tick, self.callback)
+
+class TimerWheel(object):
+    ''' Hierarchical timer wheel.
+
+    Timers are kept in levels of slots; level 0 slots are one tick wide,
+    each next level's slots are as wide as the whole previous level.  When
+    level 0 completes a turn, the next slot of the level above is cascaded
+    down.  Scheduling and canceling are O(1), and a single thread serves
+    any number of timers.
+
+    Callbacks are called from the wheel's thread, outside of its lock.
+    They should be short; long work should be handed off to another thread.
+
+    Forked child keeps timers scheduled before fork (e.g., sweep timers of
+    pools it inherits); its wheel's thread is started anew.
+    '''
+
+    resolution=0.01 # seconds per tick
+    slot_bits=6
+    levels=4
+
+    def __init__(self):
+        self.__lock=threading.Condition(threading.Lock())
+        self.__reset()
+        if hasattr(os, 'register_at_fork'):
+            # lock may be held by another thread of parent while it forks.
+            reset=weakref.WeakMethod(self.__after_fork)
+            def after_fork():
+                method=reset()
+                if method is not None: method()
+            os.register_at_fork(after_in_child=after_fork)
+
+    def __after_fork(self):
+        self.__lock=threading.Condition(threading.Lock())
+        with self.__lock:
+            self.__forked()
+
+    def __reset(self):
+        self.__slots_per_level=1 << self.slot_bits
+        self.__mask=self.__slots_per_level - 1
+        self.__wheels=[[dict() for _ in range(self.__slots_per_level)] for _ in range(self.levels)]
+        self.__start=time.monotonic()
+        self.__tick=0
+        self.__count=0
+        self.__thread=None
+        self.__pid=os.getpid()
+
+    def __len__(self):
+        return self.__count
+
+    def __now_tick(self):
+        return int((time.monotonic() - self.__start) / self.resolution)
+
+    def __place(self, timer):
+        # called with lock held; timer goes to the lowest level on which it 
+        # is less than a full turn ahead.
+        level=0
+        if timer.tick > self.__tick:
+            while level < self.levels - 1:
+                shift=self.slot_bits * level
+                if (timer.tick >> shift) - (self.__tick >> shift) <= self.__mask: break
+                level+=1
+            shift=self.slot_bits * level
+            ahead=min((timer.tick >> shift) - (self.__tick >> shift), self.__mask)
+            index=((self.__tick >> shift) + ahead) & self.__mask
+        else:
+            # overdue; fire on current tick.
+            index=self.__tick & self.__mask
+        slot=self.__wheels[level][index]
+        slot[id(timer)]=timer
+        timer.slot=slot
+
+    def __forked(self):
+        # called with lock held; parent's thread is not carried to child, 
+        # but its timers are.
+        if self.__pid == os.getpid(): return
+        self.__pid=os.getpid()
+        self.__thread=None
+        if self.__count > 0: self.__start_thread()
+
+    def __start_thread(self):
+        # called with lock held
+        self.__forked()
+        if self.__thread is None:
+            self.__thread=threading.Thread(target=self.__run, name='TimerWheel', daemon=True)
+            self.__thread.start()
+
+    def schedule(self, delay, callback, *args):
+        ''' schedules callback to be called after delay seconds
+
+        Args:
+            delay: seconds from now
+            callback: callable to call with args
+
+        Returns:
+            Timer that can be used to cancel
+        '''
+        if not callable(callback):
+            raise TimerWheelError("Callback must be callable, but it is not: %s" % repr(callback))
+        with self.__lock:
+            self.__start_thread()
+            elapsed=time.monotonic() - self.__start
+            now_tick=int(elapsed / self.resolution)
+            if self.__count == 0: self.__tick=max(self.__tick, now_tick)
+            # round up, so timer never fires before delay passed.
+            tick=max(now_tick + 1, int(math.ceil((elapsed + delay) / self.resolution)))
+            timer=Timer(tick, callback, args)
+            self.__place(timer)
+            self.__count+=1
+            if self.__count == 1: self.__lock.notify()
+        return timer
+
+    def cancel(self, timer):
+        ''' cancels timer
+
+        Returns:
+            True if timer was waiting and is now canceled, False if already fired or canceled.
+        '''
+        with self.__lock:
+            self.__forked()
+            slot=timer.slot
+            if slot is None: return False
+            del slot[id(timer)]
+            timer.slot=None
+            self.__count-=1
+        return True
+
+    def __advance(self, target):
+        # called with lock held; returns timers due until target tick.
+        due=list()
+        while self.__tick < target and self.__count > 0:
+            self.__tick+=1
+            tick=self.__tick
+            # when lower level completes a turn, cascade next slot of upper 
+            # level; highest first, so timers cascade all the way down.
+            top=0
+            while top < self.levels - 1 and (tick >> (self.slot_bits * top)) & self.__mask == 0:
+                top+=1
+            for level in range(top, 0, -1):
+                slot=self.__wheels[level][(tick >> (self.slot_bits * level)) & self.__mask]
+                timers=list(slot.values())
+                slot.clear()
+                for timer in timers:
+                    self.__place(timer)
+            slot=self.__wheels[0][tick & self.__mask]
+            for timer in list(slot.values()):
+                if timer.tick <= tick:
+                    del slot[id(timer)]
+                    timer.slot=None
+                    self.__count-=1
+                    due.append(timer)
+        if self.__count == 0:
+            self.__tick=max(self.__tick, target)
+        return due
+
+    def __run(self):
+        while True:
+            with self.__lock:
+                while self.__count == 0:
+                    self.__lock.wait()
+                due=self.__advance(self.__now_tick())
+                if not due:
+                    # sleep until start of next tick
+                    elapsed=time.monotonic() - self.__start
+                    self.__lock.wait(self.resolution - elapsed % self.resolution)
+                    continue
+            for timer in due:
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    logger.exception("TimerWheel callback %s failed: %s" % (timer.callback, repr(e)))
+
+__timer_wheel=None
+__timer_wheel_lock=threading.Lock()
+
+def get_timer_wheel():
+    ''' Returns the timer wheel shared by the whole process.
+    '''
+    global __timer_wheel
+    if __timer_wheel is None:
+        with __timer_wheel_lock:
+            if __timer_wheel is None:
+                __timer_wheel=TimerWheel()
+    return __timer_wheel
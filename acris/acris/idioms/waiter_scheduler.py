@@ -0,0 +1,293 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+from abc import abstractmethod
+from collections import OrderedDict
+import heapq
+import time
+
+class WaiterSchedulerError(Exception): pass
+
+class Waiter(object):
+    ''' Request awaiting resources in ResourcePool.
+    '''
+    __slots__=('ticket', 'count', 'caller', 'condition', 'since', 'hold_time', 'expire', 'callback', 'timer', 'loop', 'priority', 'resources', 'error', )
+
+    def __init__(self, ticket, count, caller='', condition=None, hold_time=None, expire=None, callback=None, loop=None, priority=0):
+        self.ticket=ticket
+        self.count=count
+        self.priority=priority
+        self.caller=caller
+        self.condition=condition
+        self.since=time.monotonic()
+        self.hold_time=hold_time
+        self.expire=expire
+        self.callback=callback
+        self.timer=None
+        self.loop=loop
+        self.resources=None # handed by put, to waiter awaiting on condition
+        self.error=None # why waiter awaiting on condition failed
+
+    def __repr__(self):
+        return "Waiter(ticket: %s, count: %s)" % (self.ticket, self.count)
+
+class WaiterScheduler(object):
+    ''' Base of policies deciding which awaiting requests are served when
+    resources are returned to ResourcePool.
+
+    Scheduler is always used while holding the pool's lock.
+    '''
+
+    def __init__(self, policy=None):
+        self.waiters=OrderedDict()
+
+    def __len__(self):
+        return len(self.waiters)
+
+    def __iter__(self):
+        return iter(list(self.waiters.values()))
+
+    def add(self, waiter):
+        self.waiters[waiter.ticket]=waiter
+
+    def remove(self, ticket):
+        ''' removes waiter from schedule
+
+        Returns:
+            removed waiter, or None if ticket is not awaiting.
+        '''
+        return self.waiters.pop(ticket, None)
+
+    def admit(self, count, available, priority=0):
+        ''' decides if new request for count resources may be served ahead
+        of awaiting requests.
+
+        Args:
+            count: number of resources requested
+            available: number of resources available in the pool
+            priority: priority of request; only priority scheduler uses it.
+        '''
+        return len(self.waiters) == 0
+
+    @abstractmethod
+    def select(self, available):
+        ''' picks awaiting requests to serve from available resources, and
+        removes them from schedule.
+
+        Args:
+            available: number of resources available in the pool
+
+        Returns:
+            list of waiters to serve in order, requiring no more than available.
+        '''
+        return []
+
+    def _take(self, waiters, available, hold_the_line):
+        selected=list()
+        for waiter in waiters:
+            if waiter.count <= available:
+                available-=waiter.count
+                selected.append(waiter)
+            elif hold_the_line:
+                break
+        for waiter in selected:
+            del self.waiters[waiter.ticket]
+        return selected
+
+class FifoScheduler(WaiterScheduler):
+    ''' Serves awaiting requests strictly in order of arrival.
+
+    A request that cannot be served holds the line for all behind it.
+    '''
+
+    def select(self, available):
+        return self._take(self.waiters.values(), available, hold_the_line=True)
+
+class FirstFitScheduler(WaiterScheduler):
+    ''' Serves, in order of arrival, every awaiting request that fits the
+    available resources.  Requests that cannot be served are skipped.
+    '''
+
+    def admit(self, count, available, priority=0):
+        return True
+
+    def select(self, available):
+        return self._take(self.waiters.values(), available, hold_the_line=False)
+
+class SmallestFirstScheduler(WaiterScheduler):
+    ''' Serves awaiting requests with smallest count first, by arrival
+    within same count.
+
+    Large requests may starve under steady flow of small requests; see
+    AgingScheduler.
+    '''
+
+    def __init__(self, policy=None):
+        super().__init__(policy)
+        self.__heap=list()
+        self.__sequence=0
+
+    def add(self, waiter):
+        super().add(waiter)
+        heap=self.__heap
+        if len(heap) > 2 * len(self.waiters) + 64:
+            # drop entries of removed waiters (e.g., timed out).
+            heap[:]=[entry for entry in heap if entry[2].ticket in self.waiters]
+            heapq.heapify(heap)
+        heapq.heappush(heap, (waiter.count, self.__sequence, waiter))
+        self.__sequence+=1
+
+    def admit(self, count, available, priority=0):
+        return True
+
+    def select(self, available):
+        selected=list()
+        heap=self.__heap
+        while heap:
+            count, _, waiter=heap[0]
+            if waiter.ticket not in self.waiters:
+                # removed earlier (e.g., timed out); drop lazily.
+                heapq.heappop(heap)
+                continue
+            if count > available:
+                break
+            heapq.heappop(heap)
+            del self.waiters[waiter.ticket]
+            available-=count
+            selected.append(waiter)
+        return selected
+
+class AgingScheduler(WaiterScheduler):
+    ''' Serves smallest requests first, but once a request awaits longer
+    than waiter_max_age seconds it is served in order of arrival and
+    holds the line until served.
+
+    This keeps utilization of smallest-first under normal load, and
+    bounds the wait of large requests.
+    '''
+
+    def __init__(self, policy=None):
+        super().__init__(policy)
+        policy=policy if policy is not None else dict()
+        self.max_age=policy.get('waiter_max_age', 1.0)
+
+    def __aged(self):
+        # waiters are kept in arrival order, so aged waiters are a prefix.
+        aged_since=time.monotonic() - self.max_age
+        aged=list()
+        for waiter in self.waiters.values():
+            if waiter.since > aged_since: break
+            aged.append(waiter)
+        return aged
+
+    def admit(self, count, available, priority=0):
+        return len(self.__aged()) == 0
+
+    def select(self, available):
+        aged=self.__aged()
+        selected=self._take(aged, available, hold_the_line=True)
+        if len(selected) < len(aged):
+            # an aged waiter is holding the line.
+            return selected
+        available-=sum([waiter.count for waiter in selected])
+        young=sorted(self.waiters.values(), key=lambda waiter: waiter.count)
+        selected.extend(self._take(young, available, hold_the_line=True))
+        return selected
+
+class PriorityScheduler(WaiterScheduler):
+    ''' Serves awaiting requests with highest priority first, by arrival 
+    within same priority.  The first request in order holds the line.
+
+    To protect low priority requests from starvation, priority of awaiting
+    request grows by one for every priority_aging seconds it waits.  As all
+    awaiting requests age alike, their order only depends on priority and 
+    arrival, so they are kept in a heap: O(log n) per request.  With 
+    priority_aging of 0, priority is strict.
+    '''
+
+    def __init__(self, policy=None):
+        super().__init__(policy)
+        policy=policy if policy is not None else dict()
+        self.aging=policy.get('priority_aging', 1.0)
+        self.__heap=list()
+        self.__sequence=0
+
+    def __key(self, priority, since):
+        # lower key is served first.
+        return since / self.aging - priority if self.aging > 0 else -priority
+
+    def add(self, waiter):
+        super().add(waiter)
+        heap=self.__heap
+        if len(heap) > 2 * len(self.waiters) + 64:
+            # drop entries of removed waiters (e.g., timed out).
+            heap[:]=[entry for entry in heap if entry[2].ticket in self.waiters]
+            heapq.heapify(heap)
+        heapq.heappush(heap, (self.__key(waiter.priority, waiter.since), self.__sequence, waiter))
+        self.__sequence+=1
+
+    def __head(self):
+        heap=self.__heap
+        while heap and heap[0][2].ticket not in self.waiters:
+            # removed earlier (e.g., timed out); drop lazily.
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def admit(self, count, available, priority=0):
+        head=self.__head()
+        if head is None: return True
+        return count <= available and self.__key(priority, time.monotonic()) < head[0]
+
+    def select(self, available):
+        selected=list()
+        while True:
+            head=self.__head()
+            if head is None or head[2].count > available: break
+            heapq.heappop(self.__heap)
+            waiter=head[2]
+            del self.waiters[waiter.ticket]
+            available-=waiter.count
+            selected.append(waiter)
+        return selected
+
+waiter_schedulers={'fifo': FifoScheduler,
+                   'first_fit': FirstFitScheduler,
+                   'smallest_first': SmallestFirstScheduler,
+                   'aging': AgingScheduler,
+                   'priority': PriorityScheduler,
+                   }
+
+def create_waiter_scheduler(policy):
+    ''' creates waiter scheduler according to pool policy
+
+    Args:
+        policy: pool policy; waiter_scheduler is either name of registered
+            scheduler in waiter_schedulers, or a WaiterScheduler subclass.
+    '''
+    scheduler=policy.get('waiter_scheduler', 'fifo')
+    if isinstance(scheduler, str):
+        try:
+            scheduler=waiter_schedulers[scheduler]
+        except KeyError:
+            raise WaiterSchedulerError("Unknown waiter scheduler: %s; expected one of: %s" % \
+                                       (scheduler, ', '.join(waiter_schedulers.keys())))
+    return scheduler(policy)
@@ -0,0 +1,98 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Cluster benchmark: requests per second and latency of ResourcePoolServer
+as the number of client processes grows.
+
+Broker runs in its own process, on localhost TCP.  Each client process
+connects, and gets and puts a resource in a loop for DURATION seconds; get
+latency is a full round trip, put is pipelined.  The pipelined rows keep
+DEPTH gets in flight on each connection.
+'''
+
+import time
+import multiprocessing as mp
+from acris import resource_pool as rp
+from acris import cluster_resource_pool as crp
+
+DURATION=2.0
+RESOURCE_LIMIT=64
+CLIENTS=[1, 2, 4, 8, 16]
+DEPTH=16
+
+class ClusterResource(rp.Resource): pass
+
+def broker(address_queue):
+    pool=rp.ResourcePool('CLUSTER', resource_cls=ClusterResource,
+                         policy={'resource_limit': RESOURCE_LIMIT}).load(count=RESOURCE_LIMIT)
+    server=crp.ResourcePoolServer([pool])
+    address_queue.put(server.address)
+    server.serve_forever()
+
+def client(address, start, duration, depth, results):
+    connection=crp.ResourcePoolClient(address, name='bench')
+    pool=connection.pool('CLUSTER')
+    latencies=list()
+    start.wait()
+    stop_at=time.monotonic() + duration
+    while time.monotonic() < stop_at:
+        begin=time.perf_counter()
+        if depth == 1:
+            resources=pool.get(count=1)
+        else:
+            futures=[pool.get_future(count=1) for _ in range(depth)]
+            resources=[resource for future in futures for resource in future.result()]
+        latencies.append(time.perf_counter() - begin)
+        pool.put(*resources)
+    connection.close()
+    results.put((len(latencies) * depth, latencies))
+
+def percentile(values, pct):
+    values=sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+def run(address, clients, depth, duration=DURATION):
+    start=mp.Event()
+    results=mp.Queue()
+    processes=[mp.Process(target=client, args=(address, start, duration, depth, results)) for _ in range(clients)]
+    for process in processes: process.start()
+    time.sleep(0.5) # let clients connect
+    start.set()
+    collected=[results.get() for _ in processes]
+    for process in processes: process.join()
+    requests=sum([count for count, _ in collected])
+    latencies=[latency for _, values in collected for latency in values]
+    return requests / duration, latencies
+
+if __name__ == '__main__':
+    address_queue=mp.Queue()
+    server=mp.Process(target=broker, args=(address_queue,), daemon=True)
+    server.start()
+    address=address_queue.get()
+
+    print('%8s %6s %12s %14s %14s' % ('clients', 'depth', 'gets/sec', 'p50 ms/batch', 'p99 ms/batch'))
+    for depth in [1, DEPTH]:
+        for clients in CLIENTS:
+            throughput, latencies=run(address, clients, depth)
+            print('%8d %6d %12.0f %14.3f %14.3f' % (clients, depth, throughput,
+                  percentile(latencies, 50) * 1e3, percentile(latencies, 99) * 1e3))
+    server.terminate()
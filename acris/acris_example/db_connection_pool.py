@@ -0,0 +1,80 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Throughput benchmark: sqlite3 queries with and without connection pool.
+
+A table of ROWS rows is queried by primary key, for DURATION seconds, by
+each number of THREADS.  Without pooling, each query opens and closes its
+own connection; with pooling, queries check out connections of a
+ConnectionPool of POOL_SIZE connections, statement by statement.
+'''
+
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from acris import virtual_resource_pool_db as vdb
+
+DURATION=2.0
+ROWS=10000
+POOL_SIZE=4
+THREADS=[1, 4, 16]
+
+def unpooled_query(path, key):
+    connection=sqlite3.connect(path)
+    try:
+        cursor=connection.execute('SELECT value FROM items WHERE id=?', (key,))
+        return cursor.fetchall()
+    finally:
+        connection.close()
+
+def worker(query, stop, counts, index):
+    count=0
+    while not stop.is_set():
+        query(count % ROWS)
+        count+=1
+    counts[index]=count
+
+def run(query, threads, duration=DURATION):
+    stop=threading.Event()
+    counts=[0] * threads
+    workers=[threading.Thread(target=worker, args=(query, stop, counts, i)) for i in range(threads)]
+    for thread in workers: thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in workers: thread.join()
+    return sum(counts) / duration
+
+if __name__ == '__main__':
+    path=os.path.join(tempfile.mkdtemp(), 'items.db')
+    pool=vdb.ConnectionPool('ITEMS', sqlite3, path, policy={'resource_limit': POOL_SIZE})
+    pool.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)')
+    pool.executemany('INSERT INTO items VALUES (?, ?)', [(key, 'item %s' % key) for key in range(ROWS)])
+    
+    pooled_query=lambda key: pool.execute('SELECT value FROM items WHERE id=?', (key,))
+    print('%8s %14s %14s %8s' % ('threads', 'unpooled q/s', 'pooled q/s', 'speedup'))
+    for threads in THREADS:
+        unpooled=run(lambda key: unpooled_query(path, key), threads)
+        pooled=run(pooled_query, threads)
+        print('%8d %14.0f %14.0f %8.1f' % (threads, unpooled, pooled, pooled / unpooled))
+    print('connections opened by pool: %s' % (pool.metrics['loaded'].value,))
@@ -0,0 +1,130 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+''' Simulation: static and adaptive pool size under bursty load.
+
+Requests arrive by a Markov modulated Poisson trace: QUIET_RATE requests
+per second, switching to BURST_RATE for bursts of BURST_TIME seconds on
+average, every QUIET_TIME seconds on average.  Each request holds a resource
+for HOLD seconds on average (exponential), and creating resource takes 
+LOAD_TIME seconds.  The same trace is played on a pool of MIN_SIZE
+resources, a pool of MAX_SIZE resources, and a pool sized by PoolSizer
+between them, shrinking after SHRINK_DELAY seconds.  Wait percentiles, mean resources provisioned (available and
+in use) and resources created are reported.
+'''
+
+import sys
+import time
+import random
+import threading
+from functools import partial
+from acris import resource_pool as rp
+from acris.idioms.pool_sizer import PoolSizer
+from acris.idioms.timer_wheel import get_timer_wheel
+
+DURATION=8.0
+QUIET_RATE=50
+BURST_RATE=400
+QUIET_TIME=1.0
+BURST_TIME=0.3
+HOLD=0.02
+LOAD_TIME=0.002
+MIN_SIZE=2
+MAX_SIZE=32
+SAMPLE=0.01
+SHRINK_DELAY=1.0
+
+class AdaptiveResource(rp.Resource):
+    def __init__(self, *args, **kwargs):
+        super(AdaptiveResource, self).__init__(*args, **kwargs)
+        time.sleep(LOAD_TIME)
+
+def percentile(values, fraction):
+    values=sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+def trace(duration=DURATION, seed=1):
+    ''' returns list of (arrival, hold) of requests.
+    '''
+    random_=random.Random(seed)
+    requests=list()
+    now, burst=0.0, False
+    switch=random_.expovariate(1.0 / QUIET_TIME)
+    while now < duration:
+        now+=random_.expovariate(BURST_RATE if burst else QUIET_RATE)
+        if now >= switch:
+            now, burst=switch, not burst
+            switch+=random_.expovariate(1.0 / (BURST_TIME if burst else QUIET_TIME))
+            continue
+        requests.append((now, random_.expovariate(1.0 / HOLD)))
+    return requests
+
+def play(name, requests, size, sized=False):
+    pool=rp.ResourcePool('ADAPTIVE-%s' % name, resource_cls=AdaptiveResource, 
+                         policy={'resource_limit': size})
+    sizer=PoolSizer(pool, min_size=MIN_SIZE, max_size=MAX_SIZE, interval=SAMPLE, shrink_delay=SHRINK_DELAY).start() if sized else None
+    timer_wheel=get_timer_wheel()
+    waits=list()
+    done=threading.Semaphore(0)
+    
+    def served(arrival, hold, resources):
+        waits.append(time.perf_counter() - arrival)
+        timer_wheel.schedule(hold, returned, resources)
+        
+    def returned(resources):
+        pool.put(*resources)
+        done.release()
+    
+    def called_back(arrival, hold, ticket):
+        served(arrival, hold, pool.get(ticket=ticket))
+        
+    provisioned=list()
+    stop=threading.Event()
+    def sample():
+        available, inuse=pool.metrics['available'], pool.metrics['inuse']
+        while not stop.wait(SAMPLE):
+            provisioned.append(available.value + inuse.value)
+    sampler=threading.Thread(target=sample)
+    sampler.start()
+    
+    start=time.perf_counter()
+    for at, hold in requests:
+        delay=start + at - time.perf_counter()
+        if delay > 0: time.sleep(delay)
+        arrival=time.perf_counter()
+        resources=pool.get(count=1, wait=-1, callback=partial(called_back, arrival, hold))
+        if isinstance(resources, list): served(arrival, hold, resources)
+    for _ in requests: done.acquire()
+    
+    stop.set()
+    sampler.join()
+    if sizer is not None: sizer.stop()
+    return waits, sum(provisioned) / max(len(provisioned), 1), pool.metrics['loaded'].value
+
+if __name__ == '__main__':
+    duration=float(sys.argv[1]) if len(sys.argv) > 1 else DURATION
+    requests=trace(duration)
+    print('%d requests over %.1f seconds' % (len(requests), duration))
+    print('%-12s %12s %12s %14s %10s' % ('pool', 'wait p50 ms', 'wait p99 ms', 'provisioned', 'created'))
+    for name, size, sized in [('static-min', MIN_SIZE, False), ('static-max', MAX_SIZE, False), ('adaptive', MIN_SIZE, True)]:
+        waits, provisioned, created=play(name, requests, size, sized)
+        print('%-12s %12.2f %12.2f %14.1f %10d' % (name, percentile(waits, 0.5) * 1e3, 
+              percentile(waits, 0.99) * 1e3, provisioned, created))
@@ -0,0 +1,77 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' asyncio benchmark: many concurrent coroutine leases on a single loop.
+
+COROUTINES coroutines lease from a pool far smaller than their number, so
+most of them are parked awaiting resources at the same time.  The same
+load on asyncio.Semaphore is shown for reference.
+'''
+
+import time
+import asyncio
+import threading
+from acris import resource_pool as rp
+
+COROUTINES=50000
+RESOURCE_LIMITS=[10, 100, 1000]
+
+class AsyncResource(rp.Resource): pass
+
+def percentile(values, pct):
+    values=sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+async def worker(pool, waits):
+    start=time.perf_counter()
+    async with pool.lease(1) as resources:
+        waits.append(time.perf_counter() - start)
+        await asyncio.sleep(0)
+
+async def semaphore_worker(semaphore, waits):
+    start=time.perf_counter()
+    async with semaphore:
+        waits.append(time.perf_counter() - start)
+        await asyncio.sleep(0)
+
+async def run_semaphore(resource_limit):
+    semaphore=asyncio.Semaphore(resource_limit)
+    waits=list()
+    start=time.perf_counter()
+    await asyncio.gather(*[semaphore_worker(semaphore, waits) for _ in range(COROUTINES)])
+    return time.perf_counter() - start, waits
+
+async def run(resource_limit):
+    pool=rp.ResourcePool('ASYNC-%s' % resource_limit, resource_cls=AsyncResource,
+                         policy={'resource_limit': resource_limit}).load(count=resource_limit)
+    waits=list()
+    start=time.perf_counter()
+    await asyncio.gather(*[worker(pool, waits) for _ in range(COROUTINES)])
+    return time.perf_counter() - start, waits
+
+if __name__ == '__main__':
+    print('%-10s %8s %10s %10s %12s %9s %9s %8s' % ('', 'limit', 'leases', 'seconds', 'leases/sec', 'p50 ms', 'p99 ms', 'threads'))
+    for resource_limit in RESOURCE_LIMITS:
+        for name, runner in [('pool', run), ('semaphore', run_semaphore)]:
+            elapsed, waits=asyncio.run(runner(resource_limit))
+            print('%-10s %8d %10d %10.3f %12.0f %9.2f %9.2f %8d' % (name, resource_limit, len(waits), elapsed, len(waits) / elapsed,
+                  percentile(waits, 50) * 1e3, percentile(waits, 99) * 1e3, threading.active_count()))
@@ -0,0 +1,104 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Stress and throughput: multi-pool requests in opposite pool orders.
+
+Half of the workers request (RP1, RP2) and half (RP2, RP1), each with WAIT
+seconds to be served.  Sequential acquisition, getting pool after pool and
+holding what it got while waiting on the next (as Requestor did before),
+is compared with Requestor's all-or-nothing acquisition.
+
+Stress checks: every worker finishes, no request is ever served
+partially, and pools hold all their resources when done.
+'''
+
+import time
+import threading
+from acris import resource_pool as rp
+
+DURATION=2.0
+WORKERS=8
+RESOURCE_LIMIT=1
+WAIT=0.05
+HOLD=0.0005
+
+class AtomicResource1(rp.Resource): pass
+class AtomicResource2(rp.Resource): pass
+
+def sequential(request, wait):
+    acquired=list()
+    for pool, count in request:
+        resources=pool.get(count=count, wait=wait)
+        if not resources:
+            for (held_pool, _), held in zip(request, acquired): held_pool.put(*held)
+            return None
+        acquired.append(resources)
+    return acquired
+
+def sequential_worker(request, stop, stats):
+    while not stop.is_set():
+        acquired=sequential(request, WAIT)
+        if acquired is None:
+            stats['timeouts']+=1
+            continue
+        time.sleep(HOLD)
+        for (pool, _), resources in zip(request, acquired): pool.put(*resources)
+        stats['served']+=1
+
+def atomic_worker(request, stop, stats):
+    while not stop.is_set():
+        requestor=rp.Requestor(request=request, wait=WAIT)
+        resources=requestor.get()
+        if resources is None:
+            stats['timeouts']+=1
+            continue
+        if len(resources) != sum([count for _, count in request]):
+            stats['partial']+=1
+        time.sleep(HOLD)
+        requestor.put(*resources)
+        stats['served']+=1
+
+def run(name, worker, duration=DURATION):
+    pool1=rp.ResourcePool('ATOMIC-1-%s' % name, resource_cls=AtomicResource1,
+                          policy={'resource_limit': RESOURCE_LIMIT}).load(count=RESOURCE_LIMIT)
+    pool2=rp.ResourcePool('ATOMIC-2-%s' % name, resource_cls=AtomicResource2,
+                          policy={'resource_limit': RESOURCE_LIMIT}).load(count=RESOURCE_LIMIT)
+    stop=threading.Event()
+    stats=[{'served': 0, 'timeouts': 0, 'partial': 0} for _ in range(WORKERS)]
+    requests=[[(pool1, 1), (pool2, 1)], [(pool2, 1), (pool1, 1)]]
+    threads=[threading.Thread(target=worker, args=(requests[i % 2], stop, stats[i])) for i in range(WORKERS)]
+    for thread in threads: thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads: thread.join(WAIT * 10 + 1)
+    hung=len([thread for thread in threads if thread.is_alive()])
+    # all resources must be back in pools.
+    intact=len(pool1.get(count=RESOURCE_LIMIT, wait=1)) == RESOURCE_LIMIT \
+           and len(pool2.get(count=RESOURCE_LIMIT, wait=1)) == RESOURCE_LIMIT
+    total=dict([(key, sum([stat[key] for stat in stats])) for key in stats[0]])
+    return total, hung, intact
+
+if __name__ == '__main__':
+    print('%-12s %10s %10s %10s %8s %6s' % ('acquisition', 'served/s', 'timeouts', 'partial', 'hung', 'intact'))
+    for name, worker in [('sequential', sequential_worker), ('atomic', atomic_worker)]:
+        total, hung, intact=run(name, worker)
+        print('%-12s %10.0f %10d %10d %8d %6s' % (name, total['served'] / DURATION, total['timeouts'], total['partial'], hung, intact))
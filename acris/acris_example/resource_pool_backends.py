@@ -0,0 +1,122 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Backend benchmark: one suite of workloads run against every pool storage.
+
+Backends are engine pools with object, capacity and virtual storage (see 
+acris.idioms.pool_storage), SharedResourcePool, and RemotePool of an engine pool served
+in process by ResourcePoolServer over a Unix socket.  Each workload runs 
+for DURATION seconds on a pool of RESOURCE_LIMIT resources:
+    single: one thread gets 1 resource with no wait and puts it back.
+    contended: THREADS threads get 1 resource, waiting, and put it back.
+    batch: THREADS threads get 2 resources, waiting, and put them back.
+Operations (get and put pairs) per second are reported, and max resources 
+held at once, which must never pass RESOURCE_LIMIT.
+'''
+
+import os
+import time
+import tempfile
+import threading
+from acris import resource_pool as rp
+from acris import virtual_resource_pool as vrp
+from acris import shared_resource_pool as srp
+from acris import cluster_resource_pool as crp
+
+DURATION=1.0
+RESOURCE_LIMIT=4
+THREADS=4
+WORKLOADS=[('single', 1, 1, 0), ('contended', THREADS, 1, -1), ('batch', THREADS, 2, -1)]
+
+class BackendResource(rp.Resource): pass
+class VirtualResource(vrp.Resource): pass
+
+def objects(name):
+    pool=rp.ResourcePool('BACKEND-OBJECTS-%s' % name, resource_cls=BackendResource,
+                         policy={'resource_limit': RESOURCE_LIMIT}).load(count=RESOURCE_LIMIT)
+    return pool, lambda: None
+
+def capacity(name):
+    pool=rp.ResourcePool('BACKEND-CAPACITY-%s' % name, resource_cls=BackendResource,
+                         policy={'capacity': RESOURCE_LIMIT})
+    return pool, lambda: None
+
+def virtual(name):
+    pool=vrp.ResourcePool('BACKEND-VIRTUAL-%s' % name, resource_cls=VirtualResource,
+                          policy={'resource_limit': RESOURCE_LIMIT}).load(count=RESOURCE_LIMIT)
+    return pool, lambda: None
+
+def shared(name):
+    pool=srp.SharedResourcePool('BACKEND-SHARED-%s' % name, resource_cls=BackendResource,
+                                policy={'resource_limit': RESOURCE_LIMIT})
+    return pool, pool.close
+
+def remote(name):
+    pool, _=objects('REMOTE-%s' % name)
+    address=os.path.join(tempfile.mkdtemp(), 'pool.sock')
+    server=crp.ResourcePoolServer([pool], address=address).start()
+    client=crp.ResourcePoolClient(address, name='bench')
+    def close():
+        client.close()
+        server.shutdown()
+        os.unlink(address)
+    return client.pool(pool.name), close
+
+BACKENDS=[('objects', objects), ('capacity', capacity), ('virtual', virtual), ('shared', shared), ('remote', remote)]
+
+def worker(pool, count, wait, start, stop_at, held, stats):
+    start.wait()
+    rounds=0
+    while time.monotonic() < stop_at[0]:
+        resources=pool.get(count=count, wait=wait)
+        if not resources: continue
+        with stats['lock']:
+            held[0]+=count
+            stats['max_held']=max(stats['max_held'], held[0])
+        with stats['lock']:
+            held[0]-=count
+        pool.put(*resources)
+        rounds+=1
+    with stats['lock']:
+        stats['rounds']+=rounds
+
+def run(backend, workload, duration=DURATION):
+    name, threads, count, wait=workload
+    pool, close=backend(name)
+    start=threading.Event()
+    stop_at=[0]
+    held=[0]
+    stats={'lock': threading.Lock(), 'rounds': 0, 'max_held': 0}
+    workers=[threading.Thread(target=worker, args=(pool, count, wait, start, stop_at, held, stats)) for _ in range(threads)]
+    for thread in workers: thread.start()
+    stop_at[0]=time.monotonic() + duration
+    start.set()
+    for thread in workers: thread.join()
+    close()
+    return stats['rounds'] / duration, stats['max_held']
+
+if __name__ == '__main__':
+    print('%-10s %-10s %12s %10s %8s' % ('backend', 'workload', 'ops/s', 'max held', 'limit'))
+    for backend_name, backend in BACKENDS:
+        for workload in WORKLOADS:
+            throughput, max_held=run(backend, workload)
+            print('%-10s %-10s %12.0f %10d %8d' % (backend_name, workload[0], throughput, max_held, RESOURCE_LIMIT))
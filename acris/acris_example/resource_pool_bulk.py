@@ -0,0 +1,87 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Bulk benchmark: requests reserved one at a time, and in one pass.
+
+BATCH requests for 1 resource are reserved and then returned, ROUNDS 
+times, by a loop of get and put (ResourcePool), or of reserve and 
+put_requested (Requestors), and by get_many and put, or reserve_many and 
+put_many.  Requests go to one pool, or to two pools at once (Requestors).
+Pools hold BATCH resources (plenty), or BATCH / 2 (scarce; the rest is not
+served).  Requests per second of loop and bulk are reported.
+'''
+
+import time
+from acris import resource_pool as rp
+
+BATCH=1000
+ROUNDS=20
+
+class BulkResource1(rp.Resource): pass
+class BulkResource2(rp.Resource): pass
+
+def make_pools(name, size):
+    pool1=rp.ResourcePool('BULK-1-%s' % name, resource_cls=BulkResource1, policy={'resource_limit': size}).load(count=size)
+    pool2=rp.ResourcePool('BULK-2-%s' % name, resource_cls=BulkResource2, policy={'resource_limit': size}).load(count=size)
+    return pool1, pool2
+
+def pool_loop(pool1, pool2, _):
+    held=[pool1.get(count=1, wait=0) for _ in range(BATCH)]
+    for resources in held:
+        if resources: pool1.put(*resources)
+
+def pool_bulk(pool1, pool2, _):
+    held=pool1.get_many([1] * BATCH)
+    pool1.put(*[resource for resources in held for resource in resources])
+
+def requestors_loop(pool1, pool2, request):
+    requestors=rp.Requestors()
+    request_ids=[requestors.reserve(request, wait=0) for _ in range(BATCH)]
+    for request_id in request_ids:
+        if requestors.get(request_id) is not None: requestors.put_requested(request_id)
+
+def requestors_bulk(pool1, pool2, request):
+    requestors=rp.Requestors()
+    request_ids, reserved=requestors.reserve_many([request] * BATCH, wait=0)
+    fetched=[request_id for i, request_id in enumerate(request_ids) if reserved >> i & 1]
+    for request_id in fetched: requestors.get(request_id)
+    requestors.put_many(fetched)
+
+CASES=[('pool', 1, pool_loop, pool_bulk), 
+       ('requestors', 1, requestors_loop, requestors_bulk), 
+       ('requestors', 2, requestors_loop, requestors_bulk)]
+
+def run(name, method, pools, spread):
+    pool1, pool2=pools
+    request=[(pool1, 1)] if spread == 1 else [(pool1, 1), (pool2, 1)]
+    start=time.perf_counter()
+    for _ in range(ROUNDS): method(pool1, pool2, request)
+    return BATCH * ROUNDS / (time.perf_counter() - start)
+
+if __name__ == '__main__':
+    print('%-11s %6s %8s %12s %12s %7s' % ('target', 'pools', 'supply', 'loop req/s', 'bulk req/s', 'gain'))
+    for supply, size in [('plenty', BATCH), ('scarce', BATCH // 2)]:
+        for target, spread, loop, bulk in CASES:
+            name='%s-%s-%s' % (target, spread, supply)
+            looped=run(name, loop, make_pools(name + '-loop', size), spread)
+            bulked=run(name, bulk, make_pools(name + '-bulk', size), spread)
+            print('%-11s %6d %8s %12.0f %12.0f %6.1fx' % (target, spread, supply, looped, bulked, bulked / looped))
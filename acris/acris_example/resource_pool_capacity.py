@@ -0,0 +1,60 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Memory and throughput: capacity pool vs. pool of unit resources.
+
+A budget of LIMIT units is served in grants of GRANT units, either by a
+pool of LIMIT unit resources (a resource per unit, loaded up front), or by
+a capacity pool.  Memory of the loaded pool, and get+put time of a grant,
+are reported for each LIMIT.
+'''
+
+import time
+import tracemalloc
+from acris import resource_pool as rp
+
+LIMITS=[1000, 100000, 1000000]
+GRANT=100
+ROUNDS=20000
+
+def build(kind, limit):
+    cls=type('Unit_%s_%s' % (kind, limit), (rp.Resource,), {})
+    if kind == 'resources':
+        return rp.ResourcePool('UNITS-%s-%s' % (kind, limit), resource_cls=cls, 
+                               policy={'resource_limit': limit}).load(count=limit)
+    return rp.ResourcePool('UNITS-%s-%s' % (kind, limit), resource_cls=cls, policy={'capacity': limit})
+
+def run(kind, limit, rounds=ROUNDS):
+    tracemalloc.start()
+    pool=build(kind, limit)
+    memory=tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start=time.perf_counter()
+    for _ in range(rounds): pool.put(*pool.get(count=GRANT))
+    return memory, (time.perf_counter() - start) / rounds
+
+if __name__ == '__main__':
+    print('%-10s %10s %12s %16s' % ('pool', 'limit', 'memory KB', 'usec per grant'))
+    for limit in LIMITS:
+        for kind in ['resources', 'capacity']:
+            memory, elapsed=run(kind, limit)
+            print('%-10s %10d %12.1f %16.2f' % (kind, limit, memory / 1024, elapsed * 1e6))
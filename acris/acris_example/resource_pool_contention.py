@@ -0,0 +1,67 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Contention benchmark: aggregate get/put throughput as pools and threads grow.
+
+Each thread works on pool (thread number modulo number of pools) in a
+get/put loop for a fixed period.  With a per-pool lock, threads on
+different pools do not serialize on each other.
+'''
+
+import time
+import threading
+from acris import resource_pool as rp
+
+DURATION=1.0
+POOLS=[1, 2, 4, 8]
+THREADS=[1, 2, 4, 8]
+
+class ContentionResource(rp.Resource): pass
+
+def worker(pool, stop, counts, index):
+    count=0
+    while not stop.is_set():
+        resources=pool.get(count=1, wait=0)
+        pool.put(*resources)
+        count+=1
+    counts[index]=count
+
+def run(num_pools, num_threads, duration=DURATION):
+    pools=[rp.ResourcePool('CONTENTION-%s-%s-%s' % (num_pools, num_threads, i),
+                           resource_cls=ContentionResource, policy={'resource_limit': -1}).load()
+           for i in range(num_pools)]
+    stop=threading.Event()
+    counts=[0] * num_threads
+    threads=[threading.Thread(target=worker, args=(pools[i % num_pools], stop, counts, i))
+             for i in range(num_threads)]
+    for thread in threads: thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads: thread.join()
+    return sum(counts) / duration
+
+if __name__ == '__main__':
+    print('%8s %8s %14s' % ('pools', 'threads', 'get+put/sec'))
+    for num_pools in POOLS:
+        for num_threads in THREADS:
+            if num_threads < num_pools: continue
+            print('%8d %8d %14.0f' % (num_pools, num_threads, run(num_pools, num_threads)))
@@ -0,0 +1,64 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Microbenchmark: get(count=1, wait=0) and put, with and without fast path.
+
+Each of THREADS threads gets a resource with no wait and puts it back,
+ROUNDS times, on a pool with idle resources to spare.  Operations (get and
+put pairs) per second are reported with fast_path policy off and on.
+'''
+
+import time
+import threading
+from acris import resource_pool as rp
+
+ROUNDS=200000
+THREADS=[1, 4]
+RESOURCE_LIMIT=16
+
+class FastResource(rp.Resource): pass
+
+def worker(pool, rounds, start):
+    start.wait()
+    get, put=pool.get, pool.put
+    for _ in range(rounds):
+        resources=get(1, wait=0)
+        if resources: put(*resources)
+
+def run(fast_path, threads):
+    pool=rp.ResourcePool('FAST-%s-%s' % (fast_path, threads), resource_cls=FastResource,
+                         policy={'resource_limit': RESOURCE_LIMIT, 'fast_path': fast_path}).load(count=RESOURCE_LIMIT)
+    rounds=ROUNDS // threads
+    start=threading.Event()
+    workers=[threading.Thread(target=worker, args=(pool, rounds, start)) for _ in range(threads)]
+    for thread in workers: thread.start()
+    begin=time.perf_counter()
+    start.set()
+    for thread in workers: thread.join()
+    return rounds * threads / (time.perf_counter() - begin)
+
+if __name__ == '__main__':
+    print('%8s %14s %14s %8s' % ('threads', 'locked ops/s', 'fast ops/s', 'gain'))
+    for threads in THREADS:
+        locked=run(False, threads)
+        fast=run(True, threads)
+        print('%8d %14.0f %14.0f %7.1fx' % (threads, locked, fast, fast / locked))
@@ -0,0 +1,76 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Ping-pong benchmark: latency of handing a resource from put to get.
+
+Two threads share a pool of one resource.  Each, in turn, gets it 
+(waiting, while the other holds it), and puts it back, which hands it to 
+the other.  Handoff latency, from put to the awaiting get returning, and 
+round trips per second are reported with direct_handoff policy off 
+(resources reserved by ticket, and collected under pool's lock) and on.
+'''
+
+import time
+import threading
+from acris import resource_pool as rp
+
+ROUNDS=20000
+
+class PingPongResource(rp.Resource): pass
+
+def percentile(values, fraction):
+    values=sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+def player(pool, rounds, put_at, latencies, start):
+    start.wait()
+    for _ in range(rounds):
+        resources=pool.get(count=1, wait=-1)
+        latencies.append(time.perf_counter() - put_at[0])
+        put_at[0]=time.perf_counter()
+        pool.put(*resources)
+
+def run(direct_handoff, rounds=ROUNDS):
+    # fast path would let the putting thread take the resource right back.
+    pool=rp.ResourcePool('PINGPONG-%s' % direct_handoff, resource_cls=PingPongResource,
+                         policy={'resource_limit': 1, 'direct_handoff': direct_handoff, 'fast_path': False}).load(count=1)
+    held=pool.get(count=1)
+    put_at=[0.0]
+    latencies=[list(), list()]
+    start=threading.Event()
+    players=[threading.Thread(target=player, args=(pool, rounds, put_at, latencies[i], start)) for i in range(2)]
+    for thread in players: thread.start()
+    start.set()
+    time.sleep(0.1) # let both players await
+    begin=time.perf_counter()
+    put_at[0]=begin
+    pool.put(*held)
+    for thread in players: thread.join()
+    elapsed=time.perf_counter() - begin
+    return latencies[0] + latencies[1], rounds / elapsed
+
+if __name__ == '__main__':
+    print('%-15s %12s %12s %12s %14s' % ('direct_handoff', 'p50 usec', 'p99 usec', 'mean usec', 'round trips/s'))
+    for direct_handoff in [False, True]:
+        latencies, round_trips=run(direct_handoff)
+        print('%-15s %12.1f %12.1f %12.1f %14.0f' % (direct_handoff, percentile(latencies, 0.5) * 1e6, 
+              percentile(latencies, 0.99) * 1e6, sum(latencies) / len(latencies) * 1e6, round_trips))
@@ -0,0 +1,68 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Latency benchmark: cost of health checks per get.
+
+A single thread gets and puts back a resource ROUNDS times, and the
+average get+put time is reported for each health check policy.  ping
+resources take PING seconds to validate, as a round trip to a server
+would; plain resources validate at no cost.  Sweeper policies run on
+loader threads, so they should add little to get.
+'''
+
+import time
+from acris import resource_pool as rp
+
+ROUNDS=20000
+RESOURCE_LIMIT=4
+PING=0.0002
+
+class PlainResource(rp.Resource): pass
+
+class PingResource(rp.Resource):
+    def validate(self):
+        time.sleep(PING)
+        return True
+
+POLICIES=[
+    ('none', PlainResource, {}),
+    ('test_on_borrow', PlainResource, {'test_on_borrow': True}),
+    ('sweeper', PlainResource, {'test_while_idle': True, 'max_idle_time': 60, 'max_lifetime': 600, 'sweep_interval': 0.1}),
+    ('ping on borrow', PingResource, {'test_on_borrow': True}),
+    ('ping every 1s', PingResource, {'test_on_borrow': True, 'validation_interval': 1.0}),
+    ('ping while idle', PingResource, {'test_while_idle': True, 'sweep_interval': 0.1}),
+    ]
+
+def run(name, resource_cls, policy, rounds=ROUNDS):
+    cls=type('%s_%s' % (resource_cls.__name__, name.replace(' ', '_')), (resource_cls,), {})
+    pool=rp.ResourcePool('HEALTH-%s' % name, resource_cls=cls, 
+                         policy=dict({'resource_limit': RESOURCE_LIMIT}, **policy)).load(count=RESOURCE_LIMIT)
+    start=time.perf_counter()
+    for _ in range(rounds): pool.put(*pool.get())
+    elapsed=(time.perf_counter() - start) / rounds
+    return elapsed, pool.metrics['validations'].value
+
+if __name__ == '__main__':
+    print('%-16s %16s %12s' % ('health check', 'usec per get', 'validations'))
+    for name, resource_cls, policy in POLICIES:
+        elapsed, validations=run(name, resource_cls, policy)
+        print('%-16s %16.2f %12d' % (name, elapsed * 1e6, validations))
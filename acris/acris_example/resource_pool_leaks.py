@@ -0,0 +1,78 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Leak detection: cost of recording where resources are gotten, and report.
+
+Leases of a pool are taken and returned by with blocks, ROUNDS times, with
+leak detection off and on (at STACK_DEPTHS frames), and time per lease is
+reported.  Then LEAKED resources are gotten and kept from two places, and
+leaks() report is printed once they are in use longer than LEAK_THRESHOLD.
+'''
+
+import time
+from acris import resource_pool as rp
+
+ROUNDS=200000
+RESOURCE_LIMIT=16
+STACK_DEPTHS=[1, 4, 8, 16]
+LEAK_THRESHOLD=0.2
+LEAKED=3
+
+class LeakResource(rp.Resource): pass
+
+def nested(pool, depth):
+    # gives get a stack of some depth to record.
+    if depth > 0: return nested(pool, depth - 1)
+    for _ in range(ROUNDS):
+        with pool.lease(1):
+            pass
+
+def lease_cost(name, policy):
+    pool=rp.ResourcePool('LEAKS-%s' % name, resource_cls=LeakResource,
+                         policy=dict({'resource_limit': RESOURCE_LIMIT}, **policy)).load(count=RESOURCE_LIMIT)
+    start=time.perf_counter()
+    nested(pool, 16)
+    return (time.perf_counter() - start) / ROUNDS
+
+def cache_get(pool):
+    return pool.get(count=1, wait=0)
+
+def worker_get(pool):
+    return pool.get(count=1, wait=0)
+
+def leak_report():
+    pool=rp.ResourcePool('LEAKS-REPORT', resource_cls=LeakResource,
+                         policy={'resource_limit': RESOURCE_LIMIT, 'leak_threshold': LEAK_THRESHOLD}).load(count=RESOURCE_LIMIT)
+    held=[cache_get(pool) for _ in range(LEAKED)] + [worker_get(pool)]
+    time.sleep(LEAK_THRESHOLD * 2)
+    return pool.leaks()
+
+if __name__ == '__main__':
+    print('%-24s %14s' % ('leak detection', 'usec per lease'))
+    print('%-24s %14.2f' % ('off', lease_cost('off', {}) * 1e6))
+    for depth in STACK_DEPTHS:
+        cost=lease_cost(depth, {'leak_threshold': 60, 'leak_stack_depth': depth})
+        print('%-24s %14.2f' % ('on, %s frames' % depth, cost * 1e6))
+    print()
+    for report in leak_report():
+        print('%s resources, oldest %.2fs, gotten at:' % (report.count, report.oldest))
+        for line in report.stack: print('    %s' % line)
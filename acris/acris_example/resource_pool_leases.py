@@ -0,0 +1,67 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Lease benchmark: cost of expire on get, with many outstanding leases.
+
+All leases are served by the single TimerWheel thread; thread count stays
+the same no matter how many leases are outstanding.
+'''
+
+import time
+import logging
+import threading
+from acris import resource_pool as rp
+
+LEASES=100000
+SHORT_EXPIRE=0.5
+
+class LeasedResource(rp.Resource): pass
+
+def take(pool, count, expire):
+    start=time.perf_counter()
+    resources=[pool.get(count=1, wait=0, expire=expire)[0] for _ in range(count)]
+    return resources, (time.perf_counter() - start) / count
+
+def give(pool, resources):
+    start=time.perf_counter()
+    for resource in resources: pool.put(resource)
+    return (time.perf_counter() - start) / len(resources)
+
+if __name__ == '__main__':
+    # one warning per reclaimed lease would dominate the measure.
+    logging.getLogger(rp.__name__).setLevel(logging.ERROR)
+    pool=rp.ResourcePool('LEASES', resource_cls=LeasedResource,
+                         policy={'resource_limit': LEASES}).load(count=LEASES)
+
+    print('%-28s %12s %12s %8s' % ('scenario', 'usec get', 'usec put', 'threads'))
+    for name, expire in [('no expire', None), ('expire 60s', 60.0)]:
+        resources, get_latency=take(pool, LEASES, expire)
+        threads=threading.active_count()
+        put_latency=give(pool, resources)
+        print('%-28s %12.2f %12.2f %8d' % ('%s, %d leases' % (name, LEASES), get_latency * 1e6, put_latency * 1e6, threads))
+
+    # leases are not returned; wheel reclaims them.
+    resources, get_latency=take(pool, LEASES, SHORT_EXPIRE)
+    start=time.perf_counter()
+    while pool.get(count=LEASES, wait=0) == []:
+        time.sleep(0.01)
+    print('%d leases of %ss reclaimed after %.3f seconds (threads: %d)' % (LEASES, SHORT_EXPIRE, time.perf_counter() - start, threading.active_count()))
@@ -0,0 +1,52 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Microbenchmark: get/put round-trip latency with lock tracing on and off.
+'''
+
+import time
+import logging
+from acris import resource_pool as rp
+
+ROUNDS=20000
+
+class TracedResource(rp.Resource): pass
+
+def round_trip(pool, rounds=ROUNDS):
+    start=time.perf_counter()
+    for _ in range(rounds):
+        resources=pool.get(count=1, wait=0)
+        pool.put(*resources)
+    return (time.perf_counter() - start) / rounds
+
+if __name__ == '__main__':
+    # tracing records are created and dropped; this measures the capture cost.
+    rp.lock_logger.addHandler(logging.NullHandler())
+    rp.lock_logger.propagate=False
+    # fast path skips the lock for get with no wait, and put; tracing is
+    # measured on the locked path.
+    pool=rp.ResourcePool('LOCK-TRACING', resource_cls=TracedResource, policy={'fast_path': False}).load()
+
+    for trace in [False, True, False]:
+        rp.set_lock_tracing(trace)
+        latency=round_trip(pool)
+        print('lock tracing %-5s: %8.2f usec per get+put' % (trace, latency * 1e6))
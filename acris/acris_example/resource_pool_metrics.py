@@ -0,0 +1,93 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Metrics example and cost: pool metrics under a contended workload.
+
+WORKERS threads get a resource, hold it for HOLD seconds, and put it back,
+on a pool of RESOURCE_LIMIT resources, for DURATION seconds.  The pool's
+metrics snapshot is printed, followed by the cost of taking a snapshot and
+of a Prometheus export, and the cost of get+put with no contention.
+'''
+
+import time
+import threading
+from acris import resource_pool as rp
+from acris import pool_metrics
+
+DURATION=2.0
+WORKERS=8
+RESOURCE_LIMIT=4
+HOLD=0.0005
+ROUNDS=100000
+EXPORTS=1000
+
+class MetricsResource(rp.Resource): pass
+class FastResource(rp.Resource): pass
+
+def worker(pool, stop):
+    while not stop.is_set():
+        resources=pool.get(count=1, wait=-1)
+        time.sleep(HOLD)
+        pool.put(*resources)
+
+def contended(duration=DURATION):
+    pool=rp.ResourcePool('METRICS', resource_cls=MetricsResource,
+                         policy={'resource_limit': RESOURCE_LIMIT})
+    stop=threading.Event()
+    threads=[threading.Thread(target=worker, args=(pool, stop)) for _ in range(WORKERS)]
+    for thread in threads: thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads: thread.join()
+    return pool
+
+def export_cost(pool, exports=EXPORTS):
+    start=time.perf_counter()
+    for _ in range(exports): pool.metrics.snapshot()
+    snapshot=(time.perf_counter() - start) / exports
+    start=time.perf_counter()
+    for _ in range(exports): pool_metrics.prometheus_text(pool)
+    prometheus=(time.perf_counter() - start) / exports
+    return snapshot, prometheus
+
+def get_put_cost(rounds=ROUNDS):
+    pool=rp.ResourcePool('METRICS-FAST', resource_cls=FastResource,
+                         policy={'resource_limit': 1}).load(count=1)
+    start=time.perf_counter()
+    for _ in range(rounds): pool.put(*pool.get())
+    return (time.perf_counter() - start) / rounds
+
+if __name__ == '__main__':
+    pool=contended()
+    print('%-24s %12s' % ('metric', 'value'))
+    for name, value in pool.metrics.snapshot().items():
+        if isinstance(value, dict):
+            for key in ['count', 'p50', 'p99', 'max']:
+                print('%-24s %12.6g' % ('%s.%s' % (name, key), value[key]))
+        else:
+            print('%-24s %12s' % (name, value))
+    snapshot, prometheus=export_cost(pool)
+    print()
+    print('%-24s %12s' % ('operation', 'usec'))
+    print('%-24s %12.1f' % ('snapshot', snapshot * 1e6))
+    print('%-24s %12.1f' % ('prometheus export', prometheus * 1e6))
+    print('%-24s %12.2f' % ('get+put', get_put_cost() * 1e6))
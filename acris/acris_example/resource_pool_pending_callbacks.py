@@ -0,0 +1,75 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Footprint benchmark: threads and memory held by pending callback requests.
+
+All resources are taken, then PENDING callback requests are queued on the
+pool.  Thread count and resident memory are sampled while they are
+pending, and the time to call them all back once resources are returned.
+'''
+
+import time
+import threading
+import resource
+from acris import resource_pool as rp
+
+PENDING=10000
+
+class PendingResource(rp.Resource): pass
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'): return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+if __name__ == '__main__':
+    pool=rp.ResourcePool('PENDING', resource_cls=PendingResource,
+                         policy={'resource_limit': PENDING}).load(count=PENDING)
+    taken=pool.get(count=PENDING, wait=0)
+
+    called=list()
+    done=threading.Event()
+    def callback(ticket):
+        called.append(ticket)
+        if len(called) == PENDING: done.set()
+
+    threads_before, rss_before=threading.active_count(), rss_kb()
+    start=time.perf_counter()
+    tickets=[pool.get(count=1, wait=-1, callback=callback) for _ in range(PENDING)]
+    queue_time=time.perf_counter() - start
+    threads_pending, rss_pending=threading.active_count(), rss_kb()
+
+    start=time.perf_counter()
+    for resource_ in taken: pool.put(resource_)
+    done.wait()
+    callback_time=time.perf_counter() - start
+    collected=sum([len(pool.get(ticket=ticket)) for ticket in called])
+
+    print('pending requests:      %d' % PENDING)
+    print('threads:               %d before, %d while pending' % (threads_before, threads_pending))
+    print('RSS:                   %d KB before, %d KB while pending (+%d KB)' % (rss_before, rss_pending, rss_pending - rss_before))
+    print('queue requests:        %.3f seconds' % queue_time)
+    print('put and call back all: %.3f seconds (%d resources collected)' % (callback_time, collected))
@@ -0,0 +1,83 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Latency benchmark: high priority requests under saturating low priority load.
+
+LOW_WORKERS workers keep a pool of RESOURCE_LIMIT resources saturated with
+priority 0 requests, holding each resource for HOLD seconds.  Every
+HIGH_INTERVAL seconds, a priority HIGH_PRIORITY request is made.  Wait of
+high priority requests is compared between fifo and priority schedulers;
+max wait of low priority requests shows they are not starved.
+'''
+
+import time
+import threading
+from acris import resource_pool as rp
+
+DURATION=3.0
+RESOURCE_LIMIT=4
+LOW_WORKERS=16
+HOLD=0.002
+HIGH_INTERVAL=0.01
+HIGH_PRIORITY=10
+
+class PriorityResource(rp.Resource): pass
+
+def percentile(values, fraction):
+    values=sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+def low_worker(pool, stop, waits):
+    while not stop.is_set():
+        start=time.perf_counter()
+        resources=pool.get(count=1, wait=-1)
+        waits.append(time.perf_counter() - start)
+        time.sleep(HOLD)
+        pool.put(*resources)
+
+def high_worker(pool, stop, waits):
+    while not stop.wait(HIGH_INTERVAL):
+        start=time.perf_counter()
+        resources=pool.get(count=1, wait=-1, priority=HIGH_PRIORITY)
+        waits.append(time.perf_counter() - start)
+        pool.put(*resources)
+
+def run(scheduler, duration=DURATION):
+    pool=rp.ResourcePool('PRIORITY-%s' % scheduler, resource_cls=PriorityResource,
+                         policy={'resource_limit': RESOURCE_LIMIT, 'waiter_scheduler': scheduler}).load(count=RESOURCE_LIMIT)
+    stop=threading.Event()
+    low_waits, high_waits=list(), list()
+    threads=[threading.Thread(target=low_worker, args=(pool, stop, low_waits)) for _ in range(LOW_WORKERS)]
+    threads.append(threading.Thread(target=high_worker, args=(pool, stop, high_waits)))
+    for thread in threads: thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads: thread.join()
+    return low_waits, high_waits
+
+if __name__ == '__main__':
+    print('%-10s %8s %12s %12s %10s %14s' % ('scheduler', 'high', 'high p50 ms', 'high p99 ms', 'low/s', 'low max ms'))
+    for scheduler in ['fifo', 'priority']:
+        low_waits, high_waits=run(scheduler)
+        print('%-10s %8d %12.2f %12.2f %10.0f %14.2f' % (scheduler, len(high_waits),
+              percentile(high_waits, 0.5) * 1e3, percentile(high_waits, 0.99) * 1e3,
+              len(low_waits) / DURATION, max(low_waits) * 1e3))
@@ -0,0 +1,95 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Latency benchmark: inline loading vs. background replenishment.
+
+Resources take ACTIVATE seconds to activate, as would a DB connection or
+an SSH session.  WORKERS threads get a resource, hold it for HOLD seconds,
+and put it back, for DURATION seconds, on a pool of up to RESOURCE_LIMIT
+resources.  Bursts of demand and max_idle make the pool create resources
+throughout the run.
+
+    inline: resources are created by get, with pool's lock held.
+    background: one loader thread creates resources outside of the lock.
+    parallel: LOAD_WORKERS loader threads.
+    prewarmed: parallel, with MIN_IDLE resources prewarmed and kept.
+
+Caller's get latency percentiles and throughput are reported.
+'''
+
+import time
+import threading
+from acris import resource_pool as rp
+
+DURATION=2.0
+WORKERS=8
+RESOURCE_LIMIT=8
+ACTIVATE=0.02
+HOLD=0.002
+PAUSE=0.01 # idle time between bursts of a worker
+BURST=5
+MAX_IDLE=2
+LOAD_WORKERS=4
+MIN_IDLE=4
+
+class SlowResource(rp.Resource):
+    def activate(self):
+        time.sleep(ACTIVATE)
+        super().activate()
+
+def worker(pool, stop, latencies):
+    while not stop.is_set():
+        for _ in range(BURST):
+            start=time.perf_counter()
+            resources=pool.get(count=1, wait=-1)
+            latencies.append(time.perf_counter() - start)
+            time.sleep(HOLD)
+            pool.put(*resources)
+        time.sleep(PAUSE)
+
+def percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+def run(name, policy, prewarm=False, duration=DURATION):
+    policy=dict({'resource_limit': RESOURCE_LIMIT, 'activate_on_load': True, 'max_idle': MAX_IDLE}, **policy)
+    cls=type('SlowResource_%s' % name, (SlowResource,), {})
+    pool=rp.ResourcePool('REPLENISH-%s' % name, resource_cls=cls, policy=policy)
+    if prewarm: pool.prewarm()
+    stop=threading.Event()
+    latencies=[list() for _ in range(WORKERS)]
+    threads=[threading.Thread(target=worker, args=(pool, stop, latencies[i])) for i in range(WORKERS)]
+    for thread in threads: thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads: thread.join()
+    values=sorted([value for worker_latencies in latencies for value in worker_latencies])
+    return len(values) / duration, percentile(values, 50), percentile(values, 99), values[-1], pool.metrics['loaded'].value
+
+if __name__ == '__main__':
+    modes=[('inline', {}, False),
+           ('background', {'background_load': True}, False),
+           ('parallel', {'background_load': True, 'load_workers': LOAD_WORKERS}, False),
+           ('prewarmed', {'min_idle': MIN_IDLE, 'max_idle': MIN_IDLE, 'load_workers': LOAD_WORKERS}, True), ]
+    print('%-12s %10s %10s %10s %10s %8s' % ('loading', 'gets/s', 'p50 ms', 'p99 ms', 'max ms', 'loaded'))
+    for name, policy, prewarm in modes:
+        throughput, p50, p99, worst, loaded=run(name, policy, prewarm)
+        print('%-12s %10.0f %10.2f %10.2f %10.2f %8d' % (name, throughput, p50 * 1e3, p99 * 1e3, worst * 1e3, loaded))
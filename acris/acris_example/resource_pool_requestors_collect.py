@@ -0,0 +1,69 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Collector benchmark: cost of Requestors events as requests accumulate.
+
+REQUESTS callback requests go through one Requestors, PENDING at a time
+awaiting resources of a pool with RESOURCE_LIMIT resources.  Each is
+called back, fetched and returned, which serves the next.  Time per
+request is reported for every REPORT requests; it should stay flat as the
+total number of requests made grows.
+'''
+
+import sys
+import time
+import queue
+from acris import resource_pool as rp
+
+REQUESTS=1000000
+REPORT=100000
+PENDING=1000
+RESOURCE_LIMIT=16
+WAIT=60
+
+class CollectResource(rp.Resource): pass
+
+def run(requests=REQUESTS, report=REPORT):
+    pool=rp.ResourcePool('COLLECT', resource_cls=CollectResource,
+                         policy={'resource_limit': RESOURCE_LIMIT}).load(count=RESOURCE_LIMIT)
+    requestors=rp.Requestors()
+    reserved=queue.Queue()
+    made=done=0
+    start=time.perf_counter()
+    while done < requests:
+        while made < requests and made - done < PENDING:
+            requestors.reserve(request=[(pool, 1)], wait=WAIT, callback=reserved.put)
+            made+=1
+        request_id=reserved.get()
+        resources=requestors.get(request_id)
+        requestors.put(*resources)
+        done+=1
+        if done % report == 0:
+            now=time.perf_counter()
+            yield done, (now - start) / report
+            start=now
+
+if __name__ == '__main__':
+    requests=int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS
+    print('%12s %18s' % ('requests', 'usec per request'))
+    for done, latency in run(requests, min(REPORT, requests // 10)):
+        print('%12d %18.2f' % (done, latency * 1e6))
@@ -0,0 +1,66 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Memory benchmark: Requestors over many request cycles.
+
+CYCLES requests go through one Requestors, each reserved, fetched and
+returned with put_requested.  Every REPORT cycles, process RSS, the number
+of requests Requestors still tracks and time per cycle are reported.  Both
+RSS and tracked requests should stay flat, as returned requests are
+evicted.
+'''
+
+import sys
+import time
+import resource
+from acris import resource_pool as rp
+
+CYCLES=10000000
+REPORT=1000000
+RESOURCE_LIMIT=4
+
+class MemoryResource(rp.Resource): pass
+
+def rss_mb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / 2**20
+
+def run(cycles=CYCLES, report=REPORT):
+    pool=rp.ResourcePool('MEMORY', resource_cls=MemoryResource,
+                         policy={'resource_limit': RESOURCE_LIMIT}).load(count=RESOURCE_LIMIT)
+    requestors=rp.Requestors()
+    start=time.perf_counter()
+    for cycle in range(1, cycles + 1):
+        request_id=requestors.reserve(request=[(pool, 1)], wait=0)
+        requestors.get(request_id)
+        requestors.put_requested(request_id)
+        if cycle % report == 0:
+            now=time.perf_counter()
+            tracked=len(requestors._Requestors__requests)
+            yield cycle, rss_mb(), tracked, (now - start) / report
+            start=now
+
+if __name__ == '__main__':
+    cycles=int(sys.argv[1]) if len(sys.argv) > 1 else CYCLES
+    print('%12s %10s %10s %16s' % ('cycles', 'rss MB', 'tracked', 'usec per cycle'))
+    for cycle, rss, tracked, latency in run(cycles, min(REPORT, cycles // 10)):
+        print('%12d %10.1f %10d %16.2f' % (cycle, rss, tracked, latency * 1e6))
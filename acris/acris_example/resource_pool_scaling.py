@@ -0,0 +1,52 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Scaling benchmark: get/put cost as the number of pooled resources grows.
+
+Cost of get and put should depend on the number of resources requested,
+not on the number of resources held by the pool.
+'''
+
+import time
+from acris import resource_pool as rp
+
+POOL_SIZES=[10, 100, 1000, 10000, 100000, 1000000]
+COUNTS=[1, 10]
+ROUNDS=2000
+
+class ScalingResource(rp.Resource): pass
+
+def round_trip(pool, count, rounds=ROUNDS):
+    start=time.perf_counter()
+    for _ in range(rounds):
+        resources=pool.get(count=count, wait=0)
+        pool.put(*resources)
+    return (time.perf_counter() - start) / rounds
+
+if __name__ == '__main__':
+    print('%10s %6s %16s' % ('pool size', 'count', 'usec get+put'))
+    for size in POOL_SIZES:
+        pool=rp.ResourcePool('SCALING-%s' % size, resource_cls=ScalingResource,
+                             policy={'resource_limit': size}).load(count=size)
+        for count in COUNTS:
+            if count > size: continue
+            print('%10d %6d %16.2f' % (size, count, round_trip(pool, count) * 1e6))
@@ -0,0 +1,89 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Load generator: wait time percentiles per waiter scheduler policy.
+
+Workers request a mix of resource counts through Requestor, hold them for
+a random period, and return them.  Wait time is measured from request
+until all resources are reserved.
+'''
+
+import time
+import random
+import threading
+from acris import resource_pool as rp
+
+DURATION=2.0
+WORKERS=16
+RESOURCE_LIMIT=8
+COUNT_MIX=[(1, 0.6), (2, 0.25), (4, 0.15)]
+MEAN_HOLD=0.002
+SCHEDULERS=['fifo', 'first_fit', 'smallest_first', 'aging']
+
+class LoadResource(rp.Resource): pass
+
+def choose_count(rand):
+    point=rand.random()
+    for count, weight in COUNT_MIX:
+        point-=weight
+        if point <= 0: break
+    return count
+
+def worker(pool, stop, waits, seed):
+    rand=random.Random(seed)
+    while not stop.is_set():
+        count=choose_count(rand)
+        start=time.perf_counter()
+        requestor=rp.Requestor(request=[(pool, count)], wait=-1)
+        resources=requestor.get()
+        waits.append((count, time.perf_counter() - start))
+        time.sleep(rand.expovariate(1.0 / MEAN_HOLD))
+        requestor.put(*resources)
+
+def percentile(values, pct):
+    if not values: return float('nan')
+    values=sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+def run(scheduler, duration=DURATION):
+    pool=rp.ResourcePool('SCHEDULER-%s' % scheduler, resource_cls=LoadResource,
+                         policy={'resource_limit': RESOURCE_LIMIT, 'waiter_scheduler': scheduler,
+                                 'waiter_max_age': 0.02}).load(count=RESOURCE_LIMIT)
+    stop=threading.Event()
+    waits=list()
+    threads=[threading.Thread(target=worker, args=(pool, stop, waits, i)) for i in range(WORKERS)]
+    for thread in threads: thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads: thread.join()
+    return waits
+
+if __name__ == '__main__':
+    print('%-15s %6s %9s %9s %9s %9s %9s' % ('scheduler', 'count', 'requests', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'))
+    for scheduler in SCHEDULERS:
+        waits=run(scheduler)
+        groups=[('all', [wait for _, wait in waits])]
+        groups+=[(count, [wait for c, wait in waits if c == count]) for count, _ in COUNT_MIX]
+        for count, values in groups:
+            print('%-15s %6s %9d %9.2f %9.2f %9.2f %9.2f' % (scheduler, count, len(values),
+                  percentile(values, 50) * 1e3, percentile(values, 90) * 1e3,
+                  percentile(values, 99) * 1e3, max(values) * 1e3 if values else float('nan')))
@@ -0,0 +1,76 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    Acrisel LTD
+#    Copyright (C) 2008- Acrisel (acrisel.com) . All Rights Reserved
+#
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+##############################################################################
+
+''' Throughput benchmark: SharedResourcePool used by N processes.
+
+Each process gets a resource, holds it for HOLD seconds, and puts it back,
+in a loop for DURATION seconds.  The number of resources held at once,
+across all processes, is tracked to show resource_limit is enforced
+globally.
+'''
+
+import time
+import multiprocessing as mp
+from acris import resource_pool as rp
+from acris import shared_resource_pool as srp
+
+DURATION=2.0
+RESOURCE_LIMIT=4
+HOLD=0.001
+PROCESSES=[1, 2, 4, 8, 16]
+
+class SharedResource(rp.Resource): pass
+
+def worker(pool, start, duration, held, max_held, rounds):
+    start.wait()
+    count=0
+    stop_at=time.monotonic() + duration
+    while time.monotonic() < stop_at:
+        resources=pool.get(count=1, wait=-1)
+        with held.get_lock():
+            held.value+=1
+            if held.value > max_held.value: max_held.value=held.value
+        time.sleep(HOLD)
+        with held.get_lock():
+            held.value-=1
+        pool.put(*resources)
+        count+=1
+    with rounds.get_lock():
+        rounds.value+=count
+
+def run(processes, duration=DURATION):
+    pool=srp.SharedResourcePool('SHARED-%s' % processes, resource_cls=SharedResource,
+                            policy={'resource_limit': RESOURCE_LIMIT})
+    start=mp.Event()
+    held, max_held, rounds=mp.Value('i', 0), mp.Value('i', 0), mp.Value('q', 0)
+    workers=[mp.Process(target=worker, args=(pool, start, duration, held, max_held, rounds)) for _ in range(processes)]
+    for process in workers: process.start()
+    start.set()
+    for process in workers: process.join()
+    pool.close()
+    return rounds.value / duration, max_held.value
+
+if __name__ == '__main__':
+    print('%10s %14s %10s %8s' % ('processes', 'get+put/sec', 'max held', 'limit'))
+    for processes in PROCESSES:
+        throughput, max_held=run(processes)
+        print('%10d %14.0f %10d %8d' % (processes, throughput, max_held, RESOURCE_LIMIT))
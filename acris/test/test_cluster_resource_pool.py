@@ -0,0 +1,33 @@
+import unittest
+
+from acris.idioms.resource_pool import ResourcePool, ResourcePoolError, Resource
+from acris.idioms.cluster_resource_pool import ResourcePoolServer, ResourcePoolClient
+
+
+class MyResource(Resource):
+    pass
+
+
+class TestClusterPut(unittest.TestCase):
+
+    def setUp(self):
+        self.pool=ResourcePool(self.id(), resource_cls=MyResource, policy={'resource_limit': 2})
+        self.server=ResourcePoolServer([self.pool]).start()
+        self.addCleanup(self.server.shutdown)
+        self.client=ResourcePoolClient(self.server.address, keepalive=None, timeout=5.0)
+        self.addCleanup(self.client.close)
+        self.remote=self.client.pool(self.pool.name)
+
+    def test_put_of_resource_listed_twice_returns_nothing(self):
+        first, second=self.remote.get(count=2, wait=0)
+        with self.assertRaises(ResourcePoolError):
+            self.remote.put(first, second, first).result(5)
+        self.assertEqual(self.pool.metrics.snapshot()['inuse'], 2)
+
+        # resources are still held by client, and may be returned.
+        self.remote.put(first, second).result(5)
+        self.assertEqual(self.pool.metrics.snapshot()['available'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+from acris.idioms.resource_pool import ResourcePool, ResourcePoolError, Resource
+from acris.idioms.pool_storage import PoolStorageError, ObjectStorage, CapacityStorage, VirtualStorage, create_pool_storage
+
+
+class MyResource(Resource):
+    pass
+
+
+class CountingStorage(ObjectStorage):
+    instances=list()
+
+    def __init__(self, policy, resource_cls, name):
+        super().__init__(policy, resource_cls, name)
+        self.taken=self.restored=0
+        CountingStorage.instances.append(self)
+
+    def take(self, count):
+        self.taken+=count
+        return super().take(count)
+
+    def restore(self, resources, inuse_resources):
+        self.restored+=len(resources)
+        super().restore(resources, inuse_resources)
+
+
+class TestCreatePoolStorage(unittest.TestCase):
+
+    def test_storage_by_policy(self):
+        self.assertIsInstance(create_pool_storage({}, MyResource, 'objects'), ObjectStorage)
+        self.assertIsInstance(create_pool_storage({'virtual': True}, MyResource, 'virtual'), VirtualStorage)
+        self.assertIsInstance(create_pool_storage({'capacity': 10}, MyResource, 'capacity'), CapacityStorage)
+        self.assertIsInstance(create_pool_storage({'storage': 'virtual'}, MyResource, 'virtual'), VirtualStorage)
+
+    def test_inconsistent_storage_policy_is_rejected(self):
+        with self.assertRaises(PoolStorageError):
+            create_pool_storage({'virtual': True, 'capacity': 10}, MyResource, 'both')
+        with self.assertRaises(PoolStorageError):
+            create_pool_storage({'storage': 'unknown'}, MyResource, 'unknown')
+        with self.assertRaises(PoolStorageError):
+            create_pool_storage({'storage': 'capacity'}, MyResource, 'capacity')
+
+
+class TestPluggedStorage(unittest.TestCase):
+
+    def test_pool_serves_from_storage_subclass(self):
+        pool=ResourcePool(self.id(), resource_cls=MyResource,
+                          policy={'storage': CountingStorage, 'resource_limit': 2, 'fast_path': False})
+        storage=CountingStorage.instances[-1]
+        resources=pool.get(count=2, wait=0)
+        self.assertEqual(len(resources), 2)
+        self.assertEqual(storage.taken, 2)
+        pool.put(*resources)
+        self.assertEqual(storage.restored, 2)
+        self.assertEqual(storage.free(), 2)
+
+
+class TestCapacityStorage(unittest.TestCase):
+
+    def test_units_are_handed_as_allocations(self):
+        pool=ResourcePool(self.id(), resource_cls=MyResource, policy={'capacity': 10})
+        first=pool.get(count=6, wait=0)
+        self.assertEqual([allocation.units for allocation in first], [6])
+        self.assertEqual(pool.get(count=5, wait=0), [])
+        second=pool.get(count=4, wait=0)
+        self.assertEqual(pool.metrics.snapshot()['available'], 0)
+        pool.put(*first)
+        pool.put(*second)
+        self.assertEqual(pool.metrics.snapshot()['available'], 10)
+        with self.assertRaises(ResourcePoolError):
+            pool.get(count=11, wait=0)
+
+
+class TestVirtualStorage(unittest.TestCase):
+
+    def test_put_returns_resources_by_quantity(self):
+        pool=ResourcePool(self.id(), resource_cls=MyResource, policy={'virtual': True, 'resource_limit': 2})
+        held=pool.get(count=2, wait=0)
+        # any resource of pool's class stands for one held.
+        pool.put(MyResource())
+        self.assertEqual(pool.metrics.snapshot()['inuse'], 1)
+        with self.assertRaises(ResourcePoolError):
+            pool.put(MyResource(), MyResource())
+        pool.put(held[0])
+        self.assertEqual(pool.metrics.snapshot()['inuse'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
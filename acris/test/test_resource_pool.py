@@ -0,0 +1,373 @@
+import sys
+import threading
+import time
+import unittest
+
+from acris.idioms.resource_pool import ResourcePool, ResourcePoolError, Resource, Requestors, AtomicRequest
+
+
+class MyResource(Resource):
+    pass
+
+
+def run_with_timeout(test, function, timeout=5.0):
+    ''' runs function in a thread, and fails test if it does not return
+    within timeout.
+    '''
+    result=list()
+    thread=threading.Thread(target=lambda: result.append(function()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    test.assertFalse(thread.is_alive(), "%s did not return within %s seconds" % (function, timeout))
+    return result[0]
+
+
+def wait_until(predicate, timeout=5.0):
+    ''' polls predicate until it is true, or timeout passes.
+
+    Returns:
+        last value of predicate.
+    '''
+    deadline=time.monotonic() + timeout
+    result=predicate()
+    while not result and time.monotonic() < deadline:
+        time.sleep(0.01)
+        result=predicate()
+    return result
+
+
+def metric(pool, name):
+    return pool.metrics.snapshot()[name]
+
+
+class TestAtomic(unittest.TestCase):
+
+    def setUp(self):
+        self.pool1=ResourcePool(self.id() + '.1', resource_cls=MyResource, policy={'resource_limit': 2})
+        self.pool2=ResourcePool(self.id() + '.2', resource_cls=MyResource, policy={'resource_limit': 1})
+
+    def test_get_atomic_serves_all_or_nothing(self):
+        held=self.pool2.get(wait=0)
+        self.assertIsNone(ResourcePool.get_atomic([(self.pool1, 1), (self.pool2, 1)]))
+        self.assertEqual(metric(self.pool1, 'inuse'), 0)
+
+        self.pool2.put(*held)
+        resources=ResourcePool.get_atomic([(self.pool1, 2), (self.pool2, 1)])
+        self.assertEqual([len(pool_resources) for pool_resources in resources], [2, 1])
+        self.assertEqual(metric(self.pool1, 'inuse'), 2)
+        self.pool1.put(*resources[0])
+        self.pool2.put(*resources[1])
+
+    def test_get_atomic_with_pool_listed_twice(self):
+        # pool1 has 2 resources; 2 and 1 of it cannot be served together.
+        self.assertIsNone(ResourcePool.get_atomic([(self.pool1, 2), (self.pool2, 1), (self.pool1, 1)]))
+        self.assertEqual(metric(self.pool1, 'inuse'), 0)
+        self.assertEqual(metric(self.pool2, 'inuse'), 0)
+
+        resources=ResourcePool.get_atomic([(self.pool1, 1), (self.pool2, 1), (self.pool1, 1)])
+        self.assertEqual([len(pool_resources) for pool_resources in resources], [1, 1, 1])
+        self.assertIsNot(resources[0][0], resources[2][0])
+        self.pool1.put(*(resources[0] + resources[2]))
+        self.pool2.put(*resources[1])
+
+    def test_get_atomic_many_serves_requests_in_order(self):
+        results=ResourcePool.get_atomic_many([[(self.pool1, 1), (self.pool2, 1)],
+                                              [(self.pool1, 1), (self.pool2, 1)],
+                                              [(self.pool1, 1)]])
+        self.assertIsNotNone(results[0])
+        self.assertIsNone(results[1])
+        self.assertEqual(len(results[2][0]), 1)
+        self.assertEqual(metric(self.pool1, 'inuse'), 2)
+        self.pool1.put(*(results[0][0] + results[2][0]))
+        self.pool2.put(*results[0][1])
+
+    def test_atomic_request_holds_nothing_while_waiting(self):
+        held=self.pool2.get(wait=0)
+        request=AtomicRequest([(self.pool1, 1), (self.pool2, 1)], wait=5)
+        self.assertFalse(request.done())
+        self.assertEqual(metric(self.pool1, 'inuse'), 0)
+
+        self.pool2.put(*held)
+        resources=request.result(5)
+        self.assertEqual([len(pool_resources) for pool_resources in resources], [1, 1])
+        self.pool1.put(*resources[0])
+        self.pool2.put(*resources[1])
+
+    def test_atomic_request_times_out(self):
+        held=self.pool2.get(wait=0)
+        request=AtomicRequest([(self.pool1, 1), (self.pool2, 1)], wait=0.1)
+        self.assertIsNone(request.result(5))
+        self.assertTrue(request.done())
+        self.assertEqual(metric(self.pool1, 'inuse'), 0)
+        self.pool2.put(*held)
+
+
+class TestExpire(unittest.TestCase):
+
+    def setUp(self):
+        self.pool=ResourcePool(self.id(), resource_cls=MyResource, policy={'resource_limit': 1})
+
+    def test_expired_lease_is_reclaimed_and_not_handed_again(self):
+        resources=self.pool.get(wait=0, expire=0.1)
+        self.assertTrue(wait_until(lambda: metric(self.pool, 'leases_expired') == 1))
+        self.assertTrue(resources[0].reclaimed)
+
+        # pool loads another resource in place of the reclaimed one.
+        other=self.pool.get(wait=5)
+        self.assertEqual(len(other), 1)
+        self.assertIsNot(other[0], resources[0])
+        # holder's late put is ignored.
+        self.pool.put(*resources)
+        self.assertEqual(metric(self.pool, 'inuse'), 1)
+        self.pool.put(*other)
+        self.assertEqual(metric(self.pool, 'available'), 1)
+
+    def test_reservation_not_collected_within_hold_time_returns_to_pool(self):
+        held=self.pool.get(wait=0)
+        tickets=list()
+        self.assertIsNone(self.pool.get(wait=-1, callback=tickets.append, hold_time=0.1))
+        self.pool.put(*held)
+        self.assertTrue(wait_until(lambda: tickets))
+        self.assertTrue(wait_until(lambda: metric(self.pool, 'reservations_expired') == 1))
+        self.assertFalse(self.pool.get(ticket=tickets[0]))
+        self.assertEqual(len(self.pool.get(wait=0)), 1)
+
+    def test_requestors_request_expires_when_wait_passes(self):
+        requestors=Requestors()
+        held=self.pool.get(wait=0)
+        request_id=requestors.reserve([(self.pool, 1)], wait=0.1, callback=lambda request_id: None)
+        self.assertTrue(wait_until(lambda: requestors.state(request_id) == Requestors.CLOSED))
+        self.assertEqual(requestors.metrics.snapshot()['expired'], 1)
+
+        self.pool.put(*held)
+        self.assertTrue(wait_until(lambda: metric(self.pool, 'available') == 1))
+        self.assertEqual(metric(self.pool, 'reserved'), 0)
+
+
+class TestDirectHandoff(unittest.TestCase):
+
+    def get_while_put(self, pool):
+        ''' gets resource in a thread awaiting in get, and puts it back.
+        '''
+        held=pool.get(wait=0)
+        received=list()
+        getter=threading.Thread(target=lambda: received.append(pool.get(wait=5)), daemon=True)
+        getter.start()
+        self.assertTrue(wait_until(lambda: metric(pool, 'awaiting') == 1))
+        pool.put(*held)
+        getter.join(5)
+        self.assertFalse(getter.is_alive())
+        self.assertEqual(received, [held])
+        pool.put(*held)
+
+    def test_put_hands_resource_to_awaiting_thread(self):
+        pool=ResourcePool(self.id(), resource_cls=MyResource, policy={'resource_limit': 1})
+        self.get_while_put(pool)
+        self.assertEqual(metric(pool, 'handoffs'), 1)
+        self.assertEqual(metric(pool, 'reserved'), 0)
+        self.assertEqual(metric(pool, 'available'), 1)
+
+    def test_put_reserves_for_awaiting_thread_without_direct_handoff(self):
+        pool=ResourcePool(self.id(), resource_cls=MyResource, policy={'resource_limit': 1, 'direct_handoff': False})
+        self.get_while_put(pool)
+        self.assertEqual(metric(pool, 'reserved'), 0)
+        self.assertEqual(metric(pool, 'available'), 1)
+
+    def test_awaiting_threads_are_served_in_order(self):
+        pool=ResourcePool(self.id(), resource_cls=MyResource, policy={'resource_limit': 1})
+        held=pool.get(wait=0)
+        order=list()
+        def get(name):
+            resources=pool.get(wait=5)
+            order.append(name)
+            pool.put(*resources)
+        getters=list()
+        for name in range(3):
+            getter=threading.Thread(target=get, args=(name,), daemon=True)
+            getter.start()
+            getters.append(getter)
+            self.assertTrue(wait_until(lambda: metric(pool, 'awaiting') == name + 1))
+        pool.put(*held)
+        for getter in getters: getter.join(5)
+        self.assertEqual(order, [0, 1, 2])
+
+
+class TestFastPath(unittest.TestCase):
+
+    def setUp(self):
+        self.pool=ResourcePool(self.id(), resource_cls=MyResource, policy={'resource_limit': 1})
+
+    def test_put_twice_is_rejected(self):
+        resources=self.pool.get(wait=0)
+        self.pool.put(*resources)
+        with self.assertRaises(ResourcePoolError):
+            self.pool.put(*resources)
+        self.assertEqual(self.pool.get(wait=0), resources)
+        self.pool.put(*resources)
+
+    def test_put_failing_to_deactivate_can_be_retried(self):
+        class FlakyResource(Resource):
+            failures=1
+            def deactivate(self):
+                if FlakyResource.failures:
+                    FlakyResource.failures-=1
+                    raise RuntimeError('deactivate failed')
+                return self
+        pool=ResourcePool(self.id() + '.flaky', resource_cls=FlakyResource,
+                          policy={'resource_limit': 1, 'deactivate_on_put': True})
+        resources=pool.get(wait=0)
+        with self.assertRaises(RuntimeError):
+            pool.put(*resources)
+        pool.put(*resources)
+        self.assertEqual(metric(pool, 'available'), 1)
+
+    def test_concurrent_puts_of_same_resource_park_it_once(self):
+        switch_interval=sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+        threads=4
+        for _ in range(1000):
+            resources=self.pool.get(wait=0)
+            self.assertEqual(len(resources), 1)
+            start=threading.Barrier(threads)
+            rejected=list()
+            def put():
+                start.wait()
+                try:
+                    self.pool.put(*resources)
+                except ResourcePoolError:
+                    rejected.append(True)
+            workers=[threading.Thread(target=put) for _ in range(threads)]
+            for worker in workers: worker.start()
+            for worker in workers: worker.join(5.0)
+            self.assertFalse(any([worker.is_alive() for worker in workers]), "put is blocked")
+            self.assertEqual(len(rejected), threads - 1)
+        # pool still serves under lock, and holds its one resource.
+        resources=run_with_timeout(self, lambda: self.pool.get(wait=1))
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(self.pool.get(wait=0), [])
+        self.pool.put(*resources)
+
+
+class TestBorrow(unittest.TestCase):
+
+    def test_replacement_is_awaited_only_for_remaining_wait(self):
+        pool_ref=list()
+        received=list()
+        class BrokenOnceResource(Resource):
+            validations=0
+            def validate(self):
+                BrokenOnceResource.validations+=1
+                if BrokenOnceResource.validations > 1: return True
+                # another thread awaits; evicting this resource serves it,
+                # so replacement must be awaited.
+                pool=pool_ref[0]
+                threading.Thread(target=lambda: received.append(pool.get(wait=5)), daemon=True).start()
+                wait_until(lambda: metric(pool, 'awaiting') == 1)
+                time.sleep(0.3)
+                return False
+        pool=ResourcePool(self.id(), resource_cls=BrokenOnceResource,
+                          policy={'resource_limit': 1, 'test_on_borrow': True})
+        pool_ref.append(pool)
+
+        start=time.monotonic()
+        self.assertEqual(pool.get(wait=0.6), [])
+        self.assertLess(time.monotonic() - start, 0.85)
+        self.assertTrue(wait_until(lambda: received))
+        self.assertEqual(len(received[0]), 1)
+        pool.put(*received[0])
+
+
+class TestBackgroundLoad(unittest.TestCase):
+
+    def flaky_pool(self, failures):
+        class FlakyResource(Resource):
+            failed=0
+            def __init__(self):
+                if FlakyResource.failed < failures:
+                    FlakyResource.failed+=1
+                    raise RuntimeError('create failed')
+                super().__init__()
+        return ResourcePool(self.id(), resource_cls=FlakyResource,
+                            policy={'resource_limit': 1, 'background_load': True, 'load_retry_backoff': 0.01})
+
+    def test_failed_create_is_retried(self):
+        pool=self.flaky_pool(failures=2)
+        resources=run_with_timeout(self, lambda: pool.get(wait=-1))
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(metric(pool, 'load_failures'), 2)
+        pool.put(*resources)
+
+    def test_waiter_fails_once_retries_are_spent(self):
+        pool=self.flaky_pool(failures=3)
+        def get():
+            try:
+                return pool.get(wait=-1)
+            except ResourcePoolError as e:
+                return e
+        self.assertIsInstance(run_with_timeout(self, get), ResourcePoolError)
+        self.assertEqual(metric(pool, 'load_failures'), 3)
+        self.assertEqual(metric(pool, 'wait_failures'), 1)
+        self.assertEqual(metric(pool, 'loading'), 0)
+        self.assertEqual(metric(pool, 'awaiting'), 0)
+
+        # pool loads again for the next request.
+        resources=run_with_timeout(self, lambda: pool.get(wait=-1))
+        self.assertEqual(len(resources), 1)
+        pool.put(*resources)
+
+    def test_callback_waiter_is_called_back_once_retries_are_spent(self):
+        pool=self.flaky_pool(failures=3)
+        tickets=list()
+        self.assertIsNone(pool.get(wait=-1, callback=tickets.append))
+        self.assertTrue(wait_until(lambda: tickets))
+        self.assertEqual(pool.get(ticket=tickets[0]), [])
+        self.assertEqual(metric(pool, 'wait_failures'), 1)
+
+
+class TestRequestorsClose(unittest.TestCase):
+
+    def setUp(self):
+        self.pool=ResourcePool(self.id(), resource_cls=MyResource, policy={'resource_limit': 1})
+        self.requestors=Requestors()
+
+    def test_close_pending_request_returns_its_reservation(self):
+        resources=self.pool.get(wait=0)
+        request_id=self.requestors.reserve([(self.pool, 1)], wait=-1, callback=lambda request_id: None)
+        self.assertEqual(self.requestors.state(request_id), Requestors.PENDING)
+        self.requestors.close(request_id)
+        self.assertEqual(self.requestors.state(request_id), Requestors.CLOSED)
+
+        # pool reserves returned resource for the closed request, and calls
+        # back; Requestors collects it and puts it back.
+        self.pool.put(*resources)
+        self.assertTrue(wait_until(lambda: self.pool.metrics.snapshot()['reserved'] == 0))
+        self.assertTrue(wait_until(lambda: self.pool.metrics.snapshot()['available'] == 1))
+        self.assertEqual(len(self.pool.get(wait=0)), 1)
+
+
+class TestRequestorsPutMany(unittest.TestCase):
+
+    def setUp(self):
+        # pools are registered by name; each test gets its own.
+        self.pool=ResourcePool(self.id(), resource_cls=MyResource, policy={'resource_limit': 2})
+        self.requestors=Requestors()
+
+    def test_put_many_rejects_request_listed_twice(self):
+        request_id=self.requestors.reserve([(self.pool, 1)], wait=0)
+        self.assertTrue(self.requestors.is_reserved(request_id))
+
+        with self.assertRaises(ResourcePoolError):
+            self.requestors.put_many([request_id, request_id])
+
+        # nothing was returned, and Requestors is still usable.
+        self.assertEqual(self.requestors.state(request_id), Requestors.RESERVED)
+        other_id=run_with_timeout(self, lambda: self.requestors.reserve([(self.pool, 1)], wait=0))
+        self.assertTrue(self.requestors.is_reserved(other_id))
+        self.requestors.put_many([request_id, other_id])
+        self.assertEqual(self.requestors.state(request_id), Requestors.CLOSED)
+        self.assertEqual(self.pool.metrics.snapshot()['inuse'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
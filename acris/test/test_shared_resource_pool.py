@@ -0,0 +1,31 @@
+import unittest
+
+from acris.idioms.resource_pool import ResourcePoolError, Resource
+from acris.idioms.shared_resource_pool import SharedResourcePool
+
+
+class MyResource(Resource):
+    pass
+
+
+class TestSharedPut(unittest.TestCase):
+
+    def setUp(self):
+        self.pool=SharedResourcePool(self.id(), resource_cls=MyResource, policy={'resource_limit': 1})
+        self.addCleanup(self.pool.close)
+
+    def test_put_of_resource_listed_twice_returns_nothing(self):
+        resources=self.pool.get(wait=0)
+        self.assertEqual(len(resources), 1)
+        with self.assertRaises(ResourcePoolError):
+            self.pool.put(resources[0], resources[0])
+        self.assertEqual(self.pool.get(wait=0), [])
+
+        # resource is still held, and may be returned.
+        self.pool.put(*resources)
+        self.assertEqual(self.pool.get(wait=0), resources)
+        self.pool.put(*resources)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import sqlite3
+import time
+import unittest
+
+from acris.idioms.virtual_resource_pool_db import ConnectionPool
+
+
+class RollbackFailingConnection(sqlite3.Connection):
+    def rollback(self):
+        raise sqlite3.OperationalError('rollback failed')
+
+
+def wait_until(predicate, timeout=5.0):
+    ''' polls predicate until it is true, or timeout passes.
+    '''
+    deadline=time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestConnectionPoolPut(unittest.TestCase):
+
+    def setUp(self):
+        # pools are registered by name; each test gets its own.
+        self.pool=ConnectionPool(self.id(), sqlite3, ':memory:', policy={'resource_limit': 1},
+                                 factory=RollbackFailingConnection)
+
+    def test_put_discards_connection_failing_to_roll_back(self):
+        connection=self.pool.get(wait=0)
+        connection.execute('CREATE TABLE t (x INTEGER)')
+        connection.commit()
+        connection.execute('INSERT INTO t VALUES (1)')
+        self.assertTrue(connection.connection.in_transaction)
+
+        with self.assertLogs('acris.idioms.virtual_resource_pool_db', level='WARNING') as logs:
+            self.pool.put(connection)
+        self.assertIn('discarding connection failing to roll back', logs.output[0])
+        # discarded connection is deactivated by pool's loader thread.
+        self.assertTrue(wait_until(lambda: not connection.active()))
+
+        # discarded connection frees its place; the next one is a new connection.
+        other=self.pool.get(wait=0)
+        self.assertIsNot(other, connection)
+        self.assertEqual(other.execute('SELECT 1'), [(1,)])
+        self.pool.put(other)
+
+    def test_put_keeps_connection_with_no_open_transaction(self):
+        connection=self.pool.get(wait=0)
+        connection.execute('CREATE TABLE t (x INTEGER)')
+        connection.commit()
+        self.assertFalse(connection.connection.in_transaction)
+        self.pool.put(connection)
+        self.assertIs(self.pool.get(wait=0), connection)
+
+
+if __name__ == '__main__':
+    unittest.main()
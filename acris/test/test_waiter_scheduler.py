@@ -0,0 +1,42 @@
+import unittest
+
+from acris.idioms.waiter_scheduler import Waiter, SmallestFirstScheduler, PriorityScheduler, create_waiter_scheduler
+
+
+class TestSmallestFirstScheduler(unittest.TestCase):
+
+    def test_serves_smallest_first(self):
+        scheduler=SmallestFirstScheduler()
+        for ticket, count in enumerate([3, 1, 2, 1]):
+            scheduler.add(Waiter(ticket, count))
+        self.assertEqual([waiter.ticket for waiter in scheduler.select(4)], [1, 3, 2])
+        self.assertEqual(len(scheduler), 1)
+
+    def test_heap_is_compacted_as_waiters_are_removed(self):
+        scheduler=SmallestFirstScheduler()
+        scheduler.add(Waiter(-1, 5))
+        for ticket in range(10000):
+            # waiters time out, or are cancelled, before they are served.
+            scheduler.add(Waiter(ticket, 1 + ticket % 3))
+            scheduler.remove(ticket)
+        self.assertLessEqual(len(scheduler._SmallestFirstScheduler__heap), 2 * len(scheduler) + 65)
+        self.assertEqual([waiter.ticket for waiter in scheduler.select(5)], [-1])
+
+
+class TestPriorityScheduler(unittest.TestCase):
+
+    def test_serves_highest_priority_first(self):
+        scheduler=PriorityScheduler({'priority_aging': 0})
+        for ticket, priority in enumerate([0, 2, 1]):
+            scheduler.add(Waiter(ticket, 1, priority=priority))
+        self.assertEqual([waiter.ticket for waiter in scheduler.select(3)], [1, 2, 0])
+
+
+class TestCreateWaiterScheduler(unittest.TestCase):
+
+    def test_scheduler_by_name(self):
+        self.assertIsInstance(create_waiter_scheduler({'waiter_scheduler': 'smallest_first'}), SmallestFirstScheduler)
+
+
+if __name__ == '__main__':
+    unittest.main()